@@ -0,0 +1,52 @@
+"""notify_faces_changes
+
+Revision ID: 3b9d2f71c4a8
+Revises: 614f6e9480d9
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = '3b9d2f71c4a8'
+down_revision: Union[str, Sequence[str], None] = '614f6e9480d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Keeps in-process gallery indexes (app/models/gallery.py) in sync.
+# NOTIFY is delivered on commit; the payload carries ids only (the 8000-byte
+# payload limit rules out the embedding), listeners fetch inserted rows.
+def upgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_faces_changed() RETURNS trigger AS $$
+        DECLARE
+            row_data faces%ROWTYPE;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                row_data := OLD;
+            ELSE
+                row_data := NEW;
+            END IF;
+            PERFORM pg_notify(
+                'faces_changed',
+                json_build_object(
+                    'op', TG_OP,
+                    'face_id', row_data.face_id,
+                    'user_id', row_data.user_id
+                )::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER faces_changed_notify
+        AFTER INSERT OR UPDATE OF embedding, user_id OR DELETE ON faces
+        FOR EACH ROW EXECUTE FUNCTION notify_faces_changed()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS faces_changed_notify ON faces")
+    op.execute("DROP FUNCTION IF EXISTS notify_faces_changed()")
@@ -0,0 +1,56 @@
+"""quantized_embedding_indexes
+
+Revision ID: 8c41e0d5a7b2
+Revises: 3b9d2f71c4a8
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+from alembic import op
+from app.core.config import settings
+
+revision: str = '8c41e0d5a7b2'
+down_revision: Union[str, Sequence[str], None] = '3b9d2f71c4a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Expression indexes over the existing Vector(512) column (pgvector >= 0.7):
+#   halfvec — 2 bytes per dimension, ~half the graph size
+#   bit     — binary_quantize(), 1 bit per dimension, Hamming distance
+# The full-precision column stays the source of truth and is used to re-rank
+# the shortlist exactly (RECOGNITION_INDEX_MODE in app/core/config.py).
+#
+# Only the index of the configured mode is built: every HNSW graph on faces
+# is maintained on each insert and competes for shared_buffers. "vector"
+# (the default) needs none. CONCURRENTLY keeps faces writable during the
+# build, and cannot run inside a transaction. Switching modes later, and
+# dropping faces_embedding_hnsw_idx: doc/PERFORMANCE.md, Quantized Index Modes.
+QUANTIZED_INDEXES = {
+    "halfvec": """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS faces_embedding_halfvec_hnsw_idx
+        ON faces
+        USING hnsw ((embedding::halfvec(512)) halfvec_cosine_ops)
+        WITH (m = 16, ef_construction = 64)
+    """,
+    "bit": """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS faces_embedding_bit_hnsw_idx
+        ON faces
+        USING hnsw ((binary_quantize(embedding)::bit(512)) bit_hamming_ops)
+        WITH (m = 16, ef_construction = 64)
+    """,
+}
+
+
+def upgrade() -> None:
+    sql = QUANTIZED_INDEXES.get(settings.RECOGNITION_INDEX_MODE)
+    if sql is None:
+        return
+    with op.get_context().autocommit_block():
+        op.execute(sql)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS faces_embedding_bit_hnsw_idx")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS faces_embedding_halfvec_hnsw_idx")
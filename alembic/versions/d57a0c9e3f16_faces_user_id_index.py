@@ -0,0 +1,25 @@
+"""faces_user_id_index
+
+Revision ID: d57a0c9e3f16
+Revises: 8c41e0d5a7b2
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = 'd57a0c9e3f16'
+down_revision: Union[str, Sequence[str], None] = '8c41e0d5a7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# /verify loads one person's faces by user_id; without this b-tree that is a
+# sequential scan over every embedding. Also serves the ON DELETE CASCADE
+# from users.
+def upgrade() -> None:
+    op.create_index("ix_faces_user_id", "faces", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_faces_user_id", table_name="faces")
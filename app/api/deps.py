@@ -1,14 +1,23 @@
 # FastAPI dependency injection
-from app.db.session import SessionLocal
-from fastapi import UploadFile, HTTPException, status, Depends
+import os
+import tempfile
+import threading
+from app.db.session import SessionLocal, AsyncSessionLocal
+from fastapi import UploadFile, File, HTTPException, status, Depends
 from app.models.insightface import InsightFaceEmbedder
+from app.models.remote_embedder import RemoteEmbedder
 from app.models.matcher import InsightFaceMatcher
-from app.core.config import Device, settings
+from app.models.batcher import MicroBatcher
+from app.models.gallery import GalleryIndex
+from app.models.embedding_cache import EmbeddingCache
+from app.core.config import Device, ImageConfig, settings
 from app.core.logs import logger
+from app.services.ingestion import read_upload
 from fastapi.security import OAuth2PasswordBearer
 from app.core.security import decode_access_token
-from app.db.models import AuthUser
+from app.db.models import AuthUser, User
 from sqlalchemy.orm import Session
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 from jose import JWTError
 
@@ -17,14 +26,26 @@ from jose import JWTError
 
 # Loads embedder model once at startup
 _embedder_instance = None
+# The warm-up thread and threadpool dependencies can ask for it at the same time
+_embedder_lock = threading.Lock()
 
-def get_embedder() -> InsightFaceEmbedder:
+def get_embedder() -> InsightFaceEmbedder | RemoteEmbedder:
     global _embedder_instance
-    if _embedder_instance is None:
-        _embedder_instance = InsightFaceEmbedder(
-            model_name='buffalo_l',
-            device=Device.CPU
-        )
+    if _embedder_instance is not None:
+        return _embedder_instance
+    with _embedder_lock:
+        if _embedder_instance is None and settings.INFERENCE_SERVER_SOCKET:
+            # The model lives in app.inference_server; this worker only sends it images
+            _embedder_instance = RemoteEmbedder(
+                path=settings.INFERENCE_SERVER_SOCKET,
+                timeout_s=settings.INFERENCE_SERVER_TIMEOUT_S,
+            )
+        if _embedder_instance is None:
+            _embedder_instance = InsightFaceEmbedder(
+                model_name='buffalo_l',
+                device=Device.CPU,
+                allowed_modules=settings.INSIGHTFACE_MODULES
+            )
     return _embedder_instance
 
 # Loads matcher once at startup
@@ -39,6 +60,61 @@ def get_matcher() -> InsightFaceMatcher:
     return _matcher_instance
 
 
+# Recognition micro-batcher, shared by all requests of this worker
+_batcher_instance = None
+_batcher_lock = threading.Lock()
+
+def get_batcher() -> MicroBatcher | None:
+    global _batcher_instance
+    if not settings.BATCHING_ENABLED or settings.INFERENCE_SERVER_SOCKET:
+        # With an inference server, batching happens there, across all API workers
+        return None
+    if _batcher_instance is not None:
+        return _batcher_instance
+    with _batcher_lock:
+        if _batcher_instance is None:
+            _batcher_instance = MicroBatcher(
+                embedder=get_embedder(),
+                max_batch_size=settings.BATCH_MAX_SIZE,
+                max_wait_ms=settings.BATCH_MAX_WAIT_MS
+            )
+    return _batcher_instance
+
+
+# In-process gallery index, filled and kept in sync by GallerySync (see app.main lifespan)
+_gallery_instance = None
+
+def get_gallery() -> GalleryIndex | None:
+    global _gallery_instance
+    if not settings.GALLERY_INDEX_ENABLED:
+        return None
+    if _gallery_instance is None:
+        _gallery_instance = GalleryIndex()
+    return _gallery_instance
+
+
+# Embedding cache; every worker maps the same file, so hits are shared across workers
+_embedding_cache_instance = None
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    global _embedding_cache_instance
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _embedding_cache_instance is None:
+        path = settings.EMBEDDING_CACHE_PATH
+        if not os.path.isdir(os.path.dirname(path) or "."):
+            # No tmpfs at /dev/shm (e.g. macOS): same sharing, backed by the temp dir
+            path = os.path.join(tempfile.gettempdir(), os.path.basename(path))
+        _embedding_cache_instance = EmbeddingCache(
+            path=path,
+            size_mb=settings.EMBEDDING_CACHE_SIZE_MB,
+            ttl_s=settings.EMBEDDING_CACHE_TTL_S,
+            # Results depend on the model and on the preprocessing resolution
+            namespace=f"buffalo_l:{settings.INSIGHTFACE_MODULES}:{ImageConfig().target_max_dim}",
+        )
+    return _embedding_cache_instance
+
+
 # Database session dependency
 def get_db():
     db = SessionLocal()
@@ -52,32 +128,37 @@ def get_db():
     finally:
         db.close()
 
-#  App level size limiting dependency
-async def valid_content_length(file: UploadFile):
-    # Read the file in chunks to count actual bytes
-    real_size = 0
-    for chunk in iter(lambda: file.file.read(1024 * 64), b''):
-        real_size += len(chunk)
-        if real_size > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail="File too large"
-            )
+# Async database session dependency (recognize/register hot path)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Database error: {e}")
+            raise
 
-    # Reset the cursor so the next function can read it
-    file.file.seek(0)
-    return file
+#  App level size limiting dependency: reads the upload once into a single buffer
+async def read_image_upload(file: UploadFile) -> memoryview:
+    return read_upload(file, settings.MAX_FILE_SIZE)
+
+
+# Same for /recognize/batch: every part read once, image count capped before any decoding
+async def read_image_uploads(files: list[UploadFile] = File(...)) -> list[tuple[str | None, memoryview]]:
+    if len(files) > settings.RECOGNITION_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Too many images: at most {settings.RECOGNITION_BATCH_MAX_IMAGES} per batch"
+        )
+    return [(file.filename, read_upload(file, settings.MAX_FILE_SIZE)) for file in files]
 
 
 # Authentication dependency
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> AuthUser:
-
+def _user_id_from_token(token: str):
     try:
         payload = decode_access_token(token)
         user_id = payload.get("sub")
@@ -94,10 +175,10 @@ def get_current_user(
             detail="Invalid authentication credentials"
         )
 
-    user = db.query(AuthUser).filter(
-        AuthUser.auth_user_id == user_id
-    ).first()
+    return user_id
+
 
+def _ensure_active(user: AuthUser | None) -> AuthUser:
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -113,6 +194,41 @@ def get_current_user(
     return user
 
 
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> AuthUser:
+
+    user_id = _user_id_from_token(token)
+
+    user = db.query(AuthUser).filter(
+        AuthUser.auth_user_id == user_id
+    ).first()
+
+    return _ensure_active(user)
+
+
+# Async variant for routes on the async session; no threadpool slot is held.
+# The lookup runs in its own short session: on the request-scoped session its
+# pooled connection would stay checked out, idle in transaction, through
+# preprocessing and inference. It commits rather than closing mid-transaction:
+# the implied ROLLBACK would make psycopg drop the connection's prepared
+# statements (the nearest-users query).
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme)
+) -> AuthUser:
+
+    user_id = _user_id_from_token(token)
+
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(
+            select(AuthUser).where(AuthUser.auth_user_id == user_id)
+        )
+        await db.commit()
+
+    return _ensure_active(user)
+
+
 # Admin check dependency
 def get_current_admin(
     current_user: AuthUser = Depends(get_current_user)
@@ -136,3 +252,16 @@ def get_current_person(
     return current_user.person
 
 
+# Async variant for routes on the async session (relationships cannot lazy-load there).
+# Short session of its own, like get_current_user_async
+async def get_current_person_async(
+    current_user: AuthUser = Depends(get_current_user_async)
+) -> User:
+    async with AsyncSessionLocal() as db:
+        person = await db.scalar(
+            select(User).where(User.auth_user_id == current_user.auth_user_id)
+        )
+        await db.commit()
+    if person is None:
+        raise HTTPException(404, "Person profile not created")
+    return person
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
 from app.core.limiter import limiter
+from app.services.warmup import readiness
 
 router = APIRouter()
 
@@ -7,3 +9,14 @@ router = APIRouter()
 @limiter.limit("60/minute")
 def health(request: Request):
     return {"status": "ok"}
+
+
+# Readiness: 503 until this worker's embedder is built and warmed up (see app.services.warmup)
+@router.get("/health/ready", tags=["health"])
+@limiter.limit("60/minute")
+def health_ready(request: Request):
+    if readiness.ready:
+        return {"status": "ready", "warmup_ms": readiness.warmup_ms}
+    if readiness.error is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "detail": readiness.error})
+    return JSONResponse(status_code=503, content={"status": "warming_up"})
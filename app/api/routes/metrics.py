@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Request
+from app.api.deps import get_embedder
+from app.core.config import settings
+from app.core.limiter import limiter
+from app.core.metrics import metrics
+from app.utils.exceptions import InferenceServerError
+
+router = APIRouter()
+
+@router.get("/metrics", tags=["metrics"])
+@limiter.limit("60/minute")
+def get_metrics(request: Request):
+    snapshot = metrics.snapshot()
+    if settings.INFERENCE_SERVER_SOCKET:
+        # Inference (and its batching queue) runs in app.inference_server
+        try:
+            snapshot["inference_server"] = get_embedder().stats()
+        except InferenceServerError as e:
+            snapshot["inference_server"] = {"error": str(e)}
+    return snapshot
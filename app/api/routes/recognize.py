@@ -1,12 +1,19 @@
-from fastapi import APIRouter, UploadFile, Request
+from fastapi import APIRouter, Request, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.params import Depends
-from sqlalchemy.orm import Session
-from app.api.deps import get_db, valid_content_length, get_embedder,get_matcher, get_current_user
-from app.services.recognition import recognize_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, read_image_upload, read_image_uploads, get_embedder,get_matcher, get_current_user_async, get_batcher, get_gallery, get_embedding_cache
+from app.services.recognition import recognize_user, recognize_batch, recognize_embedding
+from app.schemas.recognize_schema import RecognizeEmbeddingRequest
+from app.services.vector_search import resolve_ef_search
 from app.models.insightface import InsightFaceEmbedder
 from app.models.matcher import InsightFaceMatcher
+from app.models.batcher import MicroBatcher
+from app.models.gallery import GalleryIndex
+from app.models.embedding_cache import EmbeddingCache
 from app.db.models import AuthUser
 from app.core.limiter import limiter
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -14,12 +21,62 @@ router = APIRouter()
 @limiter.limit("20/minute")
 async def recognize(
         request: Request,
-        file: UploadFile = Depends(valid_content_length),
-        db : Session = Depends(get_db),
+        image_data: memoryview = Depends(read_image_upload),
+        db : AsyncSession = Depends(get_async_db),
         embedder: InsightFaceEmbedder = Depends(get_embedder),
         matcher: InsightFaceMatcher = Depends(get_matcher),
-        current_user: AuthUser = Depends(get_current_user)
+        batcher: MicroBatcher | None = Depends(get_batcher),
+        gallery: GalleryIndex | None = Depends(get_gallery),
+        cache: EmbeddingCache | None = Depends(get_embedding_cache),
+        current_user: AuthUser = Depends(get_current_user_async),
+        k: int = Query(1, ge=1, le=settings.RECOGNITION_MAX_K, description="Number of ranked candidates to return"),
+        profile: str | None = Query(None, description="Recall/speed profile (hnsw.ef_search), e.g. fast, balanced, accurate")
         ):
 
 
-    return await recognize_user(file=file,db=db,embedder=embedder,matcher=matcher, request=request)
+    return await recognize_user(image_data=image_data,db=db,embedder=embedder,matcher=matcher, request=request, batcher=batcher, k=k, profile=profile, gallery=gallery, cache=cache)
+
+
+@router.post("/recognize/batch", tags=["recognize"])
+@limiter.limit("20/minute")
+async def recognize_batch_endpoint(
+        request: Request,
+        images: list[tuple[str | None, memoryview]] = Depends(read_image_uploads),
+        embedder: InsightFaceEmbedder = Depends(get_embedder),
+        matcher: InsightFaceMatcher = Depends(get_matcher),
+        batcher: MicroBatcher | None = Depends(get_batcher),
+        gallery: GalleryIndex | None = Depends(get_gallery),
+        cache: EmbeddingCache | None = Depends(get_embedding_cache),
+        current_user: AuthUser = Depends(get_current_user_async),
+        k: int = Query(1, ge=1, le=settings.RECOGNITION_MAX_K, description="Number of ranked candidates to return per image"),
+        profile: str | None = Query(None, description="Recall/speed profile (hnsw.ef_search), e.g. fast, balanced, accurate")
+        ):
+    """Recognize several images; one JSON line per image, streamed as each is resolved."""
+    try:
+        ef_search = resolve_ef_search(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    items = recognize_batch(images=images, embedder=embedder, matcher=matcher, batcher=batcher, k=k, ef_search=ef_search, gallery=gallery, cache=cache)
+
+    async def ndjson():
+        async for item in items:
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@router.post("/recognize/embedding", tags=["recognize"])
+@limiter.limit(settings.RECOGNITION_EMBEDDING_RATE_LIMIT)
+async def recognize_by_embedding(
+        request: Request,
+        body: RecognizeEmbeddingRequest,
+        db: AsyncSession = Depends(get_async_db),
+        matcher: InsightFaceMatcher = Depends(get_matcher),
+        gallery: GalleryIndex | None = Depends(get_gallery),
+        current_user: AuthUser = Depends(get_current_user_async),
+        k: int = Query(1, ge=1, le=settings.RECOGNITION_MAX_K, description="Number of ranked candidates to return"),
+        profile: str | None = Query(None, description="Recall/speed profile (hnsw.ef_search), e.g. fast, balanced, accurate")
+        ):
+    """Recognize a pre-computed ArcFace embedding (no image, no server-side inference)."""
+    return await recognize_embedding(encoded=body.embedding, dtype=body.dtype, matcher=matcher, db=db, k=k, profile=profile, gallery=gallery)
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, UploadFile, Form, Request
+from fastapi import APIRouter, Form, Request
 from fastapi.params import Depends
-from sqlalchemy.orm import Session
-from app.api.deps import get_db, valid_content_length, get_embedder, get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, read_image_upload, get_embedder, get_current_user_async, get_batcher, get_embedding_cache
 from app.services.registration import register_user
 from app.models.insightface import InsightFaceEmbedder
+from app.models.batcher import MicroBatcher
+from app.models.embedding_cache import EmbeddingCache
 from app.db.models import AuthUser
 from app.core.limiter import limiter
 
@@ -14,12 +16,14 @@ router = APIRouter()
 @limiter.limit("5/minute")
 async def register(
     request: Request,
-    file: UploadFile = Depends(valid_content_length),
+    image_data: memoryview = Depends(read_image_upload),
     name: str = Form(...),
     surname: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     embedder: InsightFaceEmbedder = Depends(get_embedder),
-    current_user: AuthUser = Depends(get_current_user)
+    batcher: MicroBatcher | None = Depends(get_batcher),
+    cache: EmbeddingCache | None = Depends(get_embedding_cache),
+    current_user: AuthUser = Depends(get_current_user_async)
 ):
 
-    return register_user(file=file,name=name,surname=surname,db=db,embedder=embedder,auth_user_id=current_user.auth_user_id)
\ No newline at end of file
+    return await register_user(image_data=image_data,name=name,surname=surname,db=db,embedder=embedder,auth_user_id=current_user.auth_user_id,batcher=batcher,cache=cache)
\ No newline at end of file
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Request
+from fastapi.params import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, read_image_upload, get_embedder, get_matcher, get_batcher, get_embedding_cache, get_current_person_async
+from app.services.verification import verify_user
+from app.models.insightface import InsightFaceEmbedder
+from app.models.matcher import InsightFaceMatcher
+from app.models.batcher import MicroBatcher
+from app.models.embedding_cache import EmbeddingCache
+from app.db.models import User
+from app.core.limiter import limiter
+
+router = APIRouter()
+
+@router.post("/verify", tags=["verify"])
+@limiter.limit("20/minute")
+async def verify(
+        request: Request,
+        image_data: memoryview = Depends(read_image_upload),
+        db: AsyncSession = Depends(get_async_db),
+        embedder: InsightFaceEmbedder = Depends(get_embedder),
+        matcher: InsightFaceMatcher = Depends(get_matcher),
+        batcher: MicroBatcher | None = Depends(get_batcher),
+        cache: EmbeddingCache | None = Depends(get_embedding_cache),
+        person: User = Depends(get_current_person_async),
+        ):
+    """Is the person in this image the logged-in user? Compared against their own faces only."""
+    return await verify_user(image_data=image_data, person=person, embedder=embedder, matcher=matcher, db=db, request=request, batcher=batcher, cache=cache)
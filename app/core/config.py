@@ -1,7 +1,7 @@
 # env, settings
-from pydantic import Field, PostgresDsn, field_validator
+from pydantic import Field, PostgresDsn, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Union
+from typing import Union, Literal
 from dataclasses import dataclass
 from enum import Enum
 from app.core.logs import logger
@@ -54,6 +54,101 @@ class Settings(BaseSettings):
     ALGORITHM: str = Field(default="HS256", description="Allowed JWT algorithms")
     ACCESS_TOKEN_EXPIRE_SECONDS: int = Field(default=30*60, description="Access token expiration time in minutes")
     MAX_FILE_SIZE : int = Field(default=10485760, description="Maximum file size in bytes")
+    UPLOAD_SPOOL_MAX_SIZE: int = Field(default=10485760, description="Uploads up to this size are kept in memory instead of a temp file")
+
+    # Image preprocessing pool (decode/resize run off the event loop)
+    PREPROCESS_WORKERS: int = Field(default=2, ge=1, description="Threads in the dedicated image preprocessing pool")
+
+    # InsightFace model pack modules to load (detection + ArcFace is all embed() needs)
+    INSIGHTFACE_MODULES: list[str] = Field(default=["detection", "recognition"], description="InsightFace task names to load (JSON list)")
+    PRELOAD_DISABLE_PREPACKING: bool = Field(default=True, description="With app.launcher preloading, skip ORT weight prepacking so MatMul/Gemm weights stay shared between workers")
+
+    # ONNX Runtime sessions (app.models.ort_session) and CPU split between workers (app.utils.cpu)
+    UVICORN_WORKERS: int = Field(default=1, ge=1, description="API worker processes on this host; default of app.launcher --workers and the divisor for the CPU split")
+    ORT_INTRA_OP_THREADS: int = Field(default=0, ge=0, description="Threads per session for one operator (0 = one per physical core of this worker's CPU share)")
+    ORT_INTER_OP_THREADS: int = Field(default=1, ge=0, description="Threads running independent operators in parallel execution mode (0 = ORT default)")
+    ORT_EXECUTION_MODE: Literal["sequential", "parallel"] = Field(default="sequential", description="Run graph operators one at a time or in parallel branches")
+    ORT_GRAPH_OPTIMIZATION_LEVEL: Literal["disable", "basic", "extended", "all"] = Field(default="all", description="ONNX Runtime graph optimization level")
+    ORT_ALLOW_SPINNING: bool = Field(default=True, description="Let idle ORT pool threads busy-wait for work (lower latency, burns CPU when oversubscribed)")
+    ORT_MODEL_CACHE: bool = Field(default=True, description="Save graph-optimized models under <model pack>/optimized/ on first load and build later sessions from them")
+    CPU_AFFINITY: bool = Field(default=False, description="Pin each app.launcher worker to its own share of the CPUs")
+
+    # Per-phase timing headers on /recognize (app.middleware.benchmark_timing)
+    BENCHMARK_MODE: bool = Field(default=False, description="Record preprocessing, inference and database timings per request and return them as headers")
+
+    # Start-up warm-up (app lifespan); /health/ready is 503 until it has finished
+    WARMUP_ENABLED: bool = Field(default=True, description="Build the embedder and run warm-up inferences at start-up")
+    WARMUP_ITERATIONS: int = Field(default=3, ge=0, description="Warm-up inferences on a synthetic image")
+
+    # Micro-batching of ArcFace recognition across concurrent requests
+    BATCHING_ENABLED: bool = Field(default=True, description="Batch aligned face crops from concurrent requests into one recognition run")
+    BATCH_MAX_SIZE: int = Field(default=8, ge=1, description="Maximum number of face crops per recognition batch")
+    BATCH_MAX_WAIT_MS: float = Field(default=5.0, ge=0, description="Maximum time the first crop of a batch waits for others to join")
+
+    # Async engine used by the recognize/register hot path
+    DB_ASYNC_POOL_SIZE: int = Field(default=10, ge=1, description="Connections kept open by the async engine pool")
+    DB_ASYNC_MAX_OVERFLOW: int = Field(default=10, ge=0, description="Extra async connections allowed above the pool size")
+
+    # Server-side prepared statements on the async engine (disable behind PgBouncer transaction pooling)
+    DB_PREPARED_STATEMENTS: bool = Field(default=True, description="Let psycopg prepare repeated statements once per pooled connection")
+    DB_PREPARE_THRESHOLD: int = Field(default=0, ge=0, description="Executions on a connection before a statement is prepared (0 = on first use)")
+    DB_PLAN_CACHE_MODE: Literal["auto", "force_custom_plan", "force_generic_plan"] = Field(default="auto", description="PostgreSQL plan_cache_mode for async connections")
+
+    # Top-k identification: HNSW ef_search per recall/speed profile
+    RECOGNITION_PROFILES: dict[str, int] = Field(default={"fast": 16, "balanced": 40, "accurate": 200}, description="hnsw.ef_search per recognition profile (JSON object)")
+    RECOGNITION_DEFAULT_PROFILE: str = Field(default="balanced", description="Profile used when a request does not name one")
+    RECOGNITION_MAX_K: int = Field(default=10, ge=1, le=100, description="Maximum number of candidates a request may ask for")
+    RECOGNITION_FACES_PER_USER: int = Field(default=5, ge=1, le=100, description="Registered faces per user to expect; the shortlist holds at least k x this many faces so deduplication still leaves k users")
+
+    # Quantized HNSW index to search (shortlist is re-ranked on full-precision vectors)
+    RECOGNITION_INDEX_MODE: Literal["vector", "halfvec", "bit"] = Field(default="vector", description="vector = full-precision index; halfvec/bit = quantized index + exact re-rank")
+    RECOGNITION_RERANK_CANDIDATES: int = Field(default=100, ge=1, le=1000, description="Minimum shortlist size fetched from a quantized index before exact re-ranking")
+
+    # /recognize/batch
+    RECOGNITION_BATCH_MAX_IMAGES: int = Field(default=32, ge=1, le=256, description="Maximum number of images in one /recognize/batch request")
+    RECOGNITION_BATCH_MAX_INFLIGHT: int = Field(default=4, ge=1, le=256, description="Images of one /recognize/batch request embedded at once, so a single upload cannot fill the admission slots and queue")
+
+    # /recognize/embedding (client-side inference)
+    EMBEDDING_NORM_TOLERANCE: float = Field(default=0.01, gt=0, le=0.5, description="Accepted deviation of a submitted embedding's L2 norm from 1.0")
+    RECOGNITION_EMBEDDING_RATE_LIMIT: str = Field(default="6000/minute", description="Rate limit for /recognize/embedding (no inference, so far higher than /recognize)")
+
+    # Embedding cache keyed by upload content, shared by all workers on the host
+    EMBEDDING_CACHE_ENABLED: bool = Field(default=True, description="Reuse inference results for byte-identical uploads")
+    EMBEDDING_CACHE_PATH: str = Field(default="/dev/shm/face-api-embedding-cache", description="Memory-mapped cache file prefix (tmpfs); workers using the same path share entries")
+    EMBEDDING_CACHE_SIZE_MB: float = Field(default=64, gt=0, description="Fixed size of the cache file (~2.1 KB per entry)")
+    EMBEDDING_CACHE_TTL_S: float = Field(default=3600, gt=0, description="Seconds a cached outcome stays valid")
+
+    # Request coalescing for byte-identical uploads in flight at the same time
+    INFERENCE_SINGLE_FLIGHT: bool = Field(default=True, description="Concurrent identical uploads wait for one inference run instead of each running their own")
+
+    # Admission control: bounded inference queue, 503 + Retry-After when overloaded (app.models.admission)
+    ADMISSION_ENABLED: bool = Field(default=True, description="Bound the inference queue and reject requests that cannot be served in time")
+    ADMISSION_CONCURRENCY: int = Field(default=0, ge=0, description="Uploads preprocessed and embedded at once per worker (0 = BATCH_MAX_SIZE with batching, else 2)")
+    ADMISSION_MAX_QUEUE_DEPTH: int = Field(default=32, ge=0, description="Requests allowed to wait for an inference slot; more are rejected with 503")
+    ADMISSION_LATENCY_BUDGET_MS: float = Field(default=10000, ge=0, description="Reject requests whose estimated queue wait + service time exceeds this (0 = queue depth only)")
+
+    # Dedicated inference process shared by all API workers (python -m app.inference_server)
+    INFERENCE_SERVER_SOCKET: str | None = Field(default=None, description="Unix socket of the inference server; when set, API workers send images there instead of loading the model")
+    INFERENCE_SERVER_WORKERS: int = Field(default=1, ge=1, description="Inference server processes, each holding one (copy-on-write shared) model")
+    INFERENCE_SERVER_TIMEOUT_S: float = Field(default=30, gt=0, description="Seconds an API worker waits for the inference server to answer one image")
+
+    # In-process gallery index (exact search in RAM, pgvector as fallback)
+    GALLERY_INDEX_ENABLED: bool = Field(default=False, description="Serve recognition from an in-memory copy of the faces table kept in sync via LISTEN/NOTIFY")
+
+    @field_validator("RECOGNITION_PROFILES", mode="after")
+    @classmethod
+    def validate_profiles(cls, v: dict[str, int]) -> dict[str, int]:
+        """pgvector accepts hnsw.ef_search between 1 and 1000."""
+        for name, ef_search in v.items():
+            if not 1 <= ef_search <= 1000:
+                raise ValueError(f"ef_search for profile '{name}' must be between 1 and 1000")
+        return v
+
+    @model_validator(mode="after")
+    def validate_default_profile(self) -> "Settings":
+        if self.RECOGNITION_DEFAULT_PROFILE not in self.RECOGNITION_PROFILES:
+            raise ValueError(f"RECOGNITION_DEFAULT_PROFILE '{self.RECOGNITION_DEFAULT_PROFILE}' is not in RECOGNITION_PROFILES")
+        return self
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -70,6 +165,7 @@ class ImageConfig:
     allowed_formats: set[str] = frozenset({'JPEG', 'PNG', 'WEBP', 'GIF'})
     max_image_pixels: int = 178956970
     verify_format: bool = True
+    target_max_dim: int = 640  # longest side fed to the detector
 
 
 # Usage
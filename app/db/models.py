@@ -12,7 +12,7 @@ class Face(Base):
     __tablename__ = "faces"
 
     face_id = Column(UUID(as_uuid=True), primary_key=True, default=lambda: uuid.uuid4())
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
     embedding = Column(Vector(512), nullable=False) # changed from ARRAY(Float) for pgvector support
     detection_score = Column(Float, nullable=True) # Detection confidence score
 
@@ -1,6 +1,10 @@
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.core.config import settings
+from app.core.metrics import metrics
+from pgvector.psycopg import register_vector_async
+from psycopg.pq import TransactionStatus
 
 # Load DB URL from env variable
 engine = create_engine(
@@ -11,3 +15,94 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def _async_connect_args() -> dict:
+    """
+    psycopg connection options for the async engine.
+
+    With prepare_threshold set, psycopg prepares a statement server-side after
+    that many executions on a connection and reuses it from then on, so the
+    recognition query is parsed and planned once per pooled connection.
+    """
+    args = {
+        "prepare_threshold": settings.DB_PREPARE_THRESHOLD if settings.DB_PREPARED_STATEMENTS else None
+    }
+    if settings.DB_PLAN_CACHE_MODE != "auto":
+        args["options"] = f"-c plan_cache_mode={settings.DB_PLAN_CACHE_MODE}"
+    return args
+
+
+# Async engine for the request hot path (recognize/register).
+# "postgresql+psycopg" resolves to psycopg 3's native async dialect, so DB
+# waits are awaited on the event loop instead of holding a threadpool slot.
+async_engine = create_async_engine(
+        str(settings.DATABASE_URL),
+        pool_pre_ping=True,
+        pool_size=settings.DB_ASYNC_POOL_SIZE,
+        max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+        connect_args=_async_connect_args()
+        )
+
+
+# Install pgvector's psycopg adapters on every new async connection so numpy
+# embeddings are sent as binary `vector` parameters (raw float32 bytes)
+# instead of a 512-number text literal the server has to parse.
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector(dbapi_connection, connection_record):
+    dbapi_connection.run_async(register_vector_async)
+
+
+PREPARED_STATEMENTS = metrics.counter(
+    "db_prepared_statements", "Nearest-users query executions that prepared it server-side on their connection"
+)
+PREPARED_STATEMENT_HITS = metrics.counter(
+    "db_prepared_statement_hits", "Nearest-users query executions served by an already prepared statement"
+)
+
+
+# Mirror psycopg's documented prepare rule for statements marked with the
+# track_prepared execution option (the nearest-users queries): a statement is
+# prepared on the execution after prepare_threshold, then reused on that
+# connection. psycopg deallocates all of a connection's prepared statements
+# when a transaction is rolled back, so the per-connection counts are dropped
+# then too. Only public signals are used: execution options, SQLAlchemy events
+# and the driver's transaction status. Eviction by prepared_max (100 distinct
+# statements, far more than this app sends) is not modelled.
+# Connection.info lives as long as the DBAPI connection.
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count_prepared(conn, cursor, statement, parameters, context, executemany):
+    if not settings.DB_PREPARED_STATEMENTS or executemany:
+        return
+    if context is None or not context.execution_options.get("track_prepared"):
+        return
+    seen = conn.info.setdefault("statement_executions", {})
+    executions = seen.get(statement, 0) + 1
+    seen[statement] = executions
+    if executions == settings.DB_PREPARE_THRESHOLD + 1:
+        PREPARED_STATEMENTS.inc()
+    elif executions > settings.DB_PREPARE_THRESHOLD + 1:
+        PREPARED_STATEMENT_HITS.inc()
+
+
+def _forget_prepared(driver_connection, info: dict) -> None:
+    # Runs before the ROLLBACK; psycopg skips it (and keeps its statements) when idle
+    if driver_connection.info.transaction_status != TransactionStatus.IDLE:
+        info.pop("statement_executions", None)
+
+
+@event.listens_for(async_engine.sync_engine, "rollback")
+def _prepared_dropped_on_rollback(conn):
+    _forget_prepared(conn.connection.driver_connection, conn.info)
+
+
+@event.listens_for(async_engine.sync_engine.pool, "reset")
+def _prepared_dropped_on_reset(dbapi_connection, connection_record, reset_state):
+    _forget_prepared(dbapi_connection.driver_connection, connection_record.info)
+
+
+# Async session factory; objects stay usable after commit (no implicit lazy reload)
+AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+        )
@@ -0,0 +1,224 @@
+"""
+Dedicated inference process shared by all API workers.
+
+    python -m app.inference_server --socket /dev/shm/face-api-inference.sock --workers 1
+    INFERENCE_SERVER_SOCKET=/dev/shm/face-api-inference.sock python -m app.launcher --workers 8
+
+With N API workers each loading InsightFace, N model copies compete for the
+same cores. Here one process (or a small pool, --workers) holds the model
+and the API workers reach it over a Unix socket with RemoteEmbedder
+(app/models/remote_embedder.py): the HTTP worker count no longer decides the
+model memory footprint, and one MicroBatcher sees the recognition queue of
+all API workers.
+
+Images are not sent through the socket. Each client connection attaches a
+shared-memory buffer once; per request the server reads the image in place
+from it (no pickling, no copy) and answers with the embedding.
+
+The pool is forked by the launcher's supervisor after preloading, so its
+processes share the weights copy-on-write (app.models.preload).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import mmap
+import os
+import socket
+import time
+
+import numpy as np
+
+from app.core.config import Device, settings
+from app.core.logs import logger
+from app.core.metrics import metrics
+from app.launcher import Launcher
+from app.models.batcher import MicroBatcher
+from app.models.insightface import InsightFaceEmbedder
+from app.models.remote_embedder import (
+    REQUEST, REPLY, DTYPES,
+    OP_ATTACH, OP_EMBED, OP_STATS, SHM_PREFIX,
+    STATUS_OK, STATUS_NO_FACE, STATUS_MULTIPLE_FACES, STATUS_INVALID, STATUS_ERROR,
+    shm_dir,
+)
+from app.services.inference import embed_image
+from app.services.warmup import warm_up
+from app.utils.exceptions import NoFaceDetectedError, MultipleFacesDetectedError
+
+
+SERVER_REQUESTS = metrics.counter("inference_server_requests", "Images embedded for API workers")
+SERVER_INFLIGHT = metrics.gauge("inference_server_inflight", "Images currently queued or running in this inference process")
+SERVER_CONNECTIONS = metrics.gauge("inference_server_connections", "Open API worker connections")
+SERVER_LATENCY = metrics.histogram(
+    "inference_server_request_ms",
+    buckets=(5, 10, 20, 50, 100, 250, 500, 1000, 2500, 5000),
+    description="Time from receiving an image to sending its embedding",
+)
+
+DEFAULT_SOCKET = "/dev/shm/face-api-inference.sock"
+
+
+def _reply(status: int, payload: bytes = b"", value: float = 0.0) -> bytes:
+    return REPLY.pack(status, len(payload), value) + payload
+
+
+def _map_buffer(name: str) -> mmap.mmap:
+    """
+    Map a client's shared buffer read-write.
+
+    `name` comes from the socket, so only a plain file name of this protocol
+    (SHM_PREFIX) that resolves inside shm_dir() is opened; anything else,
+    including symlinks, raises PermissionError.
+    """
+    directory = os.path.realpath(shm_dir())
+    if "\0" in name or os.path.basename(name) != name or not name.startswith(SHM_PREFIX):
+        raise PermissionError(f"not a shared buffer name: {name!r}")
+    path = os.path.join(directory, name)
+    if os.path.dirname(os.path.realpath(path)) != directory:
+        raise PermissionError(f"{name!r} resolves outside {directory}")
+    fd = os.open(path, os.O_RDWR | os.O_NOFOLLOW)
+    try:
+        return mmap.mmap(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+
+
+class InferenceServer:
+    """Serves embed() for RemoteEmbedder clients on a listening Unix socket."""
+
+    def __init__(self, embedder: InsightFaceEmbedder, batcher: MicroBatcher | None = None):
+        self.embedder = embedder
+        self.batcher = batcher
+
+    async def serve(self, sock: socket.socket) -> None:
+        server = await asyncio.start_unix_server(self.handle, sock=sock)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        buffer: mmap.mmap | None = None
+        SERVER_CONNECTIONS.inc()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(REQUEST.size)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                op, dtype_code, a, b, c = REQUEST.unpack(header)
+
+                if op == OP_ATTACH:
+                    name = (await reader.readexactly(a)).decode(errors="replace")
+                    try:
+                        mapped = _map_buffer(name)
+                    except OSError as e:
+                        writer.write(_reply(STATUS_ERROR, f"Cannot map {name}: {e}".encode()))
+                    else:
+                        if buffer is not None:
+                            buffer.close()
+                        buffer = mapped
+                        writer.write(_reply(STATUS_OK))
+                elif op == OP_EMBED:
+                    writer.write(await self._embed(buffer, dtype_code, (a, b, c)))
+                elif op == OP_STATS:
+                    stats = {"pid": os.getpid(), "metrics": metrics.snapshot()}
+                    writer.write(_reply(STATUS_OK, json.dumps(stats).encode()))
+                else:
+                    logger.error(f"Inference server: unknown op {op}, closing connection")
+                    break
+                await writer.drain()
+        finally:
+            SERVER_CONNECTIONS.dec()
+            writer.close()
+            if buffer is not None:
+                with contextlib.suppress(BufferError):
+                    buffer.close()
+
+    async def _embed(self, buffer: mmap.mmap | None, dtype_code: int, shape: tuple[int, int, int]) -> bytes:
+        dtype = DTYPES.get(dtype_code)
+        if buffer is None or dtype is None or int(np.prod(shape)) * dtype.itemsize > len(buffer):
+            return _reply(STATUS_INVALID, b"Image does not fit the attached buffer")
+
+        SERVER_REQUESTS.inc()
+        SERVER_INFLIGHT.inc()
+        t0 = time.perf_counter()
+        # A view of the client's buffer: the client waits for this reply before reusing it
+        img_array = np.ndarray(shape, dtype=dtype, buffer=buffer)
+        try:
+            face = await embed_image(img_array, self.embedder, self.batcher)
+        except NoFaceDetectedError as e:
+            return _reply(STATUS_NO_FACE, str(e).encode())
+        except MultipleFacesDetectedError as e:
+            return _reply(STATUS_MULTIPLE_FACES, str(e).encode(), value=e.num_faces)
+        except ValueError as e:
+            return _reply(STATUS_INVALID, str(e).encode())
+        except Exception as e:
+            logger.error(f"Inference server: embedding failed: {e}", exc_info=True)
+            return _reply(STATUS_ERROR, f"{type(e).__name__}: {e}".encode())
+        finally:
+            del img_array
+            SERVER_INFLIGHT.dec()
+            SERVER_LATENCY.observe((time.perf_counter() - t0) * 1000)
+
+        embedding = np.ascontiguousarray(face.embedding, dtype=np.float32)
+        return _reply(STATUS_OK, embedding.tobytes(), value=face.detection_score)
+
+
+def bind_unix_socket(path: str) -> socket.socket:
+    """Listening socket at `path`; a stale socket file from a dead server is replaced."""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise RuntimeError(f"An inference server is already listening on {path}")
+        finally:
+            probe.close()
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, 0o660)
+    sock.listen(1024)
+    return sock
+
+
+def _serve(sock: socket.socket, ready) -> None:
+    """Worker body: load and warm up the model after fork, then serve until terminated."""
+    embedder = InsightFaceEmbedder(
+        model_name="buffalo_l",
+        device=Device.CPU,
+        allowed_modules=settings.INSIGHTFACE_MODULES,
+    )
+    batcher = None
+    if settings.BATCHING_ENABLED:
+        batcher = MicroBatcher(
+            embedder=embedder,
+            max_batch_size=settings.BATCH_MAX_SIZE,
+            max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+        )
+    warmup_ms = warm_up(embedder)
+    ready()
+    logger.info(f"Inference server {os.getpid()} ready ({warmup_ms:.0f} ms warm-up)")
+    asyncio.run(InferenceServer(embedder, batcher).serve(sock))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.inference_server", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--socket", default=settings.INFERENCE_SERVER_SOCKET or DEFAULT_SOCKET)
+    parser.add_argument("--workers", type=int, default=settings.INFERENCE_SERVER_WORKERS)
+    parser.add_argument("--no-preload", action="store_true")
+    parser.add_argument("--memory-report", metavar="PATH")
+    args = parser.parse_args(argv)
+
+    if not args.no_preload:
+        from app.models.preload import preload_models
+        preload_models("buffalo_l", allowed_modules=settings.INSIGHTFACE_MODULES)
+
+    Launcher(lambda: bind_unix_socket(args.socket), _serve, args.workers, args.memory_report).run()
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Pre-forking launcher: load the model once, fork the Uvicorn workers from it.
+
+    python -m app.launcher --host 0.0.0.0 --port 8000 --workers 4
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker loads its
+own copy of the model on its first request. Here the parent loads the
+model weights (app.models.preload), binds the socket and forks; workers
+build their sessions on the shared (copy-on-write) weights and load the
+embedder *before* accepting traffic, so there is no cold first request
+either. Dead workers are replaced; SIGTERM/SIGINT stop all of them.
+
+Once every worker is ready, per-worker RSS/PSS/USS is printed (and written
+as JSON with --memory-report) to show how much is actually shared.
+"""
+import argparse
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Callable
+
+from app.core.config import settings
+from app.core.logs import logger
+from app.utils.cpu import configure_worker
+from app.utils.memory import process_memory_mb
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.launcher", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.UVICORN_WORKERS)
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Fork without preloading; each worker loads its own model copy (baseline)")
+    parser.add_argument("--memory-report", metavar="PATH",
+                        help="Write per-worker memory as JSON once all workers are ready")
+    return parser.parse_args(argv)
+
+
+def _run_worker(
+        serve: Callable[[socket.socket, Callable[[], None]], None],
+        sock: socket.socket,
+        ready_w: int,
+        index: int,
+        workers: int,
+) -> None:
+    """Body of a forked worker `index` of `workers`; never returns."""
+
+    def ready() -> None:
+        os.write(ready_w, b"1")
+        os.close(ready_w)
+
+    try:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        # Before any ORT session exists: sessions size their thread pools to this share
+        cpus = configure_worker(index, workers, pin=settings.CPU_AFFINITY)
+        if settings.CPU_AFFINITY:
+            logger.info(f"Worker {os.getpid()} pinned to CPUs {cpus}")
+        serve(sock, ready)
+        code = 0
+    except BaseException as e:
+        logger.error(f"Worker {os.getpid()} failed: {type(e).__name__}: {e}", exc_info=True)
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    os._exit(code)
+
+
+def serve_http(config) -> Callable[[socket.socket, Callable[[], None]], None]:
+    """Worker body for the API: load the embedder, then run Uvicorn (`config`) on the inherited socket."""
+    import uvicorn
+
+    def serve(sock: socket.socket, ready: Callable[[], None]) -> None:
+        # Sessions are created here, after fork (their thread pools belong to this process)
+        from app.api.deps import get_embedder
+        get_embedder()
+        ready()
+        uvicorn.Server(config).run(sockets=[sock])
+
+    return serve
+
+
+class Launcher:
+    """
+    Pre-fork supervisor: binds once, forks `workers` processes running
+    `serve(sock, ready)`, replaces the ones that die. Each worker calls
+    ready() once its model is loaded.
+    """
+
+    def __init__(
+            self,
+            bind: Callable[[], socket.socket],
+            serve: Callable[[socket.socket, Callable[[], None]], None],
+            workers: int,
+            memory_report: str | None = None,
+    ):
+        self.bind = bind
+        self.serve = serve
+        self.n_workers = workers
+        self.memory_report = memory_report
+        self.sock = None
+        self.workers: dict[int, int] = {}  # pid -> read end of its readiness pipe
+        self.indexes: dict[int, int] = {}  # pid -> worker index (its CPU share)
+        self.ready: set[int] = set()
+        self.stopping = False
+
+    def _spawn(self, index: int) -> None:
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            _run_worker(self.serve, self.sock, ready_w, index, self.n_workers)
+        os.close(ready_w)
+        self.workers[pid] = ready_r
+        self.indexes[pid] = index
+        logger.info(f"Started worker {pid}")
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _wait_ready(self) -> None:
+        pending = {fd: pid for pid, fd in self.workers.items() if pid not in self.ready}
+        while pending and not self.stopping:
+            readable, _, _ = select.select(list(pending), [], [], 1.0)
+            for fd in readable:
+                pid = pending.pop(fd)
+                if os.read(fd, 1):
+                    self.ready.add(pid)
+            # A worker that died before becoming ready closes its pipe (read returns b"")
+        if not self.stopping:
+            self._report_memory()
+
+    def _report_memory(self) -> None:
+        rows = []
+        for pid in sorted(self.ready):
+            try:
+                rows.append({"pid": pid, **process_memory_mb(pid)})
+            except (FileNotFoundError, ProcessLookupError):
+                continue
+        parent = {"pid": os.getpid(), **process_memory_mb()}
+
+        print(f"{'worker':>8} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8}", flush=True)
+        for row in rows:
+            print(f"{row['pid']:>8} {row['rss_mb']!s:>8} {row['pss_mb']!s:>8} {row['uss_mb']!s:>8}", flush=True)
+        if rows and all(row["pss_mb"] is not None for row in rows):
+            print(f"{'total':>8} {sum(r['rss_mb'] for r in rows):>8.1f} {sum(r['pss_mb'] for r in rows):>8.1f}"
+                  f"   (parent PSS {parent['pss_mb']} MB)", flush=True)
+
+        if self.memory_report:
+            with open(self.memory_report, "w") as f:
+                json.dump({"parent": parent, "workers": rows}, f, indent=2)
+
+    def run(self) -> None:
+        self.sock = self.bind()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for index in range(self.n_workers):
+            self._spawn(index)
+        self._wait_ready()
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            fd = self.workers.pop(pid, None)
+            if fd is not None:
+                os.close(fd)
+            self.ready.discard(pid)
+            index = self.indexes.pop(pid, 0)
+            if not self.stopping:
+                logger.error(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+                time.sleep(1)
+                self._spawn(index)
+
+        self.sock.close()
+        logger.info("All workers stopped")
+
+
+def main(argv=None) -> None:
+    args = _parse_args(argv)
+
+    if settings.INFERENCE_SERVER_SOCKET:
+        # Workers send images to app.inference_server; there is nothing to load here
+        args.no_preload = True
+
+    if not args.no_preload:
+        from app.models.preload import preload_models
+        t0 = time.perf_counter()
+        preload_models("buffalo_l", allowed_modules=settings.INSIGHTFACE_MODULES)
+        print(f"Model preloaded in {time.perf_counter() - t0:.1f}s; forking {args.workers} workers", flush=True)
+
+    # Imported here: app.inference_server shares the supervisor but not the web stack
+    import uvicorn
+
+    # The app is imported by each worker (Config.load), not by this process
+    config = uvicorn.Config("app.main:app", host=args.host, port=args.port)
+    Launcher(config.bind_socket, serve_http(config), args.workers, args.memory_report).run()
+
+
+if __name__ == "__main__":
+    main()
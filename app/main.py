@@ -1,16 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.routes import register, recognize, health, auth, delete
+from app.api.routes import register, recognize, verify, health, auth, delete, metrics
 from app.core.limiter import limiter
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from fastapi.middleware.cors import CORSMiddleware
 from app.middleware.benchmark_timing import BenchmarkTimingMiddleware
+from app.services.ingestion import configure_upload_spooling
+from app.core.config import settings
+from app.api.deps import get_gallery, get_embedder
+from app.services.gallery_sync import GallerySync
+from app.services.warmup import run_warmup, readiness
 
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    gallery_sync = None
+    if settings.GALLERY_INDEX_ENABLED:
+        gallery_sync = GallerySync(get_gallery())
+        gallery_sync.start()
+
+    # Warm-up runs in the background so /health answers while /health/ready is still 503
+    warmup = None
+    if settings.WARMUP_ENABLED:
+        warmup = asyncio.create_task(run_warmup(get_embedder))
+    else:
+        readiness.ready = True
+
+    yield
+
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    if gallery_sync is not None:
+        await gallery_sync.stop()
+
+
 app = FastAPI(
     title="AI Face Recognition API",
     version="1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -21,9 +51,12 @@ allow_methods=[""],
 allow_headers=["*"],
 )
 app.add_middleware(BenchmarkTimingMiddleware)
+configure_upload_spooling(settings.UPLOAD_SPOOL_MAX_SIZE)
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(recognize.router)
 app.include_router(register.router)
+app.include_router(verify.router)
 app.include_router(delete.router, tags=["delete"])
 
 app.include_router(auth.router, tags=["auth"])
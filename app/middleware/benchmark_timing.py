@@ -8,6 +8,8 @@
 #   X-Total-Time-Ms     — full request time seen by the middleware
 #   X-DB-Time-Ms        — time to fetch all face rows from PostgreSQL
 #   X-Similarity-Time-Ms — time for the Python cosine similarity loop
+#   X-Preprocess-<Stage>-Ms — per-stage preprocessing time (queue-wait, validate,
+#                          decode, load, resize) in the preprocessing pool
 #
 # How times are injected:
 #   recognition.py sets request.state.db_time_ms and
@@ -20,13 +22,12 @@
 # How to remove when done:
 #   Delete this file and remove the two lines in app/main.py that register it.
 
-import os
 import time
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
-BENCHMARK_MODE: bool = os.getenv("BENCHMARK_MODE", "false").lower() == "true"
+from app.core.config import settings
 
 
 class BenchmarkTimingMiddleware(BaseHTTPMiddleware):
@@ -37,7 +38,7 @@ class BenchmarkTimingMiddleware(BaseHTTPMiddleware):
 
     async def dispatch(self, request: Request, call_next) -> Response:
         # Fast path: skip entirely unless BENCHMARK_MODE is on
-        if not BENCHMARK_MODE:
+        if not settings.BENCHMARK_MODE:
             return await call_next(request)
 
         # Only instrument the recognition endpoint — it's the one being benchmarked
@@ -48,6 +49,7 @@ class BenchmarkTimingMiddleware(BaseHTTPMiddleware):
         request.state.db_time_ms = None
         request.state.similarity_time_ms = None
         request.state.inference_time_ms = None
+        request.state.preprocess_timings_ms = None
 
         wall_start = time.perf_counter()
         response = await call_next(request)
@@ -64,4 +66,9 @@ class BenchmarkTimingMiddleware(BaseHTTPMiddleware):
         if request.state.similarity_time_ms is not None:
             response.headers["X-Similarity-Time-Ms"] = f"{request.state.similarity_time_ms:.2f}"
 
+        if request.state.preprocess_timings_ms is not None:
+            for stage, ms in request.state.preprocess_timings_ms.items():
+                header = "-".join(part.capitalize() for part in stage.split("_"))
+                response.headers[f"X-Preprocess-{header}-Ms"] = f"{ms:.2f}"
+
         return response
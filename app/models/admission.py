@@ -0,0 +1,133 @@
+"""
+Admission control in front of inference: a bounded queue that sheds load early.
+
+Without it, every upload is accepted and queues behind the thread pool until
+its client times out, after the server has already spent CPU on it. The
+controller runs at most `concurrency` inferences at once. Further requests
+wait in a FIFO queue of at most `max_queue_depth`. A request that would wait
+longer than its latency budget is rejected straight away instead.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from app.core.metrics import metrics
+from app.utils.exceptions import OverloadedError
+
+T = TypeVar("T")
+
+QUEUE_DEPTH = metrics.gauge("inference_queue_depth", "Requests waiting for an inference slot")
+RUNNING = metrics.gauge("inference_running", "Requests holding an inference slot")
+SHED_QUEUE_FULL = metrics.counter("inference_shed_queue_full", "Requests rejected with 503 because the inference queue was full")
+SHED_LATENCY_BUDGET = metrics.counter("inference_shed_latency_budget", "Requests rejected with 503 because their estimated latency exceeded the budget")
+SERVICE_HISTOGRAM = metrics.histogram(
+    "inference_service_ms",
+    buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+    description="Time a request holds its inference slot (preprocessing + inference)",
+)
+
+
+class AdmissionController:
+    """
+    At most `concurrency` calls run at once; up to `max_queue_depth` wait.
+
+    The wait of a new request is estimated from the mean service time of the
+    last `window` calls: the queue ahead of it drains `concurrency` calls
+    per service time. It is rejected with OverloadedError when the queue is
+    full, or when wait + service would exceed `latency_budget_ms` (0 = no
+    budget). A request that finds a free slot is always admitted.
+    """
+
+    def __init__(
+            self,
+            concurrency: int,
+            max_queue_depth: int,
+            latency_budget_ms: float = 0,
+            window: int = 50,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self.concurrency = concurrency
+        self.max_queue_depth = max_queue_depth
+        self.latency_budget_ms = latency_budget_ms
+        self._service_ms: deque[float] = deque(maxlen=window)
+        self._running = 0
+        self._waiting = 0
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    def service_time_ms(self) -> float | None:
+        """Mean service time of recent calls (None before the first one finished)."""
+        if not self._service_ms:
+            return None
+        return sum(self._service_ms) / len(self._service_ms)
+
+    def estimated_wait_ms(self) -> float:
+        """Expected time a request arriving now waits for a slot."""
+        service = self.service_time_ms()
+        if service is None or self._running < self.concurrency:
+            return 0.0
+        return (self._waiting + 1) / self.concurrency * service
+
+    def _bind_loop(self) -> None:
+        # The semaphore belongs to one loop; start afresh on a new one (e.g. a new TestClient)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._running = self._waiting = 0
+
+    def _check(self) -> None:
+        if self._running < self.concurrency:
+            return
+        wait_ms = self.estimated_wait_ms()
+        retry_after_s = max(1, math.ceil(wait_ms / 1000))
+        if self._waiting >= self.max_queue_depth:
+            SHED_QUEUE_FULL.inc()
+            raise OverloadedError(f"Inference queue is full ({self._waiting} waiting)", retry_after_s)
+        service = self.service_time_ms()
+        if self.latency_budget_ms and service is not None and wait_ms + service > self.latency_budget_ms:
+            SHED_LATENCY_BUDGET.inc()
+            raise OverloadedError(
+                f"Estimated latency {wait_ms + service:.0f} ms exceeds the {self.latency_budget_ms:.0f} ms budget",
+                retry_after_s,
+            )
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await `fn()` once a slot is free.
+
+        Raises:
+            OverloadedError: When the request is shed (before `fn` is called)
+        """
+        self._bind_loop()
+        self._check()
+
+        semaphore = self._semaphore
+        self._waiting += 1
+        QUEUE_DEPTH.set(self._waiting)
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+            QUEUE_DEPTH.set(self._waiting)
+
+        self._running += 1
+        RUNNING.set(self._running)
+        started = time.perf_counter()
+        try:
+            return await fn()
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._service_ms.append(elapsed_ms)
+            SERVICE_HISTOGRAM.observe(elapsed_ms)
+            self._running -= 1
+            RUNNING.set(self._running)
+            semaphore.release()
@@ -0,0 +1,128 @@
+"""
+Micro-batching scheduler for the ArcFace recognition model.
+Collects aligned face crops from concurrent requests and runs them through
+InsightFaceEmbedder.embed_aligned() in one call.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from functools import partial
+
+import numpy as np
+
+from app.models.insightface import InsightFaceEmbedder
+from app.core.metrics import metrics
+from app.core.logs import logger
+
+
+BATCH_SIZE_HISTOGRAM = metrics.histogram(
+    "recognition_batch_size",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+    description="Number of face crops per ArcFace recognition run",
+)
+QUEUE_WAIT_HISTOGRAM = metrics.histogram(
+    "recognition_queue_wait_ms",
+    buckets=(0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000, 2500),
+    description="Time a crop waits in the batcher before its batch starts",
+)
+BATCH_RUN_HISTOGRAM = metrics.histogram(
+    "recognition_batch_run_ms",
+    buckets=(5, 10, 20, 50, 100, 250, 500, 1000, 2500, 5000),
+    description="Wall time of one batched recognition run",
+)
+
+
+@dataclass
+class _PendingCrop:
+    crop: np.ndarray
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    """
+    Dynamic batching in front of the recognition model.
+
+    The first crop to arrive opens a window of `max_wait_ms`; every crop that
+    arrives before the window closes (up to `max_batch_size`) joins the same
+    recognition run. While a batch is running, new crops keep queueing and are
+    picked up together by the next batch, so the batch size grows with load.
+    """
+
+    def __init__(
+            self,
+            embedder: InsightFaceEmbedder,
+            max_batch_size: int = 8,
+            max_wait_ms: float = 5.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def submit(self, crop: np.ndarray) -> np.ndarray:
+        """Queue one aligned crop and wait for its normalised embedding."""
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put(_PendingCrop(crop=crop, future=future))
+        return await future
+
+    def _ensure_started(self) -> None:
+        # The queue and worker are bound to the running loop; recreate them if
+        # the loop changed (e.g. a new TestClient or a reloaded server).
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> list[_PendingCrop]:
+        batch = [await self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    # Window closed — only take what is already queued
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            batch = [item for item in batch if not item.future.cancelled()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for item in batch:
+                QUEUE_WAIT_HISTOGRAM.observe((started - item.enqueued_at) * 1000)
+            BATCH_SIZE_HISTOGRAM.observe(len(batch))
+
+            try:
+                embeddings = await self._loop.run_in_executor(
+                    None,
+                    partial(self.embedder.embed_aligned, [item.crop for item in batch])
+                )
+            except Exception as e:
+                logger.error(f"Batched recognition failed: {type(e).__name__}: {e}", exc_info=True)
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                continue
+            finally:
+                BATCH_RUN_HISTOGRAM.observe((time.perf_counter() - started) * 1000)
+
+            logger.debug(f"Recognition batch of {len(batch)} finished")
+            for item, embedding in zip(batch, embeddings):
+                if not item.future.done():
+                    item.future.set_result(embedding)
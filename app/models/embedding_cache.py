@@ -0,0 +1,214 @@
+"""
+Content-addressed cache of inference outcomes, shared by every worker on the host.
+
+Kiosks and retrying clients re-upload identical bytes; a hit skips
+preprocessing and InsightFace inference entirely.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.core.logs import logger
+from app.core.metrics import metrics
+from app.schemas.detection import FaceEmbedding
+from app.utils.exceptions import NoFaceDetectedError, MultipleFacesDetectedError
+
+
+CACHE_HITS = metrics.counter("embedding_cache_hits", "Uploads answered from the embedding cache")
+CACHE_MISSES = metrics.counter("embedding_cache_misses", "Uploads that had to be embedded")
+CACHE_EVICTIONS = metrics.counter("embedding_cache_evictions", "Live entries evicted to make room (LRU)")
+
+_MAGIC = b"FEC1"
+_HEADER = np.dtype([("magic", "S4"), ("n_sets", "<u4"), ("ways", "<u4"), ("dim", "<u4")])
+_HEADER_BYTES = 64
+
+# Slot status
+_EMPTY, _EMBEDDING, _NO_FACE, _MULTIPLE_FACES = 0, 1, 2, 3
+
+
+def _slot_dtype(dim: int) -> np.dtype:
+    return np.dtype([
+        ("key", "V16"),
+        ("status", "u1"),
+        ("num_faces", "<u2"),
+        ("score", "<f4"),
+        ("stored_at", "<f8"),
+        ("used_at", "<f8"),
+        ("embedding", "<f4", (dim,)),
+    ], align=True)
+
+
+class EmbeddingCache:
+    """
+    Fixed-size, set-associative cache in a memory-mapped file (tmpfs by default).
+
+    Keys are 16-byte BLAKE2b digests of the raw upload. Each key maps to one
+    set of `ways` slots; a full set evicts its least recently used slot, and
+    entries older than `ttl_s` are treated as empty. The total size is fixed
+    by `size_mb`, so memory use never grows with traffic.
+
+    Every worker that opens the same `path` maps the same pages: a face
+    embedded by one worker is a hit in all of them. Sets are guarded by a
+    per-set byte-range lock on the file (between processes) plus a thread
+    lock (fcntl locks do not exclude threads of the same process).
+
+    Cached outcomes are a FaceEmbedding, or the NoFaceDetectedError /
+    MultipleFacesDetectedError the image produced.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            size_mb: float = 64,
+            ttl_s: float = 3600,
+            ways: int = 8,
+            dim: int = 512,
+            namespace: str = "",
+    ):
+        self.ttl_s = ttl_s
+        self.dim = dim
+        self._namespace = namespace.encode()[:64]
+        self._slot = _slot_dtype(dim)
+        self._thread_lock = threading.Lock()
+
+        n_slots = max(ways, int(size_mb * 1024 * 1024) // self._slot.itemsize)
+        self.ways = ways
+        self.n_sets = n_slots // ways
+        size = _HEADER_BYTES + self.n_sets * ways * self._slot.itemsize
+
+        # The layout is part of the file name: a worker started with other
+        # settings gets its own file instead of truncating pages that running
+        # workers still have mapped.
+        self.path = f"{path}.{self.n_sets}x{ways}x{dim}"
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        # Whole-file lock while the layout is checked/initialised
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != size or not self._layout_matches():
+                logger.info(f"Initialising embedding cache {self.path}: {self.n_sets * ways} slots ({size / 1024 ** 2:.1f} MB)")
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)  # zero-filled: every slot _EMPTY
+                self._write_header()
+            self._mmap = mmap.mmap(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+        self._slots = np.ndarray(
+            (self.n_sets, ways), dtype=self._slot, buffer=self._mmap, offset=_HEADER_BYTES
+        )
+
+    def _layout_matches(self) -> bool:
+        raw = os.pread(self._fd, _HEADER.itemsize, 0)
+        if len(raw) < _HEADER.itemsize:
+            return False
+        header = np.frombuffer(raw, dtype=_HEADER)[0]
+        return (
+            header["magic"] == _MAGIC
+            and header["n_sets"] == self.n_sets
+            and header["ways"] == self.ways
+            and header["dim"] == self.dim
+        )
+
+    def _write_header(self) -> None:
+        header = np.zeros(1, dtype=_HEADER)
+        header[0] = (_MAGIC, self.n_sets, self.ways, self.dim)
+        os.pwrite(self._fd, header.tobytes(), 0)
+
+    def key(self, data: bytes | memoryview) -> bytes:
+        """Digest of the upload; the namespace keeps results of other models/settings apart."""
+        return hashlib.blake2b(data, digest_size=16, key=self._namespace).digest()
+
+    @contextmanager
+    def _locked(self, set_index: int):
+        # Byte-range lock on byte `set_index` of the file: one lock per set
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, set_index)
+            try:
+                yield self._slots[set_index]
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, set_index)
+
+    def _set_index(self, key: bytes) -> int:
+        return int.from_bytes(key[:8], "little") % self.n_sets
+
+    def get(self, key: bytes) -> FaceEmbedding | Exception | None:
+        """Cached outcome for `key`, or None on a miss (absent or expired)."""
+        now = time.time()
+        key_v = np.void(key)
+        with self._locked(self._set_index(key)) as ways:
+            for slot in ways:
+                if slot["status"] == _EMPTY or slot["key"] != key_v:
+                    continue
+                if now - slot["stored_at"] > self.ttl_s:
+                    slot["status"] = _EMPTY
+                    break
+                slot["used_at"] = now
+                CACHE_HITS.inc()
+                return self._outcome(slot)
+
+        CACHE_MISSES.inc()
+        return None
+
+    def _outcome(self, slot) -> FaceEmbedding | Exception:
+        status = int(slot["status"])
+        if status == _NO_FACE:
+            return NoFaceDetectedError()
+        if status == _MULTIPLE_FACES:
+            return MultipleFacesDetectedError(int(slot["num_faces"]))
+        return FaceEmbedding(
+            embedding=np.array(slot["embedding"], dtype=np.float32),  # copy out of the shared pages
+            detection_score=float(slot["score"]),
+        )
+
+    def put(self, key: bytes, outcome: FaceEmbedding | Exception) -> None:
+        """Store an embedding or a no-face / multiple-faces outcome; other errors are ignored."""
+        if isinstance(outcome, NoFaceDetectedError):
+            status, num_faces, score, embedding = _NO_FACE, 0, 0.0, None
+        elif isinstance(outcome, MultipleFacesDetectedError):
+            status, num_faces, score, embedding = _MULTIPLE_FACES, min(outcome.num_faces, 65535), 0.0, None
+        elif isinstance(outcome, FaceEmbedding):
+            status, num_faces, score, embedding = _EMBEDDING, 1, outcome.detection_score, outcome.embedding
+        else:
+            return
+
+        now = time.time()
+        key_v = np.void(key)
+        with self._locked(self._set_index(key)) as ways:
+            victim = None
+            for i, slot in enumerate(ways):
+                if slot["status"] != _EMPTY and slot["key"] == key_v:
+                    victim = i
+                    break
+                if slot["status"] == _EMPTY or now - slot["stored_at"] > self.ttl_s:
+                    if victim is None:
+                        victim = i
+            if victim is None:
+                victim = int(np.argmin(ways["used_at"]))
+                CACHE_EVICTIONS.inc()
+
+            slot = ways[victim]
+            slot["key"] = key_v
+            slot["num_faces"] = num_faces
+            slot["score"] = score
+            slot["stored_at"] = now
+            slot["used_at"] = now
+            if embedding is not None:
+                slot["embedding"] = np.asarray(embedding, dtype=np.float32).reshape(-1)
+            slot["status"] = status
+
+    def clear(self) -> None:
+        """Drop every entry (all workers)."""
+        for set_index in range(self.n_sets):
+            with self._locked(set_index) as ways:
+                ways["status"] = _EMPTY
+
+    def close(self) -> None:
+        self._slots = None
+        self._mmap.close()
+        os.close(self._fd)
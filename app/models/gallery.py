@@ -0,0 +1,140 @@
+import threading
+from typing import Iterable
+from uuid import UUID
+
+import numpy as np
+
+from app.core.logs import logger
+
+
+class GalleryIndex:
+    """
+    In-process copy of the registered face gallery for exact cosine search.
+
+    Embeddings live in one contiguous (capacity, dim) float32 matrix with a
+    parallel user-id array, so a search is a single matmul plus argpartition.
+    Rows are L2-normalised on insert, which makes the dot product the same
+    cosine similarity pgvector reports as 1 - (a <=> b).
+
+    The index is only trusted while `ready` is True; it is cleared whenever
+    the change feed that keeps it consistent is interrupted.
+    """
+
+    def __init__(self, dim: int = 512, initial_capacity: int = 1024):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._embeddings = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._user_ids = np.empty(initial_capacity, dtype=object)
+        self._face_ids = np.empty(initial_capacity, dtype=object)
+        self._rows: dict[UUID, int] = {}
+        self._size = 0
+        self.ready = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _normalise(self, embedding: np.ndarray) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if vec.shape[0] != self.dim:
+            raise ValueError(f"Expected a {self.dim}-dim embedding, got {vec.shape[0]}")
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= self._embeddings.shape[0]:
+            return
+        new_capacity = max(capacity, 2 * self._embeddings.shape[0])
+        embeddings = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        embeddings[:self._size] = self._embeddings[:self._size]
+        user_ids = np.empty(new_capacity, dtype=object)
+        user_ids[:self._size] = self._user_ids[:self._size]
+        face_ids = np.empty(new_capacity, dtype=object)
+        face_ids[:self._size] = self._face_ids[:self._size]
+        self._embeddings, self._user_ids, self._face_ids = embeddings, user_ids, face_ids
+
+    def load(self, faces: Iterable[tuple[UUID, UUID, np.ndarray]]) -> None:
+        """Replace the whole gallery with (face_id, user_id, embedding) rows and mark it ready."""
+        with self._lock:
+            self._rows.clear()
+            self._size = 0
+            for face_id, user_id, embedding in faces:
+                self._upsert(face_id, user_id, embedding)
+            self.ready = True
+        logger.info(f"Gallery index loaded: {self._size} faces")
+
+    def clear(self) -> None:
+        """Drop all rows and stop serving searches until the next load()."""
+        with self._lock:
+            self.ready = False
+            self._rows.clear()
+            self._size = 0
+
+    def add(self, face_id: UUID, user_id: UUID, embedding: np.ndarray) -> None:
+        """Insert a face, or replace it if face_id is already indexed."""
+        with self._lock:
+            self._upsert(face_id, user_id, embedding)
+
+    def _upsert(self, face_id: UUID, user_id: UUID, embedding: np.ndarray) -> None:
+        row = self._rows.get(face_id)
+        if row is None:
+            self._reserve(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._rows[face_id] = row
+        self._embeddings[row] = self._normalise(embedding)
+        self._user_ids[row] = user_id
+        self._face_ids[row] = face_id
+
+    def remove(self, face_id: UUID) -> bool:
+        """Remove a face by moving the last row into its slot. Returns False if absent."""
+        with self._lock:
+            row = self._rows.pop(face_id, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            if row != last:
+                self._embeddings[row] = self._embeddings[last]
+                self._user_ids[row] = self._user_ids[last]
+                self._face_ids[row] = self._face_ids[last]
+                self._rows[self._face_ids[row]] = row
+            self._user_ids[last] = None
+            self._face_ids[last] = None
+            self._size = last
+            return True
+
+    def search(self, query: np.ndarray, k: int = 1) -> list[tuple[UUID, float]]:
+        """
+        Exact top-k users by cosine similarity, one entry per user (their
+        closest face), most similar first.
+        """
+        q = self._normalise(query)
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return []
+            similarities = self._embeddings[:n] @ q
+            user_ids = self._user_ids[:n]
+
+            # Fetch a few more faces than k; widen only if duplicates of the same
+            # user leave fewer than k distinct users in the window
+            window = min(n, max(4 * k, 16))
+            while True:
+                if window < n:
+                    top = np.argpartition(-similarities, window - 1)[:window]
+                else:
+                    top = np.arange(n)
+                top = top[np.argsort(-similarities[top], kind="stable")]
+
+                results: list[tuple[UUID, float]] = []
+                seen = set()
+                for row in top:
+                    user_id = user_ids[row]
+                    if user_id in seen:
+                        continue
+                    seen.add(user_id)
+                    results.append((user_id, float(similarities[row])))
+                    if len(results) == k:
+                        return results
+                if window == n:
+                    return results
+                window = min(n, 2 * window)
@@ -1,25 +1,72 @@
 """
 InsightFace Embedder Module
 Provides face detection and embedding extraction using InsightFace.
+
+insightface and onnxruntime are imported when the first embedder is built,
+not with this module: `import insightface` alone pulls in matplotlib,
+scikit-image and albumentations (seconds and ~150 MB), which processes that
+only need the type or the API routes (auth, Alembic, CLI scripts) never use.
 """
+import importlib
+from typing import Sequence
 import numpy as np
-from insightface.app import FaceAnalysis
-from app.schemas.detection import FaceEmbedding
+from app.schemas.detection import FaceEmbedding, AlignedFace
 from app.utils.exceptions import NoFaceDetectedError, MultipleFacesDetectedError
 from app.core.config import Device
 from app.core.logs import logger
 
 
 
+# embed() only reads the detector and ArcFace outputs; the landmark and
+# genderage models of a pack (buffalo_l) are skipped by default.
+DEFAULT_MODULES = ('detection', 'recognition')
+
+# Name -> module it is imported from on first use
+_LAZY_IMPORTS = {
+    'face_align': 'insightface.utils',
+    'TunedFaceAnalysis': 'app.models.ort_session',
+    'get_preloaded': 'app.models.preload',
+    'PreloadedFaceAnalysis': 'app.models.preload',
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _import_models() -> None:
+    """Bind the lazily imported names as module globals (kept if already bound, e.g. patched)."""
+    for name in _LAZY_IMPORTS:
+        if name not in globals():
+            __getattr__(name)
+
+
 class InsightFaceEmbedder:
-    def __init__(self, model_name: str = 'buffalo_l', device: Device = Device.CPU):
+    def __init__(
+            self,
+            model_name: str = 'buffalo_l',
+            device: Device = Device.CPU,
+            allowed_modules: Sequence[str] | None = DEFAULT_MODULES,
+    ):
         """
         Initialize the InsightFace embedder.
 
         Args:
             model_name: InsightFace model name (e.g., 'buffalo_l', 'arcface_r100_v1', etc.)
             device: Device to run inference on (Device.CPU or Device.GPU)
+            allowed_modules: InsightFace task names to load (None loads every model of the pack).
+                Must include 'detection' and 'recognition'.
         """
+        if allowed_modules is not None:
+            missing = set(DEFAULT_MODULES) - set(allowed_modules)
+            if missing:
+                logger.error(f"allowed_modules is missing required modules: {sorted(missing)}")
+                raise ValueError(f"allowed_modules must include {sorted(missing)}")
+            allowed_modules = list(allowed_modules)
 
         # Set providers based on device
         if device == Device.GPU:
@@ -29,13 +76,31 @@ class InsightFaceEmbedder:
             providers = ['CPUExecutionProvider']
             ctx_id = -1  # CPU context
         self.model_name = model_name
-        self.app = FaceAnalysis(name=model_name, providers=providers)
+        self.allowed_modules = allowed_modules
+        _import_models()
+        preloaded = get_preloaded(model_name)
+        if preloaded is not None and device == Device.CPU and self._covers(preloaded, allowed_modules):
+            # Forked by app.launcher: weights are shared with the other workers
+            self.app = PreloadedFaceAnalysis(
+                [m for m in preloaded if allowed_modules is None or m.taskname in allowed_modules],
+                providers,
+            )
+        else:
+            self.app = TunedFaceAnalysis(name=model_name, providers=providers, allowed_modules=allowed_modules)
         self.app.prepare(ctx_id=ctx_id)
         logger.info(
-            f"InsightFace model '{model_name}' initialized on {device.name}"
+            f"InsightFace model '{model_name}' initialized on {device.name} "
+            f"with modules {allowed_modules or 'all'}"
         )
 
         self.device = device
+
+    @staticmethod
+    def _covers(preloaded, allowed_modules) -> bool:
+        if allowed_modules is None:
+            return True
+        return set(allowed_modules) <= {m.taskname for m in preloaded}
+
     def embed(self, img_array: np.ndarray) -> FaceEmbedding:
         """
         Extract face embedding from a preprocessed image.
@@ -51,13 +116,7 @@ class InsightFaceEmbedder:
             NoFaceDetectedError: When no face is found in the image
             MultipleFacesDetectedError: When multiple faces are detected
         """
-        # Input validation
-        if not isinstance(img_array, np.ndarray):
-            logger.error("Input must be a numpy array")
-            raise ValueError("Input must be a numpy array")
-        if img_array.ndim != 3 or img_array.shape[2] != 3:
-            logger.error(f"Input image must have 3 channels (H, W, 3), got shape {img_array.shape}")
-            raise ValueError(f"Input image must have 3 channels (H, W, 3), got shape {img_array.shape}")
+        self._validate_input(img_array)
 
         # Detect faces and extract embedding
         logger.info(f"Running InsightFace {self.model_name} inference...")
@@ -66,7 +125,7 @@ class InsightFaceEmbedder:
         # Handle edge cases: no face or multiple faces = error
         if len(faces) == 0:
             logger.error("No face detected in the provided image")
-            raise NoFaceDetectedError("No face detected in the provided image")
+            raise NoFaceDetectedError()
 
         if len(faces) > 1:
             logger.error(f"Multiple faces detected in the provided image: {len(faces)}")
@@ -87,4 +146,73 @@ class InsightFaceEmbedder:
         return FaceEmbedding(
             embedding=embedding,
             detection_score=float(face.det_score)
-        )
\ No newline at end of file
+        )
+
+    def detect_and_align(self, img_array: np.ndarray) -> AlignedFace:
+        """
+        Run face detection only and return the aligned crop for the recognition model.
+
+        This is the first half of embed(); the second half (embed_aligned) can then
+        be run on crops from several requests at once.
+
+        Args:
+            img_array: Preprocessed image (H, W, 3), BGR, uint8, [0, 255]
+
+        Returns:
+            AlignedFace containing the aligned crop and detection score
+
+        Raises:
+            ValueError: If input image is not in the correct format
+            NoFaceDetectedError: When no face is found in the image
+            MultipleFacesDetectedError: When multiple faces are detected
+        """
+        self._validate_input(img_array)
+
+        logger.info(f"Running InsightFace {self.model_name} detection...")
+        bboxes, kpss = self.app.det_model.detect(img_array, max_num=0, metric='default')
+
+        if bboxes.shape[0] == 0:
+            logger.error("No face detected in the provided image")
+            raise NoFaceDetectedError()
+
+        if bboxes.shape[0] > 1:
+            logger.error(f"Multiple faces detected in the provided image: {bboxes.shape[0]}")
+            raise MultipleFacesDetectedError(num_faces=bboxes.shape[0])
+
+        crop = face_align.norm_crop(
+            img_array,
+            landmark=kpss[0],
+            image_size=self.app.models['recognition'].input_size[0]
+        )
+        return AlignedFace(crop=crop, detection_score=float(bboxes[0, 4]))
+
+    def embed_aligned(self, crops: list[np.ndarray]) -> np.ndarray:
+        """
+        Run the recognition model once on a batch of aligned face crops.
+
+        Args:
+            crops: Aligned crops as returned by detect_and_align()
+
+        Returns:
+            (N, 512) array of L2-normalised embeddings, one row per crop
+
+        Raises:
+            RuntimeError: If any crop produces a zero-norm embedding
+        """
+        logger.info(f"Running InsightFace {self.model_name} recognition on {len(crops)} crop(s)...")
+        feats = self.app.models['recognition'].get_feat(list(crops))
+
+        norms = np.linalg.norm(feats, axis=1, keepdims=True)
+        if np.any(norms == 0):
+            logger.error("Zero-norm embedding detected")
+            raise RuntimeError("Zero-norm embedding detected")
+        return feats / norms
+
+    @staticmethod
+    def _validate_input(img_array: np.ndarray) -> None:
+        if not isinstance(img_array, np.ndarray):
+            logger.error("Input must be a numpy array")
+            raise ValueError("Input must be a numpy array")
+        if img_array.ndim != 3 or img_array.shape[2] != 3:
+            logger.error(f"Input image must have 3 channels (H, W, 3), got shape {img_array.shape}")
+            raise ValueError(f"Input image must have 3 channels (H, W, 3), got shape {img_array.shape}")
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+On-disk cache of graph-optimised ONNX models.
+
+ONNX Runtime optimises the graph of every model while creating its session;
+for buffalo_l's detector and ArcFace that is a noticeable part of every
+worker start. cached_optimized_model() saves the optimised graph to
+`<pack>/optimized/` on first use, and later sessions load it with graph
+optimisation disabled.
+
+`<pack>/optimized/manifest.json` records what each cached file was built
+from: the source model's SHA-256, the onnxruntime version, the optimisation
+level and, for level "all" only (its NCHWc layouts depend on the CPU's
+vector width), the CPU. Any mismatch rebuilds the entry. The source is only
+re-hashed when its size or mtime changed since the entry was written.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import os.path as osp
+import platform
+from contextlib import contextmanager
+
+import onnxruntime
+
+from app.core.logs import logger
+from app.core.metrics import metrics
+
+
+CACHE_HITS = metrics.counter("onnx_model_cache_hits", "Sessions built from a cached optimised model")
+CACHE_MISSES = metrics.counter("onnx_model_cache_misses", "Models optimised and written to the model cache")
+
+CACHE_DIR = "optimized"
+MANIFEST = "manifest.json"
+
+
+def _single_threaded_options() -> onnxruntime.SessionOptions:
+    so = onnxruntime.SessionOptions()
+    so.intra_op_num_threads = 1
+    so.inter_op_num_threads = 1
+    so.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    return so
+
+
+def optimize_model(
+        onnx_file: str,
+        optimized_file: str,
+        level: onnxruntime.GraphOptimizationLevel = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+) -> None:
+    """Save a graph-optimised copy of an ONNX model (CPU provider)."""
+    so = _single_threaded_options()
+    so.graph_optimization_level = level
+    tmp_file = f"{optimized_file}.{os.getpid()}.tmp"
+    so.optimized_model_filepath = tmp_file
+    onnxruntime.InferenceSession(onnx_file, so, providers=["CPUExecutionProvider"])
+    os.replace(tmp_file, optimized_file)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _level_name(level: onnxruntime.GraphOptimizationLevel) -> str:
+    # ORT_ENABLE_EXTENDED -> "extended"
+    return level.name.removeprefix("ORT_ENABLE_").lower()
+
+
+def _cpu_fingerprint() -> str:
+    """Machine and instruction-set flags: what the layouts of level "all" depend on."""
+    flags = ""
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith(("flags", "Features")):
+                    flags = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{platform.machine()}:{hashlib.sha256(flags.encode()).hexdigest()[:16]}"
+
+
+def _read_manifest(cache_dir: str) -> dict:
+    try:
+        with open(osp.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(cache_dir: str, manifest: dict) -> None:
+    path = osp.join(cache_dir, MANIFEST)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _locked(cache_dir: str):
+    # Workers starting together must not optimise the same model concurrently
+    with open(osp.join(cache_dir, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def cached_optimized_model(onnx_file: str, level: onnxruntime.GraphOptimizationLevel) -> str:
+    """
+    Path of the copy of `onnx_file` optimised at `level`, built on first use.
+
+    Sessions created from it can run with graph optimisation disabled.
+
+    Raises:
+        OSError: If the cache directory next to the model cannot be written
+    """
+    cache_dir = osp.join(osp.dirname(onnx_file), CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    level_name = _level_name(level)
+    name = f"{osp.splitext(osp.basename(onnx_file))[0]}.{level_name}.onnx"
+    optimized_file = osp.join(cache_dir, name)
+
+    with _locked(cache_dir):
+        manifest = _read_manifest(cache_dir)
+        entry = manifest.get(name, {})
+        stat = os.stat(onnx_file)
+        source_stat = {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+        unchanged = all(entry.get(k) == v for k, v in source_stat.items())
+
+        expected = {
+            "source": osp.basename(onnx_file),
+            "source_sha256": entry["source_sha256"] if unchanged else file_sha256(onnx_file),
+            "onnxruntime": onnxruntime.__version__,
+            "level": level_name,
+            "cpu": _cpu_fingerprint() if level_name == "all" else "",
+        }
+        if osp.exists(optimized_file) and all(entry.get(k) == v for k, v in expected.items()):
+            CACHE_HITS.inc()
+            if not unchanged:
+                # Touched but identical (e.g. re-extracted pack): skip the hash next time
+                manifest[name] = {**expected, **source_stat}
+                _write_manifest(cache_dir, manifest)
+            return optimized_file
+
+        logger.info(f"Optimising {onnx_file} ({level_name}) into the model cache")
+        optimize_model(onnx_file, optimized_file, level)
+        manifest[name] = {**expected, **source_stat}
+        _write_manifest(cache_dir, manifest)
+        CACHE_MISSES.inc()
+        return optimized_file
@@ -0,0 +1,180 @@
+"""
+ONNX Runtime session configuration for the InsightFace models.
+
+insightface's FaceAnalysis creates its sessions without SessionOptions, so
+every session gets ORT's defaults: one intra-op thread per core, in every
+worker. TunedFaceAnalysis loads the same model pack with the options from
+session_options() (ORT_* settings) instead, from graphs optimised once and
+cached on disk (app.models.model_cache).
+"""
+import glob
+import os.path as osp
+import time
+from typing import Sequence
+
+import onnx
+import onnxruntime
+from insightface.app import FaceAnalysis
+from insightface.model_zoo.arcface_onnx import ArcFaceONNX
+from insightface.model_zoo.retinaface import RetinaFace
+from insightface.model_zoo.landmark import Landmark
+from insightface.model_zoo.attribute import Attribute
+from insightface.utils import ensure_available
+
+from app.core.config import settings
+from app.core.logs import logger
+from app.core.metrics import metrics
+from app.models.model_cache import cached_optimized_model
+from app.utils.cpu import worker_threads
+
+
+MODEL_LOAD_MS = metrics.gauge("embedder_model_load_ms", "Time spent creating the ONNX Runtime sessions of the model pack")
+
+
+EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def session_options(
+        graph_optimization_level: onnxruntime.GraphOptimizationLevel | None = None,
+) -> onnxruntime.SessionOptions:
+    """
+    SessionOptions from the ORT_* settings.
+
+    ORT_INTRA_OP_THREADS=0 sizes the pool to this worker's share of the
+    cores (app.utils.cpu.worker_threads). `graph_optimization_level`
+    overrides ORT_GRAPH_OPTIMIZATION_LEVEL (preloaded models need a fixed one).
+    """
+    so = onnxruntime.SessionOptions()
+    so.intra_op_num_threads = settings.ORT_INTRA_OP_THREADS or worker_threads()
+    so.inter_op_num_threads = settings.ORT_INTER_OP_THREADS
+    so.execution_mode = EXECUTION_MODES[settings.ORT_EXECUTION_MODE]
+    so.graph_optimization_level = (
+        graph_optimization_level
+        if graph_optimization_level is not None
+        else GRAPH_OPTIMIZATION_LEVELS[settings.ORT_GRAPH_OPTIMIZATION_LEVEL]
+    )
+    if not settings.ORT_ALLOW_SPINNING:
+        # Idle pool threads sleep instead of busy-waiting for the next run
+        so.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        so.add_session_config_entry("session.inter_op.allow_spinning", "0")
+    return so
+
+
+def _dims(value_info) -> list[int | str | None]:
+    return [d.dim_value if d.HasField("dim_value") else (d.dim_param or None) for d in value_info.type.tensor_type.shape.dim]
+
+
+def model_task(onnx_file: str) -> str | None:
+    """
+    Task the model would route to (model_for_session), from its graph signature.
+
+    Reads only the graph, so models that will not be used are skipped before
+    a session is created or an optimised graph is cached for them.
+    """
+    graph = onnx.load(onnx_file, load_external_data=False).graph
+    # Old opsets list the initializers as graph inputs too; ORT does not
+    initializers = {init.name for init in graph.initializer}
+    input_shape = next(_dims(i) for i in graph.input if i.name not in initializers)
+    outputs = graph.output
+
+    if len(outputs) >= 5:
+        return "detection"
+    output_dim = _dims(outputs[0])[1]
+    if input_shape[2] == 192 and input_shape[3] == 192:
+        return "landmark_3d_68" if output_dim == 3309 else f"landmark_2d_{output_dim // 2}"
+    if input_shape[2] == 96 and input_shape[3] == 96:
+        return "genderage" if output_dim == 3 else f"attribute_{output_dim}"
+    if input_shape[2] == input_shape[3] and input_shape[2] >= 112 and input_shape[2] % 16 == 0:
+        return "recognition"
+    return None
+
+
+def model_for_session(onnx_file: str, session: onnxruntime.InferenceSession):
+    """Same task routing as insightface's ModelRouter, for an existing session."""
+    inputs = session.get_inputs()
+    input_shape = inputs[0].shape
+    outputs = session.get_outputs()
+
+    if len(outputs) >= 5:
+        return RetinaFace(model_file=onnx_file, session=session)
+    if input_shape[2] == 192 and input_shape[3] == 192:
+        return Landmark(model_file=onnx_file, session=session)
+    if input_shape[2] == 96 and input_shape[3] == 96:
+        return Attribute(model_file=onnx_file, session=session)
+    if input_shape[2] == input_shape[3] and input_shape[2] >= 112 and input_shape[2] % 16 == 0:
+        return ArcFaceONNX(model_file=onnx_file, session=session)
+    return None
+
+
+class TunedFaceAnalysis(FaceAnalysis):
+    """
+    FaceAnalysis whose sessions are created with session_options().
+
+    Same model selection as FaceAnalysis (first model per task, restricted to
+    `allowed_modules`), but decided from the graph signature (model_task)
+    so skipped models never get a session; prepare() and get() are
+    inherited unchanged.
+
+    With ORT_MODEL_CACHE on the CPU provider, sessions are built from the
+    cached optimised graphs with optimisation disabled; without a writable
+    cache they optimise the original models as usual.
+    """
+
+    def __init__(
+            self,
+            name: str = "buffalo_l",
+            root: str = "~/.insightface",
+            allowed_modules: Sequence[str] | None = None,
+            providers: Sequence[str] | None = None,
+    ):
+        onnxruntime.set_default_logger_severity(3)
+        self.models = {}
+        self.model_dir = ensure_available("models", name, root=root)
+        providers = list(providers or ["CPUExecutionProvider"])
+        level = GRAPH_OPTIMIZATION_LEVELS[settings.ORT_GRAPH_OPTIMIZATION_LEVEL]
+        # Graphs optimised with the CPU provider only suit CPU sessions
+        use_cache = (
+            settings.ORT_MODEL_CACHE
+            and providers == ["CPUExecutionProvider"]
+            and level != onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        )
+        so = session_options()
+        cached_so = session_options(graph_optimization_level=onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL)
+        logger.info(
+            f"ONNX Runtime sessions: intra_op={so.intra_op_num_threads} inter_op={so.inter_op_num_threads} "
+            f"mode={settings.ORT_EXECUTION_MODE} optimization={settings.ORT_GRAPH_OPTIMIZATION_LEVEL} "
+            f"cache={'on' if use_cache else 'off'}"
+        )
+
+        t0 = time.perf_counter()
+        for onnx_file in sorted(glob.glob(osp.join(self.model_dir, "*.onnx"))):
+            task = model_task(onnx_file)
+            if task is None:
+                logger.warning(f"Model not recognized: {onnx_file}")
+                continue
+            if (allowed_modules is not None and task not in allowed_modules) or task in self.models:
+                continue
+            session_file, session_so = onnx_file, so
+            if use_cache:
+                try:
+                    session_file, session_so = cached_optimized_model(onnx_file, level), cached_so
+                except OSError as e:
+                    logger.warning(f"Model cache unavailable for {onnx_file}, optimising in memory: {e}")
+            session = onnxruntime.InferenceSession(session_file, session_so, providers=providers)
+            # insightface reads preprocessing constants from the original file
+            self.models[task] = model_for_session(onnx_file, session)
+        load_ms = (time.perf_counter() - t0) * 1000
+        MODEL_LOAD_MS.set(round(load_ms, 1))
+        logger.info(f"Loaded model pack '{name}' in {load_ms:.0f} ms")
+        assert "detection" in self.models
+        self.det_model = self.models["detection"]
@@ -0,0 +1,149 @@
+"""
+Model preloading for the forking launcher (app/launcher.py).
+
+The launcher loads the weights (initializers) of every model into numpy
+arrays in the parent process, then forks the workers. Each worker creates
+its own InferenceSession and hands ORT those arrays as initializers
+(SessionOptions.add_initializer). With weight prepacking disabled ORT
+computes straight from the caller's buffers, so every worker maps the same
+physical pages copy-on-write instead of holding a private ~170 MB copy.
+
+Models are optimised offline first (saved next to the pack), so that graph
+optimisations in the workers have nothing left to fuse: a fused Conv+BN
+would otherwise get a new, private weight tensor.
+
+Fork safety: no InferenceSession stays alive in the parent. ORT sessions own
+thread pools, and threads do not survive fork(); the parent only creates
+short-lived single-threaded sessions (optimisation, task routing) and drops
+them before any worker is forked.
+"""
+import glob
+import os.path as osp
+from dataclasses import dataclass, field
+from typing import Sequence
+
+import numpy as np
+import onnx
+import onnxruntime
+from onnx import numpy_helper
+from insightface.app import FaceAnalysis
+from insightface.utils import ensure_available
+
+from app.core.config import settings
+from app.core.logs import logger
+from app.models.model_cache import cached_optimized_model, _single_threaded_options
+from app.models.ort_session import model_for_session, session_options
+
+
+@dataclass(frozen=True)
+class PreloadedModel:
+    taskname: str
+    onnx_file: str        # original file; insightface reads preprocessing constants from it
+    optimized_file: str   # offline-optimised model the sessions are built from
+    initializers: dict[str, np.ndarray] = field(repr=False)  # shared copy-on-write after fork
+
+
+# model_name -> preloaded models of that pack; filled in the launcher parent
+_preloaded: dict[str, list[PreloadedModel]] = {}
+
+# Level the offline optimisation applies and the workers re-apply (a no-op on
+# an optimised model). ORT_ENABLE_ALL adds layout transformations that copy
+# Conv weights into a private, hardware-specific layout.
+_OPTIMIZATION_LEVEL = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+
+
+def load_initializers(model_file: str) -> dict[str, np.ndarray]:
+    """Weights of an ONNX model as contiguous numpy arrays, by initializer name."""
+    model = onnx.load(model_file)
+    return {
+        init.name: np.ascontiguousarray(numpy_helper.to_array(init))
+        for init in model.graph.initializer
+    }
+
+
+def preload_models(
+        model_name: str = "buffalo_l",
+        allowed_modules: Sequence[str] | None = None,
+        root: str = "~/.insightface",
+) -> list[PreloadedModel]:
+    """
+    Load the weights of a pack's models into memory (launcher parent only).
+
+    Optimised models come from the model cache (`<pack>/optimized/`, see
+    app.models.model_cache), built on first use. Only
+    models whose task is in `allowed_modules` are kept.
+    """
+    model_dir = ensure_available("models", model_name, root=root)
+
+    models: list[PreloadedModel] = []
+    for onnx_file in sorted(glob.glob(osp.join(model_dir, "*.onnx"))):
+        optimized_file = cached_optimized_model(onnx_file, _OPTIMIZATION_LEVEL)
+
+        # Throwaway single-threaded session, only to learn the task
+        model = model_for_session(
+            onnx_file,
+            onnxruntime.InferenceSession(optimized_file, _single_threaded_options(), providers=["CPUExecutionProvider"]),
+        )
+        taskname = model.taskname if model is not None else None
+        del model
+
+        if taskname is None or (allowed_modules is not None and taskname not in allowed_modules):
+            continue
+        if any(m.taskname == taskname for m in models):
+            continue
+        models.append(PreloadedModel(
+            taskname=taskname,
+            onnx_file=onnx_file,
+            optimized_file=optimized_file,
+            initializers=load_initializers(optimized_file),
+        ))
+
+    _preloaded[model_name] = models
+    total_mb = sum(a.nbytes for m in models for a in m.initializers.values()) / 1024 ** 2
+    logger.info(f"Preloaded {[m.taskname for m in models]} of '{model_name}' ({total_mb:.0f} MB)")
+    return models
+
+
+def get_preloaded(model_name: str) -> list[PreloadedModel] | None:
+    return _preloaded.get(model_name)
+
+
+def _shared_weights_options(preloaded: PreloadedModel) -> tuple[onnxruntime.SessionOptions, list]:
+    """
+    Session options that make ORT compute from the preloaded arrays.
+
+    Returns the OrtValues too: they wrap (not copy) the arrays and must
+    outlive the session.
+    """
+    # Threads and execution mode as configured; the optimisation level stays fixed
+    so = session_options(graph_optimization_level=_OPTIMIZATION_LEVEL)
+    if settings.PRELOAD_DISABLE_PREPACKING:
+        # Prepacking writes a private, re-laid-out copy of MatMul/Gemm/Conv weights per worker
+        so.add_session_config_entry("session.disable_prepacking", "1")
+    values = []
+    for name, array in preloaded.initializers.items():
+        value = onnxruntime.OrtValue.ortvalue_from_numpy(array)
+        so.add_initializer(name, value)
+        values.append(value)
+    return so, values
+
+
+class PreloadedFaceAnalysis(FaceAnalysis):
+    """
+    FaceAnalysis built from preloaded weights instead of the pack directory.
+
+    Call only after fork: the sessions created here own thread pools.
+    prepare() and get() are inherited unchanged.
+    """
+
+    def __init__(self, models: Sequence[PreloadedModel], providers: Sequence[str]):
+        onnxruntime.set_default_logger_severity(3)
+        self.models = {}
+        self._shared_initializers = []
+        for preloaded in models:
+            so, values = _shared_weights_options(preloaded)
+            session = onnxruntime.InferenceSession(preloaded.optimized_file, so, providers=list(providers))
+            self._shared_initializers.extend(values)
+            self.models[preloaded.taskname] = model_for_session(preloaded.onnx_file, session)
+        assert "detection" in self.models
+        self.det_model = self.models["detection"]
@@ -0,0 +1,197 @@
+"""
+Client side of the dedicated inference process (app/inference_server.py).
+
+API workers started with INFERENCE_SERVER_SOCKET use RemoteEmbedder instead
+of loading InsightFace themselves. Requests go over a Unix socket; the
+preprocessed image itself never travels through it: each connection owns a
+shared-memory buffer that the server maps once, the client copies the image
+into it and only sends its shape. Replies are small (one 512-float vector).
+"""
+import json
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import threading
+import uuid
+
+import numpy as np
+
+from app.schemas.detection import FaceEmbedding
+from app.utils.exceptions import NoFaceDetectedError, MultipleFacesDetectedError, InferenceServerError
+
+
+# Request header: op, dtype, 3 x u32 arguments
+#   ATTACH: a = length of the shared-memory file name that follows (a name
+#           in shm_dir() starting with SHM_PREFIX, not a path)
+#   EMBED:  a, b, c = image height, width, channels (image is in the buffer)
+#   STATS:  no arguments
+REQUEST = struct.Struct("<BBxxIII")
+OP_ATTACH, OP_EMBED, OP_STATS = 1, 2, 3
+
+# Reply header: status, u32 length of the payload that follows, detection score / face count
+#   OK:    payload = float32 embedding (EMBED), JSON metrics (STATS), empty (ATTACH)
+#   other: payload = utf-8 message
+REPLY = struct.Struct("<BxxxIf")
+STATUS_OK, STATUS_NO_FACE, STATUS_MULTIPLE_FACES, STATUS_INVALID, STATUS_ERROR = 0, 1, 2, 3, 4
+
+DTYPES = {0: np.dtype(np.uint8), 1: np.dtype(np.float32)}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+_MIN_BUFFER_BYTES = 4 * 1024 * 1024
+
+SHM_PREFIX = "face-api-ipc-"
+
+
+def shm_dir() -> str:
+    """tmpfs for the shared buffers; the temp dir where there is no /dev/shm."""
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def recv_exactly(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    while view:
+        received = sock.recv_into(view)
+        if received == 0:
+            raise ConnectionError("Inference server closed the connection")
+        view = view[received:]
+    return bytes(buf)
+
+
+class _Connection:
+    """One socket plus its shared image buffer; used by one thread at a time."""
+
+    def __init__(self, path: str, timeout_s: float):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout_s)
+        self.sock.connect(path)
+        self.buffer: mmap.mmap | None = None
+
+    def _attach(self, size: int) -> None:
+        # The server opens the file by name, then it is unlinked: nothing is
+        # left behind in /dev/shm, even if either side dies later.
+        filename = f"{SHM_PREFIX}{os.getpid()}-{uuid.uuid4().hex}"
+        name = os.path.join(shm_dir(), filename)
+        fd = os.open(name, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            buffer = mmap.mmap(fd, size)
+            try:
+                encoded = filename.encode()
+                self.sock.sendall(REQUEST.pack(OP_ATTACH, 0, len(encoded), 0, 0) + encoded)
+                self._reply()
+            except BaseException:
+                buffer.close()
+                raise
+        finally:
+            os.close(fd)
+            os.unlink(name)
+        if self.buffer is not None:
+            self.buffer.close()
+        self.buffer = buffer
+
+    def embed(self, img_array: np.ndarray) -> FaceEmbedding:
+        if not isinstance(img_array, np.ndarray) or img_array.ndim != 3 or img_array.dtype not in DTYPE_CODES:
+            raise ValueError("Input must be an HxWxC uint8/float32 numpy array")
+        if self.buffer is None or len(self.buffer) < img_array.nbytes:
+            self._attach(max(_MIN_BUFFER_BYTES, img_array.nbytes))
+
+        np.ndarray(img_array.shape, dtype=img_array.dtype, buffer=self.buffer)[...] = img_array
+        height, width, channels = img_array.shape
+        self.sock.sendall(REQUEST.pack(OP_EMBED, DTYPE_CODES[img_array.dtype], height, width, channels))
+        score, payload = self._reply()
+        return FaceEmbedding(embedding=np.frombuffer(payload, dtype=np.float32).copy(), detection_score=score)
+
+    def stats(self) -> dict:
+        self.sock.sendall(REQUEST.pack(OP_STATS, 0, 0, 0, 0))
+        _, payload = self._reply()
+        return json.loads(payload)
+
+    def _reply(self) -> tuple[float, bytes]:
+        """(value, payload) of an OK reply; other statuses are raised."""
+        status, length, value = REPLY.unpack(recv_exactly(self.sock, REPLY.size))
+        payload = recv_exactly(self.sock, length) if length else b""
+        if status == STATUS_OK:
+            return value, payload
+        if status == STATUS_NO_FACE:
+            raise NoFaceDetectedError()
+        if status == STATUS_MULTIPLE_FACES:
+            raise MultipleFacesDetectedError(int(value))
+        if status == STATUS_INVALID:
+            raise ValueError(payload.decode(errors="replace"))
+        raise InferenceServerError(payload.decode(errors="replace"))
+
+    def close(self) -> None:
+        self.sock.close()
+        if self.buffer is not None:
+            self.buffer.close()
+
+
+class RemoteEmbedder:
+    """
+    Stand-in for InsightFaceEmbedder that runs embed() in the inference server.
+
+    embed() is blocking and thread-safe, like the local one: every calling
+    thread (the executor threads of embed_image) takes an idle connection or
+    opens a new one. Batching across requests happens in the server, over
+    the requests of all API workers.
+    """
+
+    def __init__(self, path: str, timeout_s: float = 30):
+        self.path = path
+        self.timeout_s = timeout_s
+        self._idle: list[_Connection] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return _Connection(self.path, self.timeout_s)
+        except OSError as e:
+            raise InferenceServerError(f"Inference server unavailable at {self.path}: {e}") from e
+
+    def embed(self, img_array: np.ndarray) -> FaceEmbedding:
+        """
+        Extract the face embedding of a preprocessed image in the inference server.
+
+        Raises:
+            NoFaceDetectedError: When no face is found in the image
+            MultipleFacesDetectedError: When multiple faces are detected
+            ValueError: When the image is not an HxWx3 array
+            InferenceServerError: When the server is unreachable or failed
+        """
+        return self._call(lambda conn: conn.embed(img_array))
+
+    def stats(self) -> dict:
+        """Metrics snapshot of the inference server process that answers."""
+        return self._call(lambda conn: conn.stats())
+
+    def _call(self, fn):
+        conn = self._acquire()
+        try:
+            result = fn(conn)
+        except (NoFaceDetectedError, MultipleFacesDetectedError, ValueError, InferenceServerError):
+            self._release(conn)  # answered by the server (or rejected before sending): still in sync
+            raise
+        except OSError as e:
+            conn.close()
+            raise InferenceServerError(f"Inference server connection failed: {e}") from e
+        except BaseException:
+            conn.close()
+            raise
+        self._release(conn)
+        return result
+
+    def _release(self, conn: _Connection) -> None:
+        with self._lock:
+            self._idle.append(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
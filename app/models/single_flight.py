@@ -0,0 +1,51 @@
+"""
+Request coalescing: concurrent callers with the same key share one computation.
+"""
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+COALESCED = metrics.counter("single_flight_coalesced", "Callers that awaited an identical in-flight computation")
+LEADERS = metrics.counter("single_flight_leaders", "Computations started by single-flight (first caller per key)")
+
+
+class SingleFlight(Generic[T]):
+    """
+    At most one in-flight computation per key.
+
+    The first caller starts `fn()` as its own task; callers that arrive with
+    the same key while it runs await that task instead of starting another.
+    Everyone gets the same result or the same exception. Because the work
+    runs in a separate task, a caller that is cancelled (e.g. the client of
+    the first request disconnects) does not cancel it for the others.
+
+    Keys are forgotten as soon as the computation finishes: this coalesces
+    concurrent duplicates only, caching is a separate concern.
+    """
+
+    def __init__(self):
+        self._inflight: dict[bytes, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: bytes, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            COALESCED.inc()
+        else:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            LEADERS.inc()
+        return await asyncio.shield(task)
+
+    def _forget(self, key: bytes, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved: no "never retrieved" warning if every caller went away
@@ -6,4 +6,12 @@ class FaceEmbedding(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
     
     embedding: np.ndarray = Field(..., description="Face embedding vector")
+    detection_score: float = Field(..., ge=0.0, le=1.0, description="Detection confidence score")
+
+
+# Aligned face crop produced by detection, input to the recognition model
+class AlignedFace(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    crop: np.ndarray = Field(..., description="Aligned face crop (112, 112, 3), BGR, uint8")
     detection_score: float = Field(..., ge=0.0, le=1.0, description="Detection confidence score")
\ No newline at end of file
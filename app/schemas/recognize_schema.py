@@ -1,6 +1,16 @@
 from pydantic import BaseModel, Field, ConfigDict
 from uuid import UUID
-from typing import Optional
+from typing import Literal, Optional
+
+
+class RecognitionCandidate(BaseModel):
+    user_id: UUID = Field(..., description="Candidate user ID")
+    similarity: float = Field(..., ge=-1.0, le=1.0, description="Best similarity over the user's faces")
+
+
+class RecognizeEmbeddingRequest(BaseModel):
+    embedding: str = Field(..., max_length=4096, description="Base64 of 512 little-endian floats, L2-normalised (ArcFace output)")
+    dtype: Literal["float32", "float16"] = Field("float32", description="Element type of the encoded embedding")
 
 
 class RecognizeResponse(BaseModel):
@@ -8,4 +18,14 @@ class RecognizeResponse(BaseModel):
 
     match: bool = Field(..., description="Whether a match was found")
     user_id: Optional[UUID] = Field(None, description="Matched user ID (None if no match)")
-    similarity: float = Field(0.0, ge=-1.0, le=1.0, description="Similarity score")
\ No newline at end of file
+    similarity: float = Field(0.0, ge=-1.0, le=1.0, description="Similarity score")
+    candidates: list[RecognitionCandidate] = Field(default_factory=list, description="Top-k users, most similar first")
+
+
+class RecognizeBatchItem(BaseModel):
+    """One NDJSON line of /recognize/batch, emitted as soon as that image is resolved."""
+    index: int = Field(..., ge=0, description="Position of the image in the uploaded batch")
+    filename: Optional[str] = Field(None, description="Uploaded file name")
+    status_code: int = Field(200, description="HTTP status /recognize would have returned for this image")
+    result: Optional[RecognizeResponse] = Field(None, description="Recognition result (status_code 200 only)")
+    detail: Optional[str] = Field(None, description="Error detail (status_code != 200)")
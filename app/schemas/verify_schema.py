@@ -0,0 +1,10 @@
+# Schema for 1:1 verification
+from pydantic import BaseModel, Field
+from uuid import UUID
+
+
+class VerifyResponse(BaseModel):
+    user_id: UUID = Field(..., description="Person the probe was compared against (the caller)")
+    verified: bool = Field(..., description="Whether the probe matches one of the person's registered faces")
+    similarity: float = Field(..., ge=-1.0, le=1.0, description="Best similarity over the person's faces")
+    faces_compared: int = Field(..., ge=0, description="Number of registered faces compared")
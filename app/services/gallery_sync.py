@@ -0,0 +1,108 @@
+import asyncio
+import json
+from uuid import UUID
+
+import psycopg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.core.logs import logger
+from app.core.metrics import metrics
+from app.db.session import AsyncSessionLocal
+from app.models.gallery import GalleryIndex
+from app.services.vector_search import embedding_array
+
+# Channel fired by the faces_changed_notify trigger (alembic 3b9d2f71c4a8)
+FACES_CHANNEL = "faces_changed"
+
+GALLERY_FACES = metrics.gauge("gallery_faces", "Faces held in the in-process gallery index")
+GALLERY_RELOADS = metrics.counter("gallery_reloads", "Full gallery loads from the faces table")
+GALLERY_UPDATES = metrics.counter("gallery_updates", "Gallery changes applied from NOTIFY")
+
+
+def _listen_dsn() -> str:
+    # psycopg wants a libpq URL, not the SQLAlchemy "postgresql+psycopg" one
+    return make_url(str(settings.DATABASE_URL)).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class GallerySync:
+    """
+    Keep a GalleryIndex consistent with the faces table.
+
+    A dedicated autocommit connection LISTENs on FACES_CHANNEL before the
+    full load, so no change can fall between the snapshot and the feed.
+    If the connection drops, the index is cleared (recognition falls back to
+    pgvector) and rebuilt after reconnecting.
+    """
+
+    def __init__(self, gallery: GalleryIndex, max_backoff_s: float = 30.0):
+        self.gallery = gallery
+        self.max_backoff_s = max_backoff_s
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="gallery-sync")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.gallery.clear()
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(_listen_dsn(), autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {FACES_CHANNEL}")
+                    await self.reload()
+                    backoff = 1.0
+                    async for notify in conn.notifies():
+                        await self.apply(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Gallery sync interrupted, falling back to pgvector: {type(e).__name__}: {e}")
+
+            self.gallery.clear()
+            GALLERY_FACES.set(0)
+            await asyncio.sleep(backoff)
+            backoff = min(2 * backoff, self.max_backoff_s)
+
+    async def reload(self) -> None:
+        """Load every face from the database into the index."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(text("SELECT face_id, user_id, embedding FROM faces"))
+            rows = [(face_id, user_id, embedding_array(embedding)) for face_id, user_id, embedding in result]
+        self.gallery.load(rows)
+        GALLERY_RELOADS.inc()
+        GALLERY_FACES.set(len(self.gallery))
+
+    async def apply(self, payload: str) -> None:
+        """Apply one faces_changed notification."""
+        change = json.loads(payload)
+        face_id = UUID(change["face_id"])
+
+        if change["op"] == "DELETE":
+            self.gallery.remove(face_id)
+        else:
+            # INSERT/UPDATE: the payload has ids only, fetch the committed row
+            async with AsyncSessionLocal() as db:
+                row = (await db.execute(
+                    text("SELECT user_id, embedding FROM faces WHERE face_id = :face_id"),
+                    {"face_id": face_id},
+                )).first()
+            if row is None:
+                # Deleted again before we got to it; its DELETE follows
+                self.gallery.remove(face_id)
+            else:
+                self.gallery.add(face_id, row[0], embedding_array(row[1]))
+
+        GALLERY_UPDATES.inc()
+        GALLERY_FACES.set(len(self.gallery))
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+from collections.abc import Awaitable, Callable
+from functools import partial
+
+import numpy as np
+from fastapi import HTTPException, status
+
+from app.models.admission import AdmissionController
+from app.models.insightface import InsightFaceEmbedder
+from app.models.batcher import MicroBatcher
+from app.models.embedding_cache import EmbeddingCache
+from app.models.single_flight import SingleFlight
+from app.core.config import settings
+from app.schemas.detection import FaceEmbedding
+from app.utils.exceptions import NoFaceDetectedError, MultipleFacesDetectedError, OverloadedError
+
+# Concurrent identical uploads of this worker share one inference run
+_inflight: SingleFlight[FaceEmbedding] = SingleFlight()
+
+# Bounded inference queue of this worker, created from settings on first use
+_admission: AdmissionController | None = None
+
+# Uploads above this size are hashed in the thread pool instead of on the event loop
+_INLINE_HASH_MAX_BYTES = 256 * 1024
+
+
+async def embed_image(
+        img_array: np.ndarray,
+        embedder: InsightFaceEmbedder,
+        batcher: MicroBatcher | None = None,
+) -> FaceEmbedding:
+    """
+    Extract the face embedding of a preprocessed image without blocking the event loop.
+
+    With a batcher, detection runs on its own in the thread pool and the aligned
+    crop is handed to the batcher so the recognition model runs once for all
+    concurrent requests. Without one, the whole embed() call runs in the pool.
+
+    Raises:
+        NoFaceDetectedError: When no face is found in the image
+        MultipleFacesDetectedError: When multiple faces are detected
+    """
+    loop = asyncio.get_running_loop()
+
+    if batcher is None:
+        return await loop.run_in_executor(None, partial(embedder.embed, img_array))
+
+    aligned = await loop.run_in_executor(None, partial(embedder.detect_and_align, img_array))
+    embedding = await batcher.submit(aligned.crop)
+    return FaceEmbedding(embedding=embedding, detection_score=aligned.detection_score)
+
+
+def get_admission() -> AdmissionController:
+    global _admission
+    if _admission is None:
+        concurrency = settings.ADMISSION_CONCURRENCY or (settings.BATCH_MAX_SIZE if settings.BATCHING_ENABLED else 2)
+        _admission = AdmissionController(
+            concurrency=concurrency,
+            max_queue_depth=settings.ADMISSION_MAX_QUEUE_DEPTH,
+            latency_budget_ms=settings.ADMISSION_LATENCY_BUDGET_MS,
+        )
+    return _admission
+
+
+def _admitted(embed: Callable[[], Awaitable[FaceEmbedding]]) -> Callable[[], Awaitable[FaceEmbedding]]:
+    async def run() -> FaceEmbedding:
+        try:
+            return await get_admission().run(embed)
+        except OverloadedError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after_s)},
+            )
+    return run
+
+
+def _upload_key(image_data: bytes | memoryview, cache: EmbeddingCache | None) -> bytes:
+    # Same digest as the cache when there is one, so both agree on "identical"
+    if cache is not None:
+        return cache.key(image_data)
+    return hashlib.blake2b(image_data, digest_size=16).digest()
+
+
+async def cached_embed(
+        image_data: bytes | memoryview,
+        cache: EmbeddingCache | None,
+        embed: Callable[[], Awaitable[FaceEmbedding]],
+        single_flight: bool | None = None,
+        admission: bool | None = None,
+) -> FaceEmbedding:
+    """
+    Outcome of `embed()` for this upload, served from the embedding cache when
+    the same bytes were seen before.
+
+    A cached no-face / multiple-faces outcome is raised again, so callers see
+    exactly what a fresh run would have produced. Other errors are not cached.
+
+    With single-flight (None = INFERENCE_SINGLE_FLIGHT), byte-identical
+    uploads that arrive while the first one is still being embedded wait
+    for that run instead of starting their own.
+
+    With admission control (None = ADMISSION_ENABLED), `embed()` waits for
+    a slot of the worker's bounded inference queue; cache hits and
+    single-flight followers do not take one.
+
+    Raises:
+        HTTPException: 503 with Retry-After when admission control sheds the request
+    """
+    if single_flight is None:
+        single_flight = settings.INFERENCE_SINGLE_FLIGHT
+    if admission is None:
+        admission = settings.ADMISSION_ENABLED
+    if admission:
+        embed = _admitted(embed)
+    if cache is None and not single_flight:
+        return await embed()
+
+    if len(image_data) > _INLINE_HASH_MAX_BYTES:
+        key = await asyncio.get_running_loop().run_in_executor(None, _upload_key, image_data, cache)
+    else:
+        key = _upload_key(image_data, cache)
+
+    if cache is not None:
+        cached = cache.get(key)
+        if isinstance(cached, Exception):
+            raise cached
+        if cached is not None:
+            return cached
+
+    async def run() -> FaceEmbedding:
+        try:
+            embedding_obj = await embed()
+        except (NoFaceDetectedError, MultipleFacesDetectedError) as e:
+            if cache is not None:
+                cache.put(key, e)
+            raise
+        if cache is not None:
+            cache.put(key, embedding_obj)
+        return embedding_obj
+
+    if single_flight:
+        return await _inflight.do(key, run)
+    return await run()
@@ -0,0 +1,46 @@
+from fastapi import UploadFile, HTTPException, status
+from starlette.formparsers import MultiPartParser
+from app.core.logs import logger
+
+
+def configure_upload_spooling(max_size: int) -> None:
+    """
+    Keep multipart file parts up to `max_size` bytes in memory.
+
+    Starlette spools every file part into a SpooledTemporaryFile that rolls over
+    to disk at 1 MB, so a typical 2-5 MB photo would otherwise be written to and
+    read back from a temp file on every request.
+    """
+    MultiPartParser.spool_max_size = max_size
+    logger.debug(f"Multipart uploads up to {max_size} bytes stay in memory")
+
+
+def read_upload(file: UploadFile, max_size: int) -> memoryview:
+    """
+    Read an uploaded file exactly once into a single immutable buffer.
+
+    Size limit, format sniffing and decoding all work on the returned
+    memoryview, so the upload is never read or copied again.
+
+    Raises:
+        HTTPException(413): If the upload is larger than max_size
+    """
+    # Starlette counts bytes while parsing, so oversized uploads are rejected without reading them
+    if file.size is not None and file.size > max_size:
+        logger.error(f"Upload rejected: {file.size} bytes exceeds {max_size}")
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large"
+        )
+
+    file.file.seek(0)
+    data = file.file.read(max_size + 1)
+    if len(data) > max_size:
+        logger.error(f"Upload rejected: more than {max_size} bytes")
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large"
+        )
+
+    logger.debug(f"Read upload {file.filename!r}: {len(data)} bytes")
+    return memoryview(data)
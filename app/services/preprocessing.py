@@ -1,28 +1,40 @@
 import numpy as np
 import io
+import math
+import time
+import asyncio
 import cv2
-from PIL import Image, ImageOps
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from PIL import Image, ImageOps, ExifTags
 from typing import Set
 from app.core.logs import logger
-from app.core.config import ImageConfig
+from app.core.config import ImageConfig, settings
+from app.core.metrics import metrics
+from app.services.validation import validate_image
 from app.utils.exceptions import ImageProcessingError
 
 Image.MAX_IMAGE_PIXELS = ImageConfig().max_image_pixels * 2
 
 
 def decode_image(
-        file,
+        data: bytes | memoryview,
         max_dimensions: tuple[int, int] = None,
         allowed_formats: Set[str] = None,
+        target_max_dim: int = None,
 ) -> Image.Image:
     """
     Decode an uploaded image file that has already been validated.
 
+    JPEGs larger than the inference size are decoded directly at a reduced
+    scale (1/2, 1/4 or 1/8 in the DCT domain) that still keeps the longest
+    side >= target_max_dim, so resize_if_needed only has a small resize left.
+
     Args:
-        file: File-like object with async read() method
+        data: Upload buffer (as returned by read_upload)
         max_dimensions: Maximum (width, height) tuple
         allowed_formats: Set of allowed PIL formats (JPEG, PNG, etc.)
-        verify_format: Whether to verify PIL format matches expected
+        target_max_dim: Longest side the pipeline will resize to (0 decodes at full size)
 
     Returns:
         PIL Image object with corrected orientation
@@ -34,23 +46,17 @@ def decode_image(
         max_dimensions = ImageConfig().max_dimensions
     if allowed_formats is None:
         allowed_formats = ImageConfig().allowed_formats
+    if target_max_dim is None:
+        target_max_dim = ImageConfig().target_max_dim
     verify_format = ImageConfig().verify_format
     try:
-        # Read the already-validated file
-        bytes_data = file.read()
-
-        if not bytes_data:
+        if not len(data):
             logger.error("Empty file data received")
             raise ImageProcessingError("Empty file data received")
-        logger.debug(f"Read {len(bytes_data)} bytes from file")
 
         # Decode image
         logger.debug("Decoding image...")
-        stream = io.BytesIO(bytes_data)
-        img = Image.open(stream)
-
-        # Verify the image actually loaded
-        img.load()  # Forces PIL to fully decode and validate the image
+        img = Image.open(_as_stream(data))
 
         # Verify the image format is allowed
         if verify_format and img.format not in allowed_formats:
@@ -63,22 +69,29 @@ def decode_image(
         # Capture original format
         original_format = img.format
 
-        # Apply EXIF orientation correction
-        img = ImageOps.exif_transpose(img)
-
-        # Validate dimensions
-        if img.width > max_dimensions[0] or img.height > max_dimensions[1]:
+        # Validate dimensions from the header, as they will be after EXIF orientation
+        width, height = _oriented_size(img)
+        if width > max_dimensions[0] or height > max_dimensions[1]:
             logger.error(f"Image dimensions exceed maximum {max_dimensions}")
             raise ImageProcessingError(
-                f"Image dimensions ({img.width}x{img.height}) exceed "
+                f"Image dimensions ({width}x{height}) exceed "
                 f"maximum {max_dimensions}"
             )
 
+        # Let the JPEG decoder downscale while decoding
+        if target_max_dim and original_format == "JPEG" and max(img.size) > target_max_dim:
+            scale = max(img.size) / target_max_dim
+            img.draft("RGB", (math.ceil(img.width / scale), math.ceil(img.height / scale)))
 
+        # Verify the image actually loaded
+        img.load()  # Forces PIL to fully decode and validate the image
+
+        # Apply EXIF orientation correction
+        img = ImageOps.exif_transpose(img)
 
         logger.debug(
-            f"Decoded image: {original_format}, {img.width}x{img.height}, "
-            f"mode={img.mode}, size={len(bytes_data)} bytes"
+            f"Decoded image: {original_format}, {width}x{height} -> {img.width}x{img.height}, "
+            f"mode={img.mode}, size={len(data)} bytes"
         )
 
         return img
@@ -95,6 +108,22 @@ def decode_image(
 
 
 
+def _as_stream(data: bytes | memoryview) -> io.BytesIO:
+    """Wrap the upload buffer in a stream without copying it."""
+    # BytesIO shares (rather than copies) the buffer of an immutable bytes object
+    if isinstance(data, memoryview) and isinstance(data.obj, bytes) and data.nbytes == len(data.obj):
+        data = data.obj
+    return io.BytesIO(data)
+
+
+def _oriented_size(img: Image.Image) -> tuple[int, int]:
+    """Image (width, height) after EXIF orientation is applied, read from the header only."""
+    orientation = img.getexif().get(ExifTags.Base.Orientation)
+    if orientation in (5, 6, 7, 8):  # transposed / rotated by 90 or 270 degrees
+        return img.height, img.width
+    return img.width, img.height
+
+
 def load_image(img: Image.Image) -> np.asarray:
 
    try:
@@ -116,8 +145,9 @@ def load_image(img: Image.Image) -> np.asarray:
        raise ImageProcessingError(f"Failed to convert image to array: {str(e)}") from e
 
 
-def resize_if_needed(img_array:np.asarray):
-    max_dim = 640
+def resize_if_needed(img_array:np.asarray, max_dim: int = None):
+    if max_dim is None:
+        max_dim = ImageConfig().target_max_dim
     h, w = img_array.shape[:2]
 
     if max(h, w) > max_dim:
@@ -129,4 +159,90 @@ def resize_if_needed(img_array:np.asarray):
         return img_array
     else:
         logger.debug(f"Image dimensions {w}x{h} are within limits")
-        return img_array
\ No newline at end of file
+        return img_array
+
+
+# ── Off-loop preprocessing ───────────────────────────────────────────────────
+# validate -> decode -> load -> resize is CPU-bound (a 4096px PNG decode takes
+# hundreds of ms), so the whole chain runs as one unit in a dedicated pool and
+# the event loop only awaits the result.
+
+PREPROCESS_STAGES = ("validate", "decode", "load", "resize")
+_STAGE_HISTOGRAMS = {
+    stage: metrics.histogram(
+        f"preprocess_{stage}_ms",
+        buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000),
+        description=f"Time spent in the {stage} stage of preprocessing",
+    )
+    for stage in PREPROCESS_STAGES
+}
+_QUEUE_WAIT_HISTOGRAM = metrics.histogram(
+    "preprocess_queue_wait_ms",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000),
+    description="Time an upload waits for a free preprocessing worker",
+)
+
+
+@dataclass
+class PreprocessResult:
+    img_array: np.ndarray
+    timings_ms: dict[str, float] = field(default_factory=dict)
+
+
+def preprocess_image(data: bytes | memoryview) -> PreprocessResult:
+    """
+    Run the full preprocessing chain on an upload buffer.
+
+    Returns:
+        PreprocessResult with the BGR array ready for the embedder and per-stage timings
+
+    Raises:
+        ImageProcessingError: If the format is unsupported or the image cannot be decoded
+    """
+    timings = {}
+
+    t0 = time.perf_counter()
+    try:
+        validate_image(data)
+    except ValueError as e:
+        raise ImageProcessingError(str(e)) from e
+    t1 = time.perf_counter()
+    image_pil = decode_image(data)
+    t2 = time.perf_counter()
+    img_array = load_image(image_pil)
+    t3 = time.perf_counter()
+    img_array = resize_if_needed(img_array)
+    t4 = time.perf_counter()
+
+    for stage, start, end in zip(PREPROCESS_STAGES, (t0, t1, t2, t3), (t1, t2, t3, t4)):
+        timings[stage] = (end - start) * 1000
+        _STAGE_HISTOGRAMS[stage].observe(timings[stage])
+
+    return PreprocessResult(img_array=img_array, timings_ms=timings)
+
+
+_executor: ThreadPoolExecutor | None = None
+
+def get_preprocess_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PREPROCESS_WORKERS,
+            thread_name_prefix="preprocess"
+        )
+    return _executor
+
+
+async def preprocess_upload(data: bytes | memoryview) -> PreprocessResult:
+    """Run preprocess_image() in the preprocessing pool without blocking the event loop."""
+    submitted = time.perf_counter()
+
+    def _run() -> PreprocessResult:
+        wait_ms = (time.perf_counter() - submitted) * 1000
+        _QUEUE_WAIT_HISTOGRAM.observe(wait_ms)
+        result = preprocess_image(data)
+        result.timings_ms["queue_wait"] = wait_ms
+        return result
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_preprocess_executor(), _run)
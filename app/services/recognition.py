@@ -1,109 +1,149 @@
-import os
+import asyncio
 import time
-from functools import partial
+from collections.abc import AsyncIterator
+
+import numpy as np
 
-from fastapi import UploadFile, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import text
 from app.db.models import User, Face
-from app.services.preprocessing import decode_image, load_image, resize_if_needed
-from app.services.validation import validate_image
+from app.db.session import AsyncSessionLocal
+from app.services.preprocessing import preprocess_upload
 from app.models.insightface import InsightFaceEmbedder
+from app.models.batcher import MicroBatcher
+from app.models.gallery import GalleryIndex
+from app.models.embedding_cache import EmbeddingCache
+from app.schemas.detection import FaceEmbedding
+from app.services.inference import embed_image, cached_embed
+from app.services.validation import decode_embedding
+from app.services.vector_search import nearest_users, nearest_users_batch, resolve_ef_search
 from app.utils.exceptions import (
     NoFaceDetectedError,
     MultipleFacesDetectedError,
     ImageProcessingError,
 )
+from app.core.config import settings
 from app.core.logs import logger
-from app.schemas.recognize_schema import RecognizeResponse
+from app.schemas.recognize_schema import RecognizeResponse, RecognitionCandidate, RecognizeBatchItem
 from app.models.matcher import InsightFaceMatcher
-import asyncio
-from functools import partial
+from app.core.metrics import metrics
+
+GALLERY_SEARCHES = metrics.counter("gallery_searches", "Recognitions served by the in-process gallery index")
+PGVECTOR_SEARCHES = metrics.counter("pgvector_searches", "Recognitions served by the pgvector HNSW query")
+BATCH_IMAGES = metrics.counter("recognition_batch_images", "Images received through /recognize/batch")
+BATCH_STATEMENTS = metrics.counter("recognition_batch_statements", "Grouped nearest-users statements run for /recognize/batch")
 
-BENCHMARK_MODE: bool = os.getenv("BENCHMARK_MODE", "false").lower() == "true"
+
+def _build_response(rows, matcher: InsightFaceMatcher) -> RecognizeResponse:
+    """Turn ranked (user_id, similarity) rows into the /recognize response."""
+    if not rows:
+        logger.warning("No faces in database")
+        return RecognizeResponse(user_id=None, similarity=0.0, match=False)
+
+    candidates = [
+        RecognitionCandidate(user_id=user_id, similarity=min(1.0, max(-1.0, float(similarity))))
+        for user_id, similarity in rows
+    ]
+    best = candidates[0]
+
+    if best.similarity >= matcher.threshold:
+        logger.info(f"User recognized: user_id={best.user_id} similarity={best.similarity:.3f}")
+        return RecognizeResponse(
+            match=True,
+            user_id=best.user_id,
+            similarity=best.similarity,
+            candidates=candidates,
+        )
+    else:
+        logger.info(f"No match found (best similarity: {best.similarity:.3f})")
+        return RecognizeResponse(
+            user_id=None,
+            similarity=best.similarity,
+            match=False,
+            candidates=candidates,
+        )
+
+
+async def _search(
+        query_embedding: np.ndarray,
+        db: AsyncSession,
+        k: int,
+        ef_search: int,
+        gallery: GalleryIndex | None,
+):
+    """Top-k (user_id, similarity) rows from the gallery if it is ready, else pgvector."""
+    if gallery is not None and gallery.ready:
+        # Exact search over the in-memory gallery, no DB round trip
+        logger.info(f"Recognizing top-{k} users via in-process gallery index...")
+        GALLERY_SEARCHES.inc()
+        return gallery.search(query_embedding, k=k)
+
+    logger.info(f"Recognizing top-{k} users via pgvector HNSW index (ef_search={ef_search})...")
+    # First statement on the request session: its pooled connection is only
+    # checked out now, once the embedding is ready.
+    # Bound as a binary pgvector parameter (float32 bytes, no text round trip)
+    rows = await nearest_users(db, query_embedding, k=k, ef_search=ef_search)
+    PGVECTOR_SEARCHES.inc()
+    return rows
 
 
 async def recognize_user(
-        file: UploadFile,
+        image_data: memoryview,
         embedder: InsightFaceEmbedder,
         matcher: InsightFaceMatcher,
-        db: Session,
+        db: AsyncSession,
         request: Request | None = None,
+        batcher: MicroBatcher | None = None,
+        k: int = 1,
+        profile: str | None = None,
+        gallery: GalleryIndex | None = None,
+        cache: EmbeddingCache | None = None,
 ) -> RecognizeResponse:
 
+    # Reject an unknown profile before spending any inference time
     try:
-        validate_image(file.file)
+        ef_search = resolve_ef_search(profile)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
 
     try:
-        image_pil = decode_image(file.file)
-        img_array = load_image(image_pil)
-        img_array = resize_if_needed(img_array)
-        # ── Inference phase ───────────────────────────────────────────────────
-        # Run CPU-bound inference in thread pool so the event loop
-        # can accept other requests while this blocks
-        _ti0 = time.perf_counter()
-        loop = asyncio.get_running_loop()
-        embedding_obj = await loop.run_in_executor(
-            None,
-            partial(embedder.embed, img_array)
-        )
-        _ti1 = time.perf_counter()
-        if BENCHMARK_MODE and request is not None:
-            request.state.inference_time_ms = (_ti1 - _ti0) * 1000
+        async def embed() -> FaceEmbedding:
+            # ── Preprocessing phase ───────────────────────────────────────────
+            # validate -> decode -> load -> resize runs in the preprocessing pool
+            preprocessed = await preprocess_upload(image_data)
+            img_array = preprocessed.img_array
+            if settings.BENCHMARK_MODE and request is not None:
+                request.state.preprocess_timings_ms = preprocessed.timings_ms
 
+            # ── Inference phase ───────────────────────────────────────────────
+            # Run CPU-bound inference in thread pool so the event loop
+            # can accept other requests while this blocks; with a batcher the
+            # recognition model runs once for all concurrent requests
+            _ti0 = time.perf_counter()
+            embedding_obj = await embed_image(img_array, embedder, batcher)
+            _ti1 = time.perf_counter()
+            if settings.BENCHMARK_MODE and request is not None:
+                request.state.inference_time_ms = (_ti1 - _ti0) * 1000
+            return embedding_obj
 
-        query_embedding = embedding_obj.embedding  # numpy array, L2-normalised
-
-        logger.info("Recognizing user via pgvector HNSW index...")
+        # Byte-identical uploads skip both phases
+        embedding_obj = await cached_embed(image_data, cache, embed)
 
-        # Format the vector as a literal string pgvector understands.
-        # This is required — passing via subquery prevents index usage.
-        vec_literal = "[" + ",".join(map(str, query_embedding.tolist())) + "]"
+        query_embedding = embedding_obj.embedding  # numpy array, L2-normalised
 
         _t0 = time.perf_counter()
-        result = db.execute(
-            text("""
-                 SELECT f.face_id,
-                        f.user_id,
-                        1 - (f.embedding <=> CAST(:vec AS vector)) AS similarity
-                 FROM faces f
-                          JOIN users u ON f.user_id = u.user_id
-                 ORDER BY f.embedding <=> CAST(:vec AS vector)
-                LIMIT 1
-                 """),
-            {"vec": vec_literal}
-        ).fetchone()
+        rows = await _search(query_embedding, db, k, ef_search, gallery)
         _t1 = time.perf_counter()
 
-        if BENCHMARK_MODE and request is not None:
+        if settings.BENCHMARK_MODE and request is not None:
             request.state.db_time_ms = (_t1 - _t0) * 1000
             request.state.similarity_time_ms = 0.0
 
-        if result is None:
-            logger.warning("No faces in database")
-            return RecognizeResponse(user_id=None, similarity=0.0, match=False)
-
-        face_id, user_id, similarity = result
-        similarity = float(similarity)
-
-        if similarity >= matcher.threshold:
-            logger.info(f"User recognized: user_id={user_id} similarity={similarity:.3f}")
-            return RecognizeResponse(
-                match=True,
-                user_id=user_id,
-                similarity=min(1.0, max(-1.0, similarity)),
-            )
-        else:
-            logger.info(f"No match found (best similarity: {similarity:.3f})")
-            return RecognizeResponse(
-                user_id=None,
-                similarity=min(1.0, max(-1.0, similarity)),
-                match=False,
-            )
+        return _build_response(rows, matcher)
 
+    except HTTPException:
+        raise
     except (ImageProcessingError, NoFaceDetectedError, MultipleFacesDetectedError) as e:
         raise HTTPException(status_code=422, detail=str(e))
     except SQLAlchemyError as e:
@@ -111,4 +151,141 @@ async def recognize_user(
         raise HTTPException(status_code=500, detail="Database error occurred")
     except Exception as e:
         logger.error(f"Unexpected error: {type(e).__name__}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Recognition failed")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Recognition failed")
+
+
+async def recognize_embedding(
+        encoded: str,
+        dtype: str,
+        matcher: InsightFaceMatcher,
+        db: AsyncSession,
+        k: int = 1,
+        profile: str | None = None,
+        gallery: GalleryIndex | None = None,
+) -> RecognizeResponse:
+    """
+    Recognize a client-computed embedding: no preprocessing, no inference.
+
+    The embedding must come from the same ArcFace model as the registered
+    faces, otherwise similarities against the gallery are meaningless.
+    """
+    try:
+        ef_search = resolve_ef_search(profile)
+        query_embedding = decode_embedding(encoded, dtype)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    try:
+        rows = await _search(query_embedding, db, k, ef_search, gallery)
+        return _build_response(rows, matcher)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during recognition: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Recognition failed")
+
+
+async def _embed_upload(
+        image_data: memoryview,
+        embedder: InsightFaceEmbedder,
+        batcher: MicroBatcher | None,
+        cache: EmbeddingCache | None = None,
+) -> np.ndarray:
+    async def embed() -> FaceEmbedding:
+        preprocessed = await preprocess_upload(image_data)
+        return await embed_image(preprocessed.img_array, embedder, batcher)
+
+    embedding_obj = await cached_embed(image_data, cache, embed)
+    return embedding_obj.embedding
+
+
+async def recognize_batch(
+        images: list[tuple[str | None, memoryview]],
+        embedder: InsightFaceEmbedder,
+        matcher: InsightFaceMatcher,
+        batcher: MicroBatcher | None = None,
+        k: int = 1,
+        ef_search: int = 40,
+        gallery: GalleryIndex | None = None,
+        cache: EmbeddingCache | None = None,
+) -> AsyncIterator[RecognizeBatchItem]:
+    """
+    Recognize many uploads, yielding one item per image as soon as it is resolved.
+
+    Up to RECOGNITION_BATCH_MAX_INFLIGHT images are preprocessed and embedded
+    concurrently (with a batcher, their crops share recognition runs). Each
+    goes through admission control; the cap keeps one upload from taking
+    every slot and queue entry of the worker. Whenever embeddings finish, all
+    of the ones ready at that moment are resolved together with a single
+    unnest + LATERAL statement, so a batch whose inference completes together
+    costs one query. Items therefore arrive in completion order; `index`
+    ties them back to the upload. Per-image failures become error items
+    instead of failing the whole stream.
+
+    The stream outlives the route function, so it cannot rely on the
+    request-scoped get_async_db session. Each grouped statement runs in a
+    short session of its own: no connection is held while the remaining
+    images are embedded or the client reads the stream.
+    """
+    BATCH_IMAGES.inc(len(images))
+    inflight = asyncio.Semaphore(settings.RECOGNITION_BATCH_MAX_INFLIGHT)
+
+    async def embed(data: memoryview) -> np.ndarray:
+        async with inflight:
+            return await _embed_upload(data, embedder, batcher, cache)
+
+    tasks = {
+        asyncio.create_task(embed(data)): index
+        for index, (_, data) in enumerate(images)
+    }
+    pending = set(tasks)
+
+    def item(index: int, **fields) -> RecognizeBatchItem:
+        return RecognizeBatchItem(index=index, filename=images[index][0], **fields)
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            ready: list[tuple[int, np.ndarray]] = []
+            for task in sorted(done, key=tasks.get):
+                index = tasks[task]
+                try:
+                    ready.append((index, task.result()))
+                except (ImageProcessingError, NoFaceDetectedError, MultipleFacesDetectedError) as e:
+                    yield item(index, status_code=422, detail=str(e))
+                except HTTPException as e:
+                    yield item(index, status_code=e.status_code, detail=e.detail)
+                except Exception as e:
+                    logger.error(f"Unexpected error in batch item {index}: {type(e).__name__}: {e}", exc_info=True)
+                    yield item(index, status_code=500, detail="Recognition failed")
+
+            if not ready:
+                continue
+
+            if gallery is not None and gallery.ready:
+                for index, embedding in ready:
+                    GALLERY_SEARCHES.inc()
+                    yield item(index, result=_build_response(gallery.search(embedding, k=k), matcher))
+                continue
+
+            logger.info(f"Recognizing {len(ready)} batch images via pgvector HNSW index (ef_search={ef_search})...")
+            try:
+                async with AsyncSessionLocal() as db:
+                    rows = await nearest_users_batch(db, [embedding for _, embedding in ready], k=k, ef_search=ef_search)
+                    await db.commit()
+            except SQLAlchemyError as e:
+                logger.error(f"Database error during batch recognition: {e}", exc_info=True)
+                for index, _ in ready:
+                    yield item(index, status_code=500, detail="Database error occurred")
+                continue
+            BATCH_STATEMENTS.inc()
+            PGVECTOR_SEARCHES.inc(len(ready))
+
+            for (index, _), user_rows in zip(ready, rows):
+                yield item(index, result=_build_response(user_rows, matcher))
+    finally:
+        # Client went away mid-stream: stop the remaining preprocessing/inference
+        for task in pending:
+            task.cancel()
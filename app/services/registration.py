@@ -1,10 +1,15 @@
-from fastapi import UploadFile, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from app.db.models import User, Face
-from app.services.preprocessing import decode_image, load_image, resize_if_needed
-from app.services.validation import validate_image
+from app.db.session import AsyncSessionLocal
+from app.services.preprocessing import preprocess_upload
+from app.services.inference import embed_image, cached_embed
 from app.models.insightface import InsightFaceEmbedder
+from app.models.batcher import MicroBatcher
+from app.models.embedding_cache import EmbeddingCache
+from app.schemas.detection import FaceEmbedding
 from app.utils.exceptions import (
     NoFaceDetectedError,
     MultipleFacesDetectedError,
@@ -14,17 +19,24 @@ from app.core.logs import logger
 from app.schemas.register_schema import RegisterResponse
 
 
-def register_user(
-        file: UploadFile,
+async def register_user(
+        image_data: memoryview,
         name: str,
         surname: str,
-        db: Session,
+        db: AsyncSession,
         embedder: InsightFaceEmbedder,
         auth_user_id,
+        batcher: MicroBatcher | None = None,
+        cache: EmbeddingCache | None = None,
 ) -> RegisterResponse:
     """
     Register a new user with their face embedding.
 
+    Preprocessing and inference go through the same off-loop path as
+    recognition, so a registration never blocks the event loop. The request
+    session `db` is first used for the insert, so no pooled connection is
+    held while the upload waits for admission or is embedded.
+
     Returns:
         RegisterResponse: Registration response
 
@@ -32,23 +44,15 @@ def register_user(
         HTTPException: On validation, processing, or database errors
     """
     try:
-        # Step 1: Validate the file
-        validate_image(file.file)
-
-        # Step 2: Decode image into PIL image
-        image_pil = decode_image(file.file)
-
-        # Step 3: Load image into numpy array and resize if needed
-        img_array = load_image(image_pil)
-        img_array = resize_if_needed(img_array)
-
-        # Step 4: Extract embedding
-        embedding_obj = embedder.embed(img_array)
-
-        # Check if user with same auth_user_id already has biometric data
-        existing = db.query(User).filter(
-            User.auth_user_id == auth_user_id
-        ).first()
+        # Step 1: Refuse before spending any inference time if the
+        # user with same auth_user_id already has biometric data.
+        # Short session of its own, closed before inference; committed so
+        # psycopg keeps the connection's prepared statements
+        async with AsyncSessionLocal() as lookup:
+            existing = await lookup.scalar(
+                select(User.user_id).where(User.auth_user_id == auth_user_id)
+            )
+            await lookup.commit()
 
         if existing:
             logger.error(f"User {auth_user_id} already has biometric data")
@@ -57,7 +61,17 @@ def register_user(
                 detail="Biometric data already registered. Delete existing profile first."
             )
 
-        # Step 5: Save to database
+        async def embed() -> FaceEmbedding:
+            # Step 2: Validate, decode, load and resize in the preprocessing pool
+            preprocessed = await preprocess_upload(image_data)
+
+            # Step 3: Extract embedding off the event loop
+            return await embed_image(preprocessed.img_array, embedder, batcher)
+
+        # A photo already seen by /recognize or /verify is not embedded again
+        embedding_obj = await cached_embed(image_data, cache, embed)
+
+        # Step 4: Save to database
         logger.info(f"Registering user {name} {surname}...")
 
         user = User(name=name, surname=surname, auth_user_id=auth_user_id)
@@ -76,7 +90,16 @@ def register_user(
 
         user.faces.append(face)
         db.add(user)
-        db.flush()  # Persist to DB and generate IDs
+        try:
+            await db.flush()  # Persist to DB and generate IDs
+        except IntegrityError:
+            # A concurrent registration for the same account won the race
+            logger.error(f"User {auth_user_id} already has biometric data (concurrent registration)")
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Biometric data already registered. Delete existing profile first."
+            )
 
         response = RegisterResponse(user_id=user.user_id, is_registered=True)
         logger.info(f"User {user.name} {user.surname} registered successfully with ID {user.user_id}")
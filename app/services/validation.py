@@ -1,16 +1,24 @@
-from typing import BinaryIO
+import base64
+import binascii
+
+import numpy as np
+
 from app.core.logs import logger
 from app.core.config import settings
 
-def validate_image(img: BinaryIO) -> bool:  # Returns format directly
-    """Validate image format.
+EMBEDDING_DIM = 512
+
+# Little-endian on the wire, whatever the server's byte order
+EMBEDDING_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+
+def validate_image(data: bytes | memoryview) -> bool:  # Returns format directly
+    """Validate image format from the magic number of the upload buffer.
 
     Raises:
         ValueError: If image format is invalid or unsupported
     """
     logger.debug('Reading image format')
-    header = img.read(16)
-    img.seek(0)
+    header = bytes(memoryview(data)[:16])
 
     if len(header) < 4:
         logger.error('Image file is too small')
@@ -26,4 +34,44 @@ def validate_image(img: BinaryIO) -> bool:  # Returns format directly
                 logger.debug(f'{format_name} image detected')
                 return True
     logger.error('Unsupported image format')
-    raise ValueError('Unsupported image format')
\ No newline at end of file
+    raise ValueError('Unsupported image format')
+
+
+def decode_embedding(encoded: str, dtype: str = "float32") -> np.ndarray:
+    """Decode and validate a client-computed ArcFace embedding.
+
+    Args:
+        encoded: Base64 of EMBEDDING_DIM little-endian floats
+        dtype: "float32" or "float16"
+
+    Returns:
+        float32 array of shape (EMBEDDING_DIM,)
+
+    Raises:
+        ValueError: If the payload is not valid base64, has the wrong size,
+            contains NaN/inf or is not L2-normalised
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype '{dtype}'")
+    wire_dtype = EMBEDDING_DTYPES[dtype]
+
+    try:
+        raw = base64.b64decode(encoded, validate=True)
+    except binascii.Error:
+        raise ValueError("Embedding is not valid base64")
+
+    if len(raw) != EMBEDDING_DIM * wire_dtype.itemsize:
+        raise ValueError(
+            f"Embedding must have {EMBEDDING_DIM} {dtype} values "
+            f"({EMBEDDING_DIM * wire_dtype.itemsize} bytes), got {len(raw)} bytes"
+        )
+
+    embedding = np.frombuffer(raw, dtype=wire_dtype).astype(np.float32)
+    if not np.isfinite(embedding).all():
+        raise ValueError("Embedding contains NaN or infinite values")
+
+    norm = float(np.linalg.norm(embedding))
+    if abs(norm - 1.0) > settings.EMBEDDING_NORM_TOLERANCE:
+        raise ValueError(f"Embedding must be L2-normalised (norm is {norm:.4f})")
+
+    return embedding
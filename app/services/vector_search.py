@@ -0,0 +1,219 @@
+import json
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.logs import logger
+
+# pgvector rejects hnsw.ef_search outside 1..1000
+MAX_EF_SEARCH = 1000
+
+
+# Top-k registered users by cosine distance, one row per user.
+# The inner query is a plain ORDER BY ... LIMIT over faces with the query vector
+# as a bound parameter (no subquery, no ORM expression), so the planner walks
+# faces_embedding_hnsw_idx for it. Users with several faces are then collapsed
+# to their closest face, which is why more faces than k are fetched.
+# Binary binding comes from the pgvector adapter registered in app/db/session.py;
+# the CAST is a no-op on that parameter. track_prepared: counted by the
+# db_prepared_statement* metrics (app/db/session.py).
+NEAREST_USERS_SQL = text("""
+    WITH nearest AS (
+        SELECT f.user_id,
+               f.embedding <=> CAST(:vec AS vector) AS distance
+        FROM faces f
+        ORDER BY f.embedding <=> CAST(:vec AS vector)
+        LIMIT :candidates
+    )
+    SELECT n.user_id,
+           1 - MIN(n.distance) AS similarity
+    FROM nearest n
+             JOIN users u ON n.user_id = u.user_id
+    GROUP BY n.user_id
+    ORDER BY MIN(n.distance)
+    LIMIT :k
+""").execution_options(track_prepared=True)
+
+# Quantized modes: the inner ORDER BY matches the expression indexes from
+# alembic 8c41e0d5a7b2 exactly (otherwise the planner cannot use them), then
+# the shortlist is re-ranked on the full-precision column before deduplication.
+_RERANKED_USERS_SQL = """
+    WITH shortlist AS (
+        SELECT f.user_id,
+               f.embedding
+        FROM faces f
+        ORDER BY {order_by}
+        LIMIT :candidates
+    ),
+    nearest AS (
+        SELECT s.user_id,
+               s.embedding <=> CAST(:vec AS vector) AS distance
+        FROM shortlist s
+    )
+    SELECT n.user_id,
+           1 - MIN(n.distance) AS similarity
+    FROM nearest n
+             JOIN users u ON n.user_id = u.user_id
+    GROUP BY n.user_id
+    ORDER BY MIN(n.distance)
+    LIMIT :k
+"""
+
+NEAREST_USERS_SQL_BY_MODE = {
+    "vector": NEAREST_USERS_SQL,
+    "halfvec": text(_RERANKED_USERS_SQL.format(
+        order_by="f.embedding::halfvec(512) <=> CAST(CAST(:vec AS vector) AS halfvec(512))"
+    )).execution_options(track_prepared=True),
+    "bit": text(_RERANKED_USERS_SQL.format(
+        order_by="binary_quantize(f.embedding)::bit(512) <~> binary_quantize(CAST(:vec AS vector))"
+    )).execution_options(track_prepared=True),
+}
+
+# Many query vectors in one statement (/recognize/batch): each element of the
+# bound vector[] drives its own LATERAL index scan with the same shape as the
+# single-vector statements above, so every probe still walks the mode's HNSW
+# index. Rows come back grouped by probe position, most similar first.
+# For the quantized modes the select-list distance is the exact one, computed
+# only for the :candidates faces the index scan yields.
+_BATCH_NEAREST_USERS_SQL = """
+    SELECT q.ord - 1 AS position,
+           n.user_id,
+           n.similarity
+    FROM unnest(CAST(:vecs AS vector[])) WITH ORDINALITY AS q(vec, ord)
+             CROSS JOIN LATERAL (
+        SELECT s.user_id,
+               1 - MIN(s.distance) AS similarity
+        FROM (
+            SELECT f.user_id,
+                   f.embedding <=> q.vec AS distance
+            FROM faces f
+            ORDER BY {order_by}
+            LIMIT :candidates
+        ) s
+                 JOIN users u ON s.user_id = u.user_id
+        GROUP BY s.user_id
+        ORDER BY MIN(s.distance)
+        LIMIT :k
+    ) n
+    ORDER BY q.ord, n.similarity DESC
+"""
+
+BATCH_NEAREST_USERS_SQL_BY_MODE = {
+    "vector": text(_BATCH_NEAREST_USERS_SQL.format(
+        order_by="f.embedding <=> q.vec"
+    )),
+    "halfvec": text(_BATCH_NEAREST_USERS_SQL.format(
+        order_by="f.embedding::halfvec(512) <=> q.vec::halfvec(512)"
+    )),
+    "bit": text(_BATCH_NEAREST_USERS_SQL.format(
+        order_by="binary_quantize(f.embedding)::bit(512) <~> binary_quantize(q.vec)"
+    )),
+}
+
+# Transaction-scoped (SET LOCAL semantics): the pooled connection goes back
+# with the server default once the request's transaction ends.
+SET_EF_SEARCH_SQL = text("SELECT set_config('hnsw.ef_search', :ef_search, true)")
+
+
+def resolve_ef_search(profile: str | None) -> int:
+    """
+    hnsw.ef_search for a recognition profile (None = configured default).
+
+    Raises:
+        ValueError: If the profile is not configured
+    """
+    name = profile or settings.RECOGNITION_DEFAULT_PROFILE
+    try:
+        return settings.RECOGNITION_PROFILES[name]
+    except KeyError:
+        available = ", ".join(sorted(settings.RECOGNITION_PROFILES))
+        raise ValueError(f"Unknown recognition profile '{name}'. Available: {available}")
+
+
+def query_vector(embedding: np.ndarray) -> np.ndarray:
+    """Flat, contiguous float32 view of an embedding, ready for binary binding."""
+    return np.ascontiguousarray(embedding, dtype=np.float32).reshape(-1)
+
+
+def embedding_array(value) -> np.ndarray:
+    """Embedding column value as float32, with or without pgvector's psycopg loader."""
+    if hasattr(value, "to_numpy"):
+        return value.to_numpy().astype(np.float32, copy=False)
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def shortlist_size(k: int, ef_search: int, mode: str) -> int:
+    """
+    Faces fetched from the HNSW index (and the ef_search needed to get them).
+
+    An HNSW scan yields at most ef_search faces. The shortlist is cut before
+    faces are grouped per user, so it holds at least k x
+    RECOGNITION_FACES_PER_USER faces: otherwise a few users with many close
+    faces fill it and fewer than k distinct users come back. Quantized modes
+    fetch at least RECOGNITION_RERANK_CANDIDATES faces to make up for the
+    coarser distance before exact re-ranking. Capped at MAX_EF_SEARCH.
+    """
+    size = max(ef_search, k * settings.RECOGNITION_FACES_PER_USER)
+    if mode != "vector":
+        size = max(size, settings.RECOGNITION_RERANK_CANDIDATES)
+    if size > MAX_EF_SEARCH:
+        logger.warning(f"Shortlist of {size} faces capped at ef_search={MAX_EF_SEARCH} (k={k})")
+        size = MAX_EF_SEARCH
+    return size
+
+
+async def nearest_users(
+        db: AsyncSession,
+        embedding: np.ndarray,
+        k: int = 1,
+        ef_search: int = 40,
+        mode: str | None = None,
+):
+    """
+    Return up to k (user_id, similarity) rows, most similar first.
+
+    Similarities are always exact (full-precision cosine); `mode` only picks
+    which HNSW index produces the shortlist (None = RECOGNITION_INDEX_MODE).
+    The whole shortlist is deduplicated so that users with several registered
+    faces do not crowd others out of the top k.
+    """
+    mode = mode or settings.RECOGNITION_INDEX_MODE
+    ef_search = shortlist_size(k, ef_search, mode)
+    await db.execute(SET_EF_SEARCH_SQL, {"ef_search": str(ef_search)})
+    result = await db.execute(
+        NEAREST_USERS_SQL_BY_MODE[mode],
+        {"vec": query_vector(embedding), "candidates": ef_search, "k": k},
+    )
+    return result.fetchall()
+
+
+async def nearest_users_batch(
+        db: AsyncSession,
+        embeddings: list[np.ndarray],
+        k: int = 1,
+        ef_search: int = 40,
+        mode: str | None = None,
+) -> list[list]:
+    """
+    nearest_users() for several query vectors in a single round trip.
+
+    Returns one list of (user_id, similarity) rows per embedding, in input
+    order (an empty list when the gallery has no faces).
+    """
+    mode = mode or settings.RECOGNITION_INDEX_MODE
+    ef_search = shortlist_size(k, ef_search, mode)
+    results: list[list] = [[] for _ in embeddings]
+    if not embeddings:
+        return results
+
+    await db.execute(SET_EF_SEARCH_SQL, {"ef_search": str(ef_search)})
+    result = await db.execute(
+        BATCH_NEAREST_USERS_SQL_BY_MODE[mode],
+        {"vecs": [query_vector(e) for e in embeddings], "candidates": ef_search, "k": k},
+    )
+    for position, user_id, similarity in result:
+        results[position].append((user_id, similarity))
+    return results
@@ -0,0 +1,126 @@
+import time
+
+import numpy as np
+from fastapi import HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db.models import User, Face
+from app.services.preprocessing import preprocess_upload
+from app.services.inference import embed_image, cached_embed
+from app.services.vector_search import embedding_array
+from app.models.insightface import InsightFaceEmbedder
+from app.models.batcher import MicroBatcher
+from app.models.matcher import InsightFaceMatcher
+from app.models.embedding_cache import EmbeddingCache
+from app.schemas.detection import FaceEmbedding
+from app.utils.exceptions import (
+    NoFaceDetectedError,
+    MultipleFacesDetectedError,
+    ImageProcessingError,
+)
+from app.core.config import settings
+from app.core.logs import logger
+from app.core.metrics import metrics
+from app.schemas.verify_schema import VerifyResponse
+
+VERIFICATIONS = metrics.counter("verifications", "1:1 verifications against the caller's own faces")
+
+
+async def _person_embeddings(db: AsyncSession, user_id) -> np.ndarray:
+    """(n_faces, 512) float32 matrix of one person's registered faces (ix_faces_user_id)."""
+    result = await db.execute(select(Face.embedding).where(Face.user_id == user_id))
+    rows = [embedding_array(embedding) for embedding in result.scalars()]
+    if not rows:
+        return np.empty((0, 512), dtype=np.float32)
+    return np.stack(rows)
+
+
+async def _embed_probe(
+        image_data: memoryview,
+        embedder: InsightFaceEmbedder,
+        batcher: MicroBatcher | None,
+        cache: EmbeddingCache | None,
+) -> FaceEmbedding:
+    async def embed() -> FaceEmbedding:
+        preprocessed = await preprocess_upload(image_data)
+        return await embed_image(preprocessed.img_array, embedder, batcher)
+
+    return await cached_embed(image_data, cache, embed)
+
+
+async def verify_user(
+        image_data: memoryview,
+        person: User,
+        embedder: InsightFaceEmbedder,
+        matcher: InsightFaceMatcher,
+        db: AsyncSession,
+        request: Request | None = None,
+        batcher: MicroBatcher | None = None,
+        cache: EmbeddingCache | None = None,
+) -> VerifyResponse:
+    """
+    Check whether the probe image shows `person` (1:1, no ANN search).
+
+    The person's faces are loaded by user_id and compared with an exact dot
+    product (embeddings are L2-normalised), so latency is independent of the
+    gallery size and the HNSW index is never touched. They are loaded first,
+    so a person without faces gets a 404 without any inference, and the
+    transaction is committed so no connection is held while the probe is
+    embedded.
+
+    Raises:
+        HTTPException: 404 if the person has no registered faces, 422 on
+            processing errors, 500 on database or unexpected errors
+    """
+    try:
+        # An index lookup on ix_faces_user_id, before any inference
+        _t0 = time.perf_counter()
+        gallery = await _person_embeddings(db, person.user_id)
+        await db.commit()
+        _t1 = time.perf_counter()
+        if settings.BENCHMARK_MODE and request is not None:
+            request.state.db_time_ms = (_t1 - _t0) * 1000
+
+        if len(gallery) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No registered faces for this person"
+            )
+
+        _ti0 = time.perf_counter()
+        embedding_obj = await _embed_probe(image_data, embedder, batcher, cache)
+        _ti1 = time.perf_counter()
+        if settings.BENCHMARK_MODE and request is not None:
+            request.state.inference_time_ms = (_ti1 - _ti0) * 1000
+
+        _ts0 = time.perf_counter()
+        similarity = float(np.max(gallery @ embedding_obj.embedding.astype(np.float32)))
+        if settings.BENCHMARK_MODE and request is not None:
+            request.state.similarity_time_ms = (time.perf_counter() - _ts0) * 1000
+        similarity = min(1.0, max(-1.0, similarity))
+        verified = similarity >= matcher.threshold
+        VERIFICATIONS.inc()
+
+        logger.info(
+            f"Verification for user_id={person.user_id}: verified={verified} "
+            f"similarity={similarity:.3f} faces={len(gallery)}"
+        )
+        return VerifyResponse(
+            user_id=person.user_id,
+            verified=verified,
+            similarity=similarity,
+            faces_compared=len(gallery),
+        )
+
+    except HTTPException:
+        raise
+    except (ImageProcessingError, NoFaceDetectedError, MultipleFacesDetectedError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except SQLAlchemyError as e:
+        logger.error(f"Database error during verification: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Database error occurred")
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Verification failed")
@@ -0,0 +1,109 @@
+"""
+Start-up warm-up of the embedder, and the readiness state behind /health/ready.
+
+The first inference of a fresh process pays for model loading plus ONNX
+Runtime's first-run work (memory arena growth, kernel selection per input
+shape). warm_up() spends that on a synthetic image before real traffic
+arrives; until it has finished, /health/ready answers 503 so load balancers
+only route to hot workers.
+"""
+import asyncio
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.config import ImageConfig, settings
+from app.core.logs import logger
+from app.core.metrics import metrics
+from app.utils.exceptions import NoFaceDetectedError, MultipleFacesDetectedError, InferenceServerError
+
+
+WARMUP_MS = metrics.gauge("embedder_warmup_ms", "Time spent building and warming up the embedder at start-up")
+
+
+@dataclass
+class Readiness:
+    ready: bool = False
+    error: str | None = None
+    warmup_ms: float | None = None
+
+
+# Readiness of this worker; set by run_warmup() from the app lifespan
+readiness = Readiness()
+
+
+def synthetic_image(height: int, width: int | None = None, seed: int = 0) -> np.ndarray:
+    """Deterministic BGR uint8 noise image of the given size."""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (height, width or height, 3), dtype=np.uint8)
+
+
+def warm_up(embedder, iterations: int | None = None, batch_sizes: list[int] | None = None) -> float:
+    """
+    Run warm-up inferences on synthetic images; returns the time taken in ms.
+
+    embed() runs `iterations` times on a preprocessing-sized image, so the
+    detector has run at its production input shape (it finds no face in
+    noise, which is fine). When the embedder runs recognition locally, the
+    recognition model is also run once per batch size the batcher can produce.
+
+    Raises:
+        Whatever the embedder raises besides no-face / multiple-faces
+    """
+    if iterations is None:
+        iterations = settings.WARMUP_ITERATIONS
+    if batch_sizes is None:
+        batch_sizes = sorted({1, settings.BATCH_MAX_SIZE}) if settings.BATCHING_ENABLED else [1]
+
+    t0 = time.perf_counter()
+    img = synthetic_image(ImageConfig().target_max_dim)
+    for _ in range(iterations):
+        try:
+            embedder.embed(img)
+        except (NoFaceDetectedError, MultipleFacesDetectedError):
+            pass
+
+    # Recognition only runs on a detected face; run it directly (local embedder only)
+    if iterations and hasattr(embedder, "embed_aligned"):
+        crop_size = embedder.app.models["recognition"].input_size[0]
+        crop = synthetic_image(crop_size, seed=1)
+        for size in batch_sizes:
+            embedder.embed_aligned([crop] * size)
+
+    return (time.perf_counter() - t0) * 1000
+
+
+async def run_warmup(
+        get_embedder: Callable[[], object],
+        state: Readiness = readiness,
+        retry_s: float = 2.0,
+) -> None:
+    """
+    Build the embedder and warm it up in the thread pool, then mark the worker ready.
+
+    An unreachable inference server (INFERENCE_SERVER_SOCKET) is retried every
+    `retry_s`, as it may simply still be starting; other failures are final.
+    """
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    while True:
+        try:
+            embedder = await loop.run_in_executor(None, get_embedder)
+            await loop.run_in_executor(None, warm_up, embedder)
+            break
+        except InferenceServerError as e:
+            state.error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Embedder warm-up: {state.error}; retrying in {retry_s}s")
+            await asyncio.sleep(retry_s)
+        except Exception as e:
+            state.error = f"{type(e).__name__}: {e}"
+            logger.error(f"Embedder warm-up failed: {state.error}", exc_info=True)
+            return
+
+    state.warmup_ms = round((time.perf_counter() - t0) * 1000, 1)
+    state.error = None
+    state.ready = True
+    WARMUP_MS.set(state.warmup_ms)
+    logger.info(f"Embedder ready after {state.warmup_ms} ms warm-up")
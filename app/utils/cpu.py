@@ -0,0 +1,129 @@
+"""
+CPU split between the worker processes of one host.
+
+Every ONNX Runtime session starts one intra-op thread per core by default,
+so N workers on one host oversubscribe it N times over. split_cpus() divides
+the CPUs this process may use into one contiguous share per worker, keeping
+hyper-threads of a physical core in the same share; the launcher pins each
+worker to its share (CPU_AFFINITY) and ORT sizes its thread pool to it
+(ORT_INTRA_OP_THREADS=0, see app.models.ort_session).
+
+    python -m app.utils.cpu --workers 4     # print the plan for this host
+"""
+import argparse
+import os
+
+from app.core.config import settings
+
+
+# Share of the worker this process is (set by the launcher after fork)
+_worker_cpus: list[int] | None = None
+
+
+def available_cpus() -> list[int]:
+    """CPUs this process may run on (its affinity mask, e.g. a container's cpuset)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _physical_core(cpu: int) -> tuple[int, int] | None:
+    base = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+    try:
+        with open(f"{base}/physical_package_id") as f:
+            package = int(f.read())
+        with open(f"{base}/core_id") as f:
+            core = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return package, core
+
+
+def core_groups(cpus: list[int]) -> list[list[int]]:
+    """CPUs grouped by physical core (hyper-thread siblings together), in CPU order."""
+    groups: dict[tuple, list[int]] = {}
+    for cpu in cpus:
+        groups.setdefault(_physical_core(cpu) or ("cpu", cpu), []).append(cpu)
+    return sorted(groups.values(), key=lambda group: group[0])
+
+
+def split_cpus(workers: int, cpus: list[int] | None = None) -> list[list[int]]:
+    """
+    One CPU share per worker: contiguous runs of whole physical cores.
+
+    Cores that do not divide evenly go to the first workers. With more
+    workers than cores, workers are spread round-robin and share cores.
+    """
+    if workers < 1:
+        raise ValueError("workers must be >= 1")
+    groups = core_groups(available_cpus() if cpus is None else sorted(cpus))
+
+    if workers >= len(groups):
+        return [list(groups[i % len(groups)]) for i in range(workers)]
+
+    shares = []
+    per_worker, extra = divmod(len(groups), workers)
+    start = 0
+    for i in range(workers):
+        count = per_worker + (1 if i < extra else 0)
+        shares.append([cpu for group in groups[start:start + count] for cpu in group])
+        start += count
+    return shares
+
+
+def configure_worker(index: int, workers: int, pin: bool) -> list[int]:
+    """
+    Record (and with `pin`, apply) the CPU share of worker `index` of `workers`.
+
+    Called by the launcher in each forked worker, before any session exists.
+    """
+    global _worker_cpus
+    share = split_cpus(workers)[index]
+    if pin and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, share)
+    _worker_cpus = share
+    return share
+
+
+def worker_threads(workers: int | None = None) -> int:
+    """
+    Intra-op threads for this worker: one per physical core of its share.
+
+    Outside the launcher (no recorded share) the available cores are
+    divided by `workers` (None = UVICORN_WORKERS).
+    """
+    if _worker_cpus is not None:
+        return len(core_groups(_worker_cpus))
+    if workers is None:
+        workers = settings.UVICORN_WORKERS
+    return max(1, len(core_groups(available_cpus())) // workers)
+
+
+def _cpu_list(cpus: list[int]) -> str:
+    """0,1,2,3,8 -> '0-3,8'"""
+    ranges = []
+    for cpu in cpus:
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{a}-{b}" if a != b else f"{a}" for a, b in ranges)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.utils.cpu", description="Print the CPU split for N workers")
+    parser.add_argument("--workers", type=int, default=settings.UVICORN_WORKERS)
+    args = parser.parse_args(argv)
+
+    cpus = available_cpus()
+    groups = core_groups(cpus)
+    print(f"CPUs available: {len(cpus)} ({_cpu_list(cpus)}), physical cores: {len(groups)}")
+    for i, share in enumerate(split_cpus(args.workers, cpus)):
+        print(f"  worker {i}: cpus {_cpu_list(share):<12} intra_op_threads={len(core_groups(share))}")
+    if args.workers > len(groups):
+        print("  (more workers than physical cores: workers share cores)")
+    print(f"\nUVICORN_WORKERS={args.workers} CPU_AFFINITY=true ORT_INTRA_OP_THREADS=0 python -m app.launcher")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 # Custom Exceptions
 class NoFaceDetectedError(Exception):
     """Raised when no face is detected in the image."""
-    pass
+    def __init__(self, message: str = "No face detected in the provided image"):
+        super().__init__(message)
 
 
 class MultipleFacesDetectedError(Exception):
@@ -15,6 +16,18 @@ class ImageProcessingError(Exception):
     pass
 
 
+class InferenceServerError(Exception):
+    """Raised when the dedicated inference process is unreachable or failed."""
+    pass
+
+
+class OverloadedError(Exception):
+    """Raised when admission control sheds a request instead of queueing it."""
+    def __init__(self, message: str, retry_after_s: int):
+        self.retry_after_s = retry_after_s
+        super().__init__(message)
+
+
 class CredentialsError(Exception):
     """Raised when there is an issue with user credentials."""
     pass
\ No newline at end of file
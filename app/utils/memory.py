@@ -0,0 +1,36 @@
+# Per-process memory accounting from /proc (Linux)
+
+
+def process_memory_mb(pid: int | str = "self") -> dict[str, float]:
+    """
+    RSS, PSS and USS of a process in MB.
+
+    RSS counts shared pages in full in every process that maps them, so it
+    overstates forked workers that share model weights. PSS splits each
+    shared page between its sharers (the sum over workers is the real
+    footprint) and USS is what a worker alone would free on exit.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except FileNotFoundError:
+        # Kernels before 4.14 have no smaps_rollup; RSS only
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    fields["Rss"] = int(line.split()[1])
+
+    def mb(*names: str) -> float | None:
+        if not all(name in fields for name in names):
+            return None
+        return round(sum(fields[name] for name in names) / 1024, 1)
+
+    return {
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "uss_mb": mb("Private_Clean", "Private_Dirty"),
+    }
@@ -0,0 +1,84 @@
+# benchmarks/compare_concurrent.py
+#
+# Side-by-side comparison of two labelled runs of run_benchmark_concurrent.py.
+# No HTTP, no DB — reads results/results_concurrent.csv only.
+#
+# What this compares (per dataset size, at one concurrency level):
+#   p50 / p95 / p99 latency, avg DB time and throughput of a baseline run
+#   against a candidate run, with the p99 change in percent.
+#
+# Typical use — sync Session vs AsyncSession on the recognize hot path:
+#   1. On the sync build:   BENCHMARK_LABEL=sync-db  python benchmarks/run_benchmark_concurrent.py
+#   2. On the async build:  BENCHMARK_LABEL=async-db python benchmarks/run_benchmark_concurrent.py
+#   3. python benchmarks/compare_concurrent.py sync-db async-db
+#
+# Usage:
+#   python benchmarks/compare_concurrent.py <baseline_label> <candidate_label> [concurrency]
+#   (concurrency defaults to 20)
+
+import sys
+import os
+import csv
+
+sys.path.insert(0, os.path.dirname(__file__))
+from config import RESULTS_DIR
+
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results_concurrent.csv")
+METRICS = ["p50_latency_ms", "p95_latency_ms", "p99_latency_ms", "avg_db_ms", "throughput_rps"]
+
+
+def load_runs(label: str, concurrency: int) -> dict[int, dict]:
+    """Latest row per dataset size for a run label at the given concurrency."""
+    rows = {}
+    with open(RESULTS_FILE, newline="") as f:
+        for row in csv.DictReader(f):
+            if row["run_label"] != label or int(row["concurrency"]) != concurrency:
+                continue
+            # Later rows win — re-running a label replaces its numbers
+            rows[int(row["dataset_size"])] = row
+    return rows
+
+
+def _num(row: dict, key: str) -> float | None:
+    try:
+        return float(row[key])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def main():
+    if len(sys.argv) < 3:
+        raise SystemExit("usage: compare_concurrent.py <baseline_label> <candidate_label> [concurrency]")
+
+    baseline_label, candidate_label = sys.argv[1], sys.argv[2]
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    baseline = load_runs(baseline_label, concurrency)
+    candidate = load_runs(candidate_label, concurrency)
+    sizes = sorted(set(baseline) & set(candidate))
+    if not sizes:
+        raise SystemExit(
+            f"No dataset size has both '{baseline_label}' and '{candidate_label}' "
+            f"at concurrency={concurrency} in {RESULTS_FILE}"
+        )
+
+    print("=" * 72)
+    print(f"  {baseline_label} vs {candidate_label}  (concurrency={concurrency})")
+    print("=" * 72)
+    print(f"  {'dataset':>8}  {'metric':<16} {baseline_label:>14} {candidate_label:>14}")
+
+    for size in sizes:
+        for metric in METRICS:
+            b, c = _num(baseline[size], metric), _num(candidate[size], metric)
+            b_txt = f"{b:.2f}" if b is not None else "-"
+            c_txt = f"{c:.2f}" if c is not None else "-"
+            print(f"  {size:>8,}  {metric:<16} {b_txt:>14} {c_txt:>14}")
+
+        b99, c99 = _num(baseline[size], "p99_latency_ms"), _num(candidate[size], "p99_latency_ms")
+        if b99 and c99 is not None:
+            print(f"  {'':>8}  p99 change: {100 * (c99 - b99) / b99:+.1f}%")
+        print()
+
+
+if __name__ == "__main__":
+    main()
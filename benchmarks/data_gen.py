@@ -34,6 +34,21 @@ def generate_embeddings(n: int) -> list[list[float]]:
     return normalised.tolist()
 
 
+def iter_embedding_chunks(n: int, chunk_size: int):
+    """
+    Yield the same n embeddings as generate_embeddings(n), chunk_size at a time.
+
+    Drawing sequential chunks from one seeded generator produces exactly the
+    rows of a single (n, 512) draw, so a chunked seed of n=1,000,000 is the same
+    dataset without materialising a 16 GB list of Python floats.
+    """
+    rng = np.random.default_rng(RANDOM_SEED)
+    for start in range(0, n, chunk_size):
+        size = min(chunk_size, n - start)
+        vectors = rng.standard_normal((size, EMBEDDING_DIM)).astype(np.float32)
+        yield (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist()
+
+
 def generate_query_embedding() -> list[float]:
     """
     A single query embedding to use in recognition requests.
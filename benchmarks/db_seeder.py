@@ -31,10 +31,13 @@ from psycopg import sql
 from config import (
     DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, RANDOM_SEED
 )
-from data_gen import generate_embeddings
+from data_gen import iter_embedding_chunks
 
 BENCH_USERNAME_PREFIX = "bench_seed_"
 
+# Rows generated and inserted per round — keeps memory flat for n=1,000,000
+SEED_CHUNK_SIZE = 50_000
+
 
 def _connect() -> psycopg.Connection:
     """Open a psycopg v3 connection to the benchmark database."""
@@ -88,59 +91,65 @@ def seed_embeddings(n: int) -> float:
     """
     clear_benchmark_data()
 
-    print(f"Generating {n} synthetic embeddings (seed={RANDOM_SEED})...")
-    embeddings = generate_embeddings(n)
-
-    # Pre-generate all UUIDs in Python to avoid repeated DB round-trips
-    auth_user_ids = [uuid.uuid4() for _ in range(n)]
-    user_ids      = [uuid.uuid4() for _ in range(n)]
-    fake_hash     = "$2b$12$benchmarkplaceholderhashXXXXXXXXXXXXXXXXXXXXXXXXXXXXX"
+    print(f"Generating and inserting {n} synthetic embeddings (seed={RANDOM_SEED}) "
+          f"in chunks of {SEED_CHUNK_SIZE}...")
+    fake_hash = "$2b$12$benchmarkplaceholderhashXXXXXXXXXXXXXXXXXXXXXXXXXXXXX"
 
-    print(f"Inserting {n} rows into auth_users, users, faces...")
     t_start = time.perf_counter()
 
     with _connect() as conn:
         with conn.cursor() as cur:
-
-            # 1. auth_users ────────────────────────────────────────────────
-            cur.executemany(
-                """
-                INSERT INTO auth_users
-                    (auth_user_id, username, password_hash, is_active, is_admin)
-                VALUES (%s, %s, %s, true, false)
-                """,
-                [
-                    (auth_user_ids[i], f"{BENCH_USERNAME_PREFIX}{i}", fake_hash)
-                    for i in range(n)
-                ],
-            )
-
-            # 2. users ─────────────────────────────────────────────────────
-            cur.executemany(
-                """
-                INSERT INTO users (user_id, name, surname, auth_user_id)
-                VALUES (%s, %s, %s, %s)
-                """,
-                [
-                    (user_ids[i], "Bench", f"User{i}", auth_user_ids[i])
-                    for i in range(n)
-                ],
-            )
-
-            # 3. faces ─────────────────────────────────────────────────────
-            # psycopg v3 stores Python lists into ARRAY columns natively.
-            # detection_score = 0.99 is a plausible value; it won't affect
-            # similarity computation (recognition.py ignores it during matching).
-            cur.executemany(
-                """
-                INSERT INTO faces (face_id, user_id, embedding, detection_score)
-                VALUES (%s, %s, %s::vector, %s)
-                """,
-                [
-                    (uuid.uuid4(), user_ids[i], embeddings[i], 0.99)
-                    for i in range(n)
-                ],
-            )
+            offset = 0
+            for embeddings in iter_embedding_chunks(n, SEED_CHUNK_SIZE):
+                size = len(embeddings)
+
+                # Pre-generate all UUIDs in Python to avoid repeated DB round-trips
+                auth_user_ids = [uuid.uuid4() for _ in range(size)]
+                user_ids      = [uuid.uuid4() for _ in range(size)]
+
+                # 1. auth_users ────────────────────────────────────────────
+                cur.executemany(
+                    """
+                    INSERT INTO auth_users
+                        (auth_user_id, username, password_hash, is_active, is_admin)
+                    VALUES (%s, %s, %s, true, false)
+                    """,
+                    [
+                        (auth_user_ids[i], f"{BENCH_USERNAME_PREFIX}{offset + i}", fake_hash)
+                        for i in range(size)
+                    ],
+                )
+
+                # 2. users ─────────────────────────────────────────────────
+                cur.executemany(
+                    """
+                    INSERT INTO users (user_id, name, surname, auth_user_id)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    [
+                        (user_ids[i], "Bench", f"User{offset + i}", auth_user_ids[i])
+                        for i in range(size)
+                    ],
+                )
+
+                # 3. faces ─────────────────────────────────────────────────
+                # psycopg v3 stores Python lists into ARRAY columns natively.
+                # detection_score = 0.99 is a plausible value; it won't affect
+                # similarity computation (recognition.py ignores it during matching).
+                cur.executemany(
+                    """
+                    INSERT INTO faces (face_id, user_id, embedding, detection_score)
+                    VALUES (%s, %s, %s::vector, %s)
+                    """,
+                    [
+                        (uuid.uuid4(), user_ids[i], embeddings[i], 0.99)
+                        for i in range(size)
+                    ],
+                )
+
+                offset += size
+                if n > SEED_CHUNK_SIZE:
+                    print(f"  {offset:,}/{n:,} rows")
 
         conn.commit()
 
@@ -0,0 +1,394 @@
+# benchmarks/run_benchmark_autotune.py
+#
+# Deployment-shape autotuner: sweeps the worker count, ONNX Runtime intra-op
+# threads and the recognition micro-batch size on this host, and recommends
+# the configuration with the best throughput that keeps tail latency in check.
+#
+# How each point is measured:
+#   The script forks `workers` processes, exactly like app.launcher: each gets
+#   its CPU share (app.utils.cpu.split_cpus, pinned unless
+#   BENCHMARK_AUTOTUNE_PIN=false), builds its embedder with the point's
+#   ORT_INTRA_OP_THREADS and a MicroBatcher with the point's BATCH_MAX_SIZE
+#   (batch 1 = BATCHING_ENABLED=false), warms up, then serves a closed loop of
+#   requests through embed_image() — the same path /recognize takes after
+#   preprocessing. BENCHMARK_AUTOTUNE_CONCURRENCY clients in total are spread
+#   over the workers, as a load balancer would. No HTTP, no database: those
+#   costs do not depend on the knobs being tuned.
+#
+# Models:
+#   real — InsightFaceEmbedder (buffalo_l) on BENCHMARK_FACE_IMAGE
+#   stub — a small convolutional ONNX model with the detector's and ArcFace's
+#          input shapes; no model download, no face image. Useful to check
+#          the harness and the host's thread scaling, not for final numbers.
+#
+# Output:
+#   results/results_autotune.csv — one row per point (throughput, p50/p95/p99)
+#   a Pareto table (throughput vs p99) on stdout
+#   results/autotune.env — the recommended settings, ready for `env_file:`
+#
+# Recommendation: the highest-throughput Pareto point whose p99 is within
+# BENCHMARK_AUTOTUNE_P99_MS, or — without an SLO — within
+# BENCHMARK_AUTOTUNE_P99_SLACK times the lowest p99 measured.
+#
+# Usage:
+#   BENCHMARK_AUTOTUNE_MODEL=stub \
+#   BENCHMARK_LABEL=autotune PYTHONPATH=$(pwd) python benchmarks/run_benchmark_autotune.py
+#
+#   BENCHMARK_FACE_IMAGE=/path/to/face.jpg BENCHMARK_AUTOTUNE_WORKERS=1,2,4 \
+#   BENCHMARK_AUTOTUNE_THREADS=0,1,2 BENCHMARK_AUTOTUNE_BATCH=1,4,8 \
+#   BENCHMARK_AUTOTUNE_P99_MS=250 PYTHONPATH=$(pwd) python benchmarks/run_benchmark_autotune.py
+
+import sys
+import os
+import asyncio
+import time
+import csv
+import multiprocessing
+import statistics
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from config import RESULTS_DIR
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.cpu import available_cpus, core_groups, split_cpus, configure_worker
+
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results_autotune.csv")
+ENV_FILE = os.getenv("BENCHMARK_AUTOTUNE_ENV", os.path.join(RESULTS_DIR, "autotune.env"))
+
+MODEL = os.getenv("BENCHMARK_AUTOTUNE_MODEL", "real")
+PIN = os.getenv("BENCHMARK_AUTOTUNE_PIN", "true").lower() == "true"
+DURATION_S = float(os.getenv("BENCHMARK_AUTOTUNE_DURATION_S", "15"))
+P99_SLO_MS = float(os.getenv("BENCHMARK_AUTOTUNE_P99_MS", "0")) or None
+P99_SLACK = float(os.getenv("BENCHMARK_AUTOTUNE_P99_SLACK", "1.5"))
+STARTUP_TIMEOUT_S = float(os.getenv("BENCHMARK_AUTOTUNE_TIMEOUT_S", "300"))
+
+PHYSICAL_CORES = len(core_groups(available_cpus()))
+
+
+def _int_list(name: str, default: list[int]) -> list[int]:
+    value = os.getenv(name)
+    return [int(v) for v in value.split(",")] if value else default
+
+
+# Default grid: worker counts in powers of two up to the physical cores;
+# 0 threads = each worker's share of the cores (ORT_INTRA_OP_THREADS=0)
+WORKER_COUNTS = _int_list(
+    "BENCHMARK_AUTOTUNE_WORKERS",
+    sorted({1 << i for i in range(PHYSICAL_CORES.bit_length()) if 1 << i <= PHYSICAL_CORES} | {PHYSICAL_CORES}),
+)
+THREAD_COUNTS = _int_list("BENCHMARK_AUTOTUNE_THREADS", [0, 1, 2])
+BATCH_SIZES = _int_list("BENCHMARK_AUTOTUNE_BATCH", [1, 4, 8])
+CONCURRENCY = int(os.getenv("BENCHMARK_AUTOTUNE_CONCURRENCY", str(max(8, 2 * PHYSICAL_CORES))))
+
+COLUMNS = [
+    "timestamp", "run_label", "model",
+    "workers", "intra_op_threads", "batch_size", "pinned", "concurrency", "duration_s",
+    "requests", "error_count", "throughput_rps",
+    "avg_latency_ms", "p50_latency_ms", "p95_latency_ms", "p99_latency_ms", "max_latency_ms",
+    "pareto", "recommended",
+]
+
+
+# ── Stub model ───────────────────────────────────────────────────────────────
+
+def _stub_model_bytes() -> bytes:
+    """Conv stack -> global pool -> 512-d projection, dynamic batch and spatial size."""
+    from onnx import helper, numpy_helper, TensorProto
+
+    rng = np.random.default_rng(0)
+    channels = [3, 32, 64, 64]
+    nodes, inits = [], []
+    x = "input"
+    for i, (c_in, c_out) in enumerate(zip(channels, channels[1:])):
+        w = f"conv{i}_w"
+        inits.append(numpy_helper.from_array(rng.standard_normal((c_out, c_in, 3, 3)).astype(np.float32) * 0.1, w))
+        nodes.append(helper.make_node("Conv", [x, w], [f"conv{i}"], pads=[1, 1, 1, 1], strides=[2, 2]))
+        nodes.append(helper.make_node("Relu", [f"conv{i}"], [f"relu{i}"]))
+        x = f"relu{i}"
+    inits.append(numpy_helper.from_array(rng.standard_normal((channels[-1], 512)).astype(np.float32), "proj_w"))
+    nodes += [
+        helper.make_node("GlobalAveragePool", [x], ["pool"]),
+        helper.make_node("Flatten", ["pool"], ["flat"]),
+        helper.make_node("MatMul", ["flat", "proj_w"], ["output"]),
+    ]
+    graph = helper.make_graph(
+        nodes, "autotune_stub",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["N", 3, "H", "W"])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["N", 512])],
+        inits,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    return model.SerializeToString()
+
+
+class StubEmbedder:
+    """embed / detect_and_align / embed_aligned with the real models' input shapes."""
+
+    def __init__(self, model_bytes: bytes):
+        import onnxruntime
+        from app.models.ort_session import session_options
+
+        self.session = onnxruntime.InferenceSession(model_bytes, session_options(), providers=["CPUExecutionProvider"])
+        self.app = SimpleNamespace(models={"recognition": SimpleNamespace(input_size=(112, 112))})
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {"input": batch})[0]
+
+    def detect_and_align(self, img_array: np.ndarray):
+        from app.schemas.detection import AlignedFace
+
+        self._run(img_array.transpose(2, 0, 1)[None].astype(np.float32) / 255)
+        return AlignedFace(crop=img_array[:112, :112].copy(), detection_score=0.99)
+
+    def embed_aligned(self, crops: list[np.ndarray]) -> np.ndarray:
+        feats = self._run(np.stack(crops).transpose(0, 3, 1, 2).astype(np.float32) / 255)
+        return feats / np.linalg.norm(feats, axis=1, keepdims=True)
+
+    def embed(self, img_array: np.ndarray):
+        from app.schemas.detection import FaceEmbedding
+
+        aligned = self.detect_and_align(img_array)
+        return FaceEmbedding(embedding=self.embed_aligned([aligned.crop])[0], detection_score=aligned.detection_score)
+
+
+def _load_input() -> np.ndarray:
+    if MODEL == "stub":
+        from app.services.warmup import synthetic_image
+        return synthetic_image(640)
+
+    path = os.getenv("BENCHMARK_FACE_IMAGE")
+    if not path or not os.path.isfile(path):
+        raise RuntimeError(
+            "Set BENCHMARK_FACE_IMAGE=/path/to/face.jpg (or BENCHMARK_AUTOTUNE_MODEL=stub)\n"
+            "A real face image is required — the detector finds nothing in noise."
+        )
+    from app.services.preprocessing import preprocess_image
+    with open(path, "rb") as f:
+        return preprocess_image(f.read()).img_array
+
+
+# ── One worker process ───────────────────────────────────────────────────────
+
+def _build_embedder(stub_model: bytes | None):
+    if stub_model is not None:
+        return StubEmbedder(stub_model)
+    from app.models.insightface import InsightFaceEmbedder
+    from app.core.config import Device
+    return InsightFaceEmbedder(model_name="buffalo_l", device=Device.CPU, allowed_modules=settings.INSIGHTFACE_MODULES)
+
+
+async def _closed_loop(embedder, batcher, img: np.ndarray, clients: int, stop_at: float) -> tuple[list[float], int]:
+    from app.services.inference import embed_image
+
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            try:
+                await embed_image(img, embedder, batcher)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, errors
+
+
+def _worker(index: int, point: dict, clients: int, img: np.ndarray, stub_model, barrier, results) -> None:
+    from app.models.batcher import MicroBatcher
+    from app.services.warmup import warm_up
+
+    configure_worker(index, point["workers"], pin=PIN)
+    settings.ORT_INTRA_OP_THREADS = point["intra_op_threads"]
+    embedder = _build_embedder(stub_model)
+    batcher = None
+    if point["batch_size"] > 1:
+        batcher = MicroBatcher(embedder, max_batch_size=point["batch_size"], max_wait_ms=settings.BATCH_MAX_WAIT_MS)
+    warm_up(embedder, iterations=2, batch_sizes=sorted({1, point["batch_size"]}))
+
+    barrier.wait()
+    latencies, errors = asyncio.run(_closed_loop(embedder, batcher, img, clients, time.perf_counter() + DURATION_S))
+    results.put((latencies, errors))
+
+
+def _percentile(sorted_vals: list[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(int(p / 100 * len(sorted_vals)), len(sorted_vals) - 1)
+    return sorted_vals[idx]
+
+
+def run_point(point: dict, img: np.ndarray, stub_model: bytes | None) -> dict:
+    """Fork the point's workers, run the closed loop in all of them at once, merge latencies."""
+    ctx = multiprocessing.get_context("fork")
+    workers = point["workers"]
+    barrier = ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+    clients = [CONCURRENCY // workers + (1 if i < CONCURRENCY % workers else 0) for i in range(workers)]
+    procs = [
+        ctx.Process(target=_worker, args=(i, point, max(1, clients[i]), img, stub_model, barrier, results))
+        for i in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    try:
+        barrier.wait(timeout=STARTUP_TIMEOUT_S)  # every worker loaded and warmed up
+        t0 = time.perf_counter()
+        merged = [results.get(timeout=DURATION_S + STARTUP_TIMEOUT_S) for _ in procs]
+        wall_s = time.perf_counter() - t0
+    finally:
+        for proc in procs:
+            proc.join(timeout=30)
+            if proc.is_alive():
+                proc.terminate()
+
+    latencies = sorted(ms for worker_latencies, _ in merged for ms in worker_latencies)
+    errors = sum(worker_errors for _, worker_errors in merged)
+    return {
+        **point,
+        "model": MODEL,
+        "pinned": PIN,
+        "concurrency": CONCURRENCY,
+        "duration_s": DURATION_S,
+        "requests": len(latencies),
+        "error_count": errors,
+        "throughput_rps": round(len(latencies) / wall_s, 2),
+        "avg_latency_ms": round(statistics.mean(latencies), 2) if latencies else None,
+        "p50_latency_ms": round(_percentile(latencies, 50), 2),
+        "p95_latency_ms": round(_percentile(latencies, 95), 2),
+        "p99_latency_ms": round(_percentile(latencies, 99), 2),
+        "max_latency_ms": round(max(latencies), 2) if latencies else None,
+    }
+
+
+# ── Sweep, Pareto front, recommendation ──────────────────────────────────────
+
+def sweep_points() -> list[dict]:
+    """Grid points, with thread counts that resolve to the same pool size deduplicated."""
+    points = []
+    for workers in WORKER_COUNTS:
+        share = min(len(core_groups(cpus)) for cpus in split_cpus(workers))
+        seen = set()
+        for threads in THREAD_COUNTS:
+            resolved = threads or share
+            if resolved in seen:
+                continue
+            seen.add(resolved)
+            for batch_size in BATCH_SIZES:
+                points.append({"workers": workers, "intra_op_threads": threads, "batch_size": batch_size})
+    return points
+
+
+def pareto_front(rows: list[dict]) -> list[dict]:
+    """Rows no other row beats on both throughput (higher) and p99 (lower)."""
+    ok = [r for r in rows if r["requests"] and not r["error_count"]]
+    return [
+        r for r in ok
+        if not any(
+            o["throughput_rps"] >= r["throughput_rps"] and o["p99_latency_ms"] <= r["p99_latency_ms"]
+            and (o["throughput_rps"] > r["throughput_rps"] or o["p99_latency_ms"] < r["p99_latency_ms"])
+            for o in ok
+        )
+    ]
+
+
+def recommend(front: list[dict]) -> dict | None:
+    if not front:
+        return None
+    limit = P99_SLO_MS or P99_SLACK * min(r["p99_latency_ms"] for r in front)
+    within = [r for r in front if r["p99_latency_ms"] <= limit]
+    if not within:
+        # Nothing meets the SLO: the lowest tail latency is the closest
+        return min(front, key=lambda r: r["p99_latency_ms"])
+    return max(within, key=lambda r: r["throughput_rps"])
+
+
+def write_env(best: dict) -> None:
+    os.makedirs(os.path.dirname(ENV_FILE) or ".", exist_ok=True)
+    with open(ENV_FILE, "w") as f:
+        f.write(
+            f"# Generated by benchmarks/run_benchmark_autotune.py on {datetime.now(timezone.utc).isoformat()}\n"
+            f"# host: {len(available_cpus())} CPUs, {PHYSICAL_CORES} physical cores; model={MODEL}; "
+            f"concurrency={CONCURRENCY}\n"
+            f"# measured: {best['throughput_rps']} req/s, p95={best['p95_latency_ms']}ms, "
+            f"p99={best['p99_latency_ms']}ms (inference only, no HTTP/DB)\n"
+            f"UVICORN_WORKERS={best['workers']}\n"
+            f"ORT_INTRA_OP_THREADS={best['intra_op_threads']}\n"
+            f"CPU_AFFINITY={str(best['pinned']).lower()}\n"
+            f"BATCHING_ENABLED={str(best['batch_size'] > 1).lower()}\n"
+            f"BATCH_MAX_SIZE={best['batch_size']}\n"
+        )
+
+
+def write_result(result: dict) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_header = not os.path.exists(RESULTS_FILE)
+    result.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+    result.setdefault("run_label", os.getenv("BENCHMARK_LABEL", "autotune"))
+    with open(RESULTS_FILE, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerow({
+            k: ("" if result.get(k) is None else result.get(k, ""))
+            for k in COLUMNS
+        })
+
+
+def _label(row: dict) -> str:
+    threads = row["intra_op_threads"] or "auto"
+    return f"workers={row['workers']:<3} threads={threads:<5} batch={row['batch_size']:<3}"
+
+
+def main():
+    points = sweep_points()
+    print("=" * 72)
+    print("  Deployment autotuner")
+    print(f"  model={MODEL}  cpus={len(available_cpus())}  physical cores={PHYSICAL_CORES}  pin={PIN}")
+    print(f"  workers={WORKER_COUNTS}  threads={THREAD_COUNTS} (0=auto)  batch={BATCH_SIZES}")
+    print(f"  concurrency={CONCURRENCY}  {DURATION_S}s per point  {len(points)} points")
+    print("=" * 72)
+
+    img = _load_input()
+    stub_model = _stub_model_bytes() if MODEL == "stub" else None
+
+    rows = []
+    for point in points:
+        row = run_point(point, img, stub_model)
+        rows.append(row)
+        print(f"  {_label(row)}  rps={row['throughput_rps']:<8} "
+              f"p95={row['p95_latency_ms']:<8} p99={row['p99_latency_ms']:<8} errors={row['error_count']}")
+
+    front = pareto_front(rows)
+    best = recommend(front)
+    for row in rows:
+        row["pareto"] = row in front
+        row["recommended"] = row is best
+        write_result(row)
+
+    print(f"\nPareto front (throughput vs p99), {len(front)} of {len(rows)} points:")
+    print(f"  {'configuration':<36} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in sorted(front, key=lambda r: r["throughput_rps"], reverse=True):
+        marker = "  <- recommended" if row is best else ""
+        print(f"  {_label(row):<36} {row['throughput_rps']:>9} {row['p50_latency_ms']:>9} "
+              f"{row['p95_latency_ms']:>9} {row['p99_latency_ms']:>9}{marker}")
+
+    if best is None:
+        print("\nNo point completed without errors; nothing recommended.")
+    else:
+        write_env(best)
+        print(f"\nRecommended: {_label(best)}  ->  {ENV_FILE}")
+    print(f"Results: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
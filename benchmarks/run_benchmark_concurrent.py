@@ -8,10 +8,21 @@
 #   With CPU-bound InsightFace inference, requests queue behind each other —
 #   this makes that queuing visible and quantified.
 #
+# Duplicate-heavy workload (BENCHMARK_DUPLICATE_RATIO, default 0):
+#   Every request normally carries unique bytes (the face image plus a random
+#   trailer after the JPEG EOI marker, which decoders ignore), so the
+#   embedding cache and single-flight never flatter the numbers. With a ratio
+#   r, a share r of the requests in each batch carry the *same* bytes — fresh
+#   per batch, so they are concurrent duplicates rather than cache hits —
+#   like retries or several services forwarding the same camera frame.
+#   Compare INFERENCE_SINGLE_FLIGHT=true/false runs with compare_concurrent.py.
+#
 # Usage:
 #   BENCHMARK_FACE_IMAGE=/path/to/face.jpg \
 #   BENCHMARK_LABEL=concurrency \
 #   PYTHONPATH=$(pwd) python benchmarks/run_benchmark_concurrent.py
+#
+#   BENCHMARK_DUPLICATE_RATIO=0.75 BENCHMARK_LABEL=dup75_single_flight ...
 
 import sys
 import os
@@ -19,6 +30,8 @@ import asyncio
 import time
 import statistics
 import csv
+import math
+import uuid
 from datetime import datetime, timezone
 
 import httpx
@@ -43,6 +56,9 @@ CONCURRENCY_LEVELS = [1, 5, 20]
 # 5 batches gives enough data points without taking forever at high concurrency.
 BATCHES = 5
 
+# Share of each batch that sends the same bytes at the same time (0 = all unique)
+DUPLICATE_RATIO = float(os.getenv("BENCHMARK_DUPLICATE_RATIO", "0"))
+
 COLUMNS = [
     "timestamp", "run_label",
     "dataset_size", "concurrency", "batches", "total_requests",
@@ -51,6 +67,7 @@ COLUMNS = [
     "avg_db_ms", "avg_inference_ms",
     "throughput_rps",
     "timeout_count", "error_count",
+    "duplicate_ratio",
 ]
 
 
@@ -65,6 +82,17 @@ def _load_image() -> bytes:
         return f.read()
 
 
+def _unique_copy(image_bytes: bytes) -> bytes:
+    """Same image, different bytes: trailing data after the JPEG EOI is ignored by decoders."""
+    return image_bytes + uuid.uuid4().bytes
+
+
+def _batch_payloads(image_bytes: bytes, concurrency: int) -> list[bytes]:
+    duplicates = math.ceil(DUPLICATE_RATIO * concurrency)
+    shared = _unique_copy(image_bytes)
+    return [shared] * duplicates + [_unique_copy(image_bytes) for _ in range(concurrency - duplicates)]
+
+
 def _parse_header(resp: httpx.Response, name: str) -> float | None:
     val = resp.headers.get(name)
     try:
@@ -141,8 +169,8 @@ async def run_concurrent_batch(
     """
     async with httpx.AsyncClient(timeout=BENCHMARK_HTTP_TIMEOUT) as client:
         tasks = [
-            _single_request(client, token, image_bytes)
-            for _ in range(concurrency)
+            _single_request(client, token, payload)
+            for payload in _batch_payloads(image_bytes, concurrency)
         ]
         # asyncio.gather fires all tasks simultaneously
         results = await asyncio.gather(*tasks)
@@ -165,7 +193,7 @@ async def run_for_combination(
 
     # Warmup — 1 sequential request, unmeasured
     async with httpx.AsyncClient(timeout=BENCHMARK_HTTP_TIMEOUT) as client:
-        await _single_request(client, token, image_bytes)
+        await _single_request(client, token, _unique_copy(image_bytes))
 
     all_results = []
     batch_start = time.perf_counter()
@@ -194,6 +222,7 @@ async def run_for_combination(
             "dataset_size": dataset_size, "concurrency": concurrency,
             "batches": BATCHES, "total_requests": len(all_results),
             "timeout_count": timeouts, "error_count": errors,
+            "duplicate_ratio": DUPLICATE_RATIO,
         }
 
     latencies = sorted(r["latency_ms"] for r in good)
@@ -223,6 +252,7 @@ async def run_for_combination(
         "throughput_rps":   throughput_rps,
         "timeout_count":    timeouts,
         "error_count":      errors,
+        "duplicate_ratio":  DUPLICATE_RATIO,
     }
 
     print(f"  → avg={summary['avg_latency_ms']}ms  "
@@ -251,7 +281,7 @@ def write_result(result: dict) -> None:
 async def main():
     print("=" * 55)
     print("  Concurrency Benchmark")
-    print(f"  levels={CONCURRENCY_LEVELS}  batches={BATCHES}")
+    print(f"  levels={CONCURRENCY_LEVELS}  batches={BATCHES}  duplicate_ratio={DUPLICATE_RATIO}")
     print("=" * 55)
 
     image_bytes = _load_image()
@@ -0,0 +1,117 @@
+# benchmarks/run_benchmark_decode.py
+#
+# In-process benchmark of the image preprocessing chain (decode -> load -> resize).
+# No HTTP, no DB, no model.
+#
+# What this measures:
+#   Full decode (target_max_dim=0, the old behaviour) versus decode-time JPEG
+#   downscaling (target_max_dim=640) on synthetic JPEGs from 1280px to 4096px.
+#   Reports avg/p95 time and tracemalloc peak memory for the whole chain.
+#
+# Usage:
+#   BENCHMARK_LABEL=decode PYTHONPATH=$(pwd) python benchmarks/run_benchmark_decode.py
+
+import sys
+import os
+import io
+import time
+import statistics
+import tracemalloc
+import csv
+from datetime import datetime, timezone
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from config import RESULTS_DIR, RANDOM_SEED
+
+from app.services.preprocessing import decode_image, load_image, resize_if_needed
+
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results_decode.csv")
+ITERATIONS = int(os.getenv("BENCHMARK_ITERATIONS", "20"))
+SIZES = [1280, 2048, 3000, 4096]
+MODES = {"full_decode": 0, "draft_640": 640}
+
+COLUMNS = [
+    "timestamp", "run_label", "image_px", "mode", "iterations",
+    "avg_ms", "p95_ms", "peak_memory_mb", "decoded_px",
+]
+
+
+def _make_jpeg(size: int) -> bytes:
+    # Noise compresses badly, which is closer to a real photo than a flat colour
+    rng = np.random.default_rng(RANDOM_SEED)
+    pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _run_chain(data: bytes, target: int) -> tuple[int, np.ndarray]:
+    img = decode_image(memoryview(data), target_max_dim=target)
+    decoded = max(img.size)
+    return decoded, resize_if_needed(load_image(img))
+
+
+def measure(size: int, mode: str) -> dict:
+    data = _make_jpeg(size)
+    target = MODES[mode]
+    _run_chain(data, target)  # warmup
+
+    times = []
+    for _ in range(ITERATIONS):
+        t0 = time.perf_counter()
+        decoded, _ = _run_chain(data, target)
+        times.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    _run_chain(data, target)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        "image_px": size,
+        "mode": mode,
+        "iterations": ITERATIONS,
+        "avg_ms": round(statistics.mean(times), 2),
+        "p95_ms": round(times[min(int(0.95 * len(times)), len(times) - 1)], 2),
+        "peak_memory_mb": round(peak / 1024 ** 2, 2),
+        "decoded_px": decoded,
+    }
+
+
+def write_result(result: dict) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_header = not os.path.exists(RESULTS_FILE)
+    result.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+    result.setdefault("run_label", os.getenv("BENCHMARK_LABEL", "decode"))
+    with open(RESULTS_FILE, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerow({k: result.get(k, "") for k in COLUMNS})
+
+
+def main():
+    print("=" * 55)
+    print("  Decode benchmark (decode -> load -> resize)")
+    print(f"  sizes={SIZES}  iterations={ITERATIONS}")
+    print("=" * 55)
+
+    for size in SIZES:
+        rows = {mode: measure(size, mode) for mode in MODES}
+        for row in rows.values():
+            write_result(row)
+        full, draft = rows["full_decode"], rows["draft_640"]
+        print(f"  {size}px  full={full['avg_ms']}ms/{full['peak_memory_mb']}MB  "
+              f"draft={draft['avg_ms']}ms/{draft['peak_memory_mb']}MB  "
+              f"speedup={full['avg_ms'] / draft['avg_ms']:.1f}x")
+
+    print(f"\nResults: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
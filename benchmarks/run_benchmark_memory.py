@@ -0,0 +1,121 @@
+# benchmarks/run_benchmark_memory.py
+#
+# Per-worker memory of the forking launcher (app/launcher.py), with and
+# without model preloading. No database traffic, no requests: each run
+# starts the launcher, waits until every worker has loaded the model and
+# written the memory report, then stops it.
+#
+# What this measures (per run):
+#   rss_mb  — resident set; counts shared pages in full in every worker
+#   pss_mb  — proportional set; shared pages split between sharers, so the
+#             sum over workers is the real footprint
+#   uss_mb  — private pages only (what a worker alone would free on exit)
+#
+# Expected shape: RSS per worker is similar in both modes; total PSS with
+# preloading is roughly (N - 1) model copies smaller.
+#
+# Linux only (/proc/<pid>/smaps_rollup). Needs DATABASE_URL etc. in the
+# environment because the workers import the app.
+#
+# Usage:
+#   BENCHMARK_MEMORY_WORKERS=4 \
+#   BENCHMARK_LABEL=preload PYTHONPATH=$(pwd) python benchmarks/run_benchmark_memory.py
+
+import sys
+import os
+import json
+import time
+import signal
+import subprocess
+import tempfile
+import csv
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from config import RESULTS_DIR
+
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results_memory.csv")
+WORKERS = int(os.getenv("BENCHMARK_MEMORY_WORKERS", "4"))
+PORT = int(os.getenv("BENCHMARK_MEMORY_PORT", "8765"))
+STARTUP_TIMEOUT_S = float(os.getenv("BENCHMARK_MEMORY_TIMEOUT_S", "300"))
+
+COLUMNS = [
+    "timestamp", "run_label", "preload", "workers",
+    "worker_rss_mb", "worker_pss_mb", "worker_uss_mb",
+    "total_rss_mb", "total_pss_mb", "parent_pss_mb", "startup_s",
+]
+
+
+def run_launcher(preload: bool) -> dict:
+    report_path = os.path.join(tempfile.mkdtemp(prefix="face-api-mem-"), "memory.json")
+    cmd = [
+        sys.executable, "-m", "app.launcher",
+        "--host", "127.0.0.1", "--port", str(PORT),
+        "--workers", str(WORKERS), "--memory-report", report_path,
+    ]
+    if not preload:
+        cmd.append("--no-preload")
+
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=os.path.join(os.path.dirname(__file__), ".."))
+    try:
+        while not os.path.exists(report_path):
+            if proc.poll() is not None:
+                raise RuntimeError(f"Launcher exited with status {proc.returncode}")
+            if time.perf_counter() - t0 > STARTUP_TIMEOUT_S:
+                raise TimeoutError(f"Workers not ready after {STARTUP_TIMEOUT_S}s")
+            time.sleep(0.5)
+        startup_s = time.perf_counter() - t0
+        time.sleep(0.5)  # report is written in one call; let it land
+        with open(report_path) as f:
+            report = json.load(f)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+
+    workers = report["workers"]
+    n = len(workers)
+    return {
+        "preload": preload,
+        "workers": n,
+        "worker_rss_mb": round(sum(w["rss_mb"] for w in workers) / n, 1),
+        "worker_pss_mb": round(sum(w["pss_mb"] for w in workers) / n, 1),
+        "worker_uss_mb": round(sum(w["uss_mb"] for w in workers) / n, 1),
+        "total_rss_mb": round(sum(w["rss_mb"] for w in workers), 1),
+        "total_pss_mb": round(sum(w["pss_mb"] for w in workers), 1),
+        "parent_pss_mb": report["parent"]["pss_mb"],
+        "startup_s": round(startup_s, 1),
+    }
+
+
+def write_result(result: dict) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_header = not os.path.exists(RESULTS_FILE)
+    result.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+    result.setdefault("run_label", os.getenv("BENCHMARK_LABEL", "memory"))
+    with open(RESULTS_FILE, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerow({k: result.get(k, "") for k in COLUMNS})
+
+
+def main():
+    print("=" * 55)
+    print("  Launcher memory benchmark (preload vs per-worker load)")
+    print(f"  workers={WORKERS}")
+    print("=" * 55)
+
+    for preload in (False, True):
+        row = run_launcher(preload)
+        write_result(row)
+        print(f"  preload={str(preload):<5}  per worker: rss={row['worker_rss_mb']}MB "
+              f"pss={row['worker_pss_mb']}MB uss={row['worker_uss_mb']}MB  "
+              f"total pss={row['total_pss_mb']}MB  startup={row['startup_s']}s")
+
+    print(f"\nResults: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/run_benchmark_modules.py
+#
+# In-process benchmark of InsightFaceEmbedder with different model-pack module sets.
+# No HTTP, no DB — just model load + embed() on a real face image.
+#
+# What this measures (per module set, each in a fresh process):
+#   rss_after_load_mb  — resident memory of a worker after the embedder is built
+#                        (what every Uvicorn worker pays)
+#   cpu_ms_per_request — process CPU time per embed() call (all ORT threads summed)
+#   wall_ms_per_request — wall time per embed() call
+#
+# Module sets compared:
+#   all                   — FaceAnalysis default (det + rec + landmark_3d_68 +
+#                           landmark_2d_106 + genderage)
+#   detection,recognition — what embed() actually needs (the app default)
+#
+# Usage:
+#   BENCHMARK_FACE_IMAGE=/path/to/face.jpg \
+#   BENCHMARK_LABEL=modules \
+#   PYTHONPATH=$(pwd) python benchmarks/run_benchmark_modules.py
+
+import sys
+import os
+import time
+import statistics
+import csv
+import multiprocessing as mp
+from datetime import datetime, timezone
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from config import RESULTS_DIR
+
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results_modules.csv")
+ITERATIONS = int(os.getenv("BENCHMARK_ITERATIONS", "30"))
+
+MODULE_SETS = {
+    "all": None,
+    "detection,recognition": ("detection", "recognition"),
+}
+
+COLUMNS = [
+    "timestamp", "run_label", "modules", "iterations",
+    "load_time_s", "rss_after_load_mb", "rss_after_run_mb",
+    "cpu_ms_per_request", "wall_ms_per_request", "p95_wall_ms",
+]
+
+
+def _measure(label: str, modules, image_path: str, queue: mp.Queue) -> None:
+    """Runs in a fresh process so RSS is not polluted by the other module set."""
+    import cv2
+    from app.models.insightface import InsightFaceEmbedder
+    from app.core.config import Device
+    from app.services.preprocessing import resize_if_needed
+
+    proc = psutil.Process()
+    img = resize_if_needed(cv2.imread(image_path))
+
+    t0 = time.perf_counter()
+    embedder = InsightFaceEmbedder(model_name="buffalo_l", device=Device.CPU, allowed_modules=modules)
+    load_time = time.perf_counter() - t0
+    rss_load = proc.memory_info().rss / 1024 ** 2
+
+    # Warmup — first run pays ORT graph initialisation
+    embedder.embed(img)
+
+    cpu_times, wall_times = [], []
+    for _ in range(ITERATIONS):
+        c0, w0 = time.process_time(), time.perf_counter()
+        embedder.embed(img)
+        cpu_times.append((time.process_time() - c0) * 1000)
+        wall_times.append((time.perf_counter() - w0) * 1000)
+
+    wall_sorted = sorted(wall_times)
+    queue.put({
+        "modules": label,
+        "iterations": ITERATIONS,
+        "load_time_s": round(load_time, 2),
+        "rss_after_load_mb": round(rss_load, 1),
+        "rss_after_run_mb": round(proc.memory_info().rss / 1024 ** 2, 1),
+        "cpu_ms_per_request": round(statistics.mean(cpu_times), 2),
+        "wall_ms_per_request": round(statistics.mean(wall_times), 2),
+        "p95_wall_ms": round(wall_sorted[min(int(0.95 * len(wall_sorted)), len(wall_sorted) - 1)], 2),
+    })
+
+
+def write_result(result: dict) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_header = not os.path.exists(RESULTS_FILE)
+    result.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+    result.setdefault("run_label", os.getenv("BENCHMARK_LABEL", "modules"))
+    with open(RESULTS_FILE, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerow({k: result.get(k, "") for k in COLUMNS})
+
+
+def main():
+    image_path = os.getenv("BENCHMARK_FACE_IMAGE")
+    if not image_path or not os.path.isfile(image_path):
+        raise RuntimeError("Set BENCHMARK_FACE_IMAGE=/path/to/face.jpg")
+
+    print("=" * 55)
+    print("  Model module-set benchmark")
+    print(f"  iterations={ITERATIONS}")
+    print("=" * 55)
+
+    ctx = mp.get_context("spawn")
+    results = []
+    for label, modules in MODULE_SETS.items():
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_measure, args=(label, modules, image_path, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        write_result(result)
+        results.append(result)
+        print(f"  {label:<24} rss={result['rss_after_load_mb']}MB  "
+              f"cpu={result['cpu_ms_per_request']}ms  wall={result['wall_ms_per_request']}ms")
+
+    base, slim = results[0], results[-1]
+    print(f"\n  RSS saved per worker : {base['rss_after_load_mb'] - slim['rss_after_load_mb']:.1f} MB")
+    print(f"  CPU saved per request: {base['cpu_ms_per_request'] - slim['cpu_ms_per_request']:.1f} ms")
+    print(f"\nResults: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
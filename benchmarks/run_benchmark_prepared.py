@@ -0,0 +1,149 @@
+# benchmarks/run_benchmark_prepared.py
+#
+# DB-only benchmark of the production nearest-users statement
+# (app/services/vector_search.py::NEAREST_USERS_SQL, k=1). No HTTP, no model.
+#
+# What this measures (per dataset size):
+#   unprepared       — prepare_threshold=None: parsed and planned on every call
+#   prepared         — prepare_threshold=0: prepared once per connection,
+#                      PostgreSQL picks custom/generic plan (plan_cache_mode=auto)
+#   prepared_generic — prepared + plan_cache_mode=force_generic_plan:
+#                      planning skipped entirely after the first execution
+#
+#   Each mode runs the statement through SQLAlchemy + psycopg exactly like the
+#   app (binary pgvector parameter), with a fresh random query vector per call.
+#   The planned index is recorded too, so a plan that drifted off
+#   faces_embedding_hnsw_idx shows up next to its latency.
+#
+# Dataset sizes default to 10,000 and 1,000,000 rows. Seeding 1M rows into an
+# HNSW-indexed table takes a long time — override with
+#   BENCHMARK_PREPARED_SIZES=10000,100000
+#
+# Usage:
+#   BENCHMARK_LABEL=prepared PYTHONPATH=$(pwd) python benchmarks/run_benchmark_prepared.py
+
+import sys
+import os
+import time
+import statistics
+import csv
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from config import RESULTS_DIR, RANDOM_SEED, EMBEDDING_DIM, ITERATIONS_PER_SIZE
+from db_seeder import seed_embeddings
+
+from sqlalchemy import create_engine, event, text
+from pgvector.psycopg import register_vector
+from app.core.config import settings
+from app.services.vector_search import NEAREST_USERS_SQL, query_vector
+
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results_prepared.csv")
+SIZES = [int(n) for n in os.getenv("BENCHMARK_PREPARED_SIZES", "10000,1000000").split(",")]
+ITERATIONS = int(os.getenv("BENCHMARK_ITERATIONS", str(ITERATIONS_PER_SIZE * 10)))
+
+MODES = {
+    "unprepared":       {"prepare_threshold": None},
+    "prepared":         {"prepare_threshold": 0},
+    "prepared_generic": {"prepare_threshold": 0, "options": "-c plan_cache_mode=force_generic_plan"},
+}
+
+COLUMNS = [
+    "timestamp", "run_label", "dataset_size", "mode", "iterations",
+    "avg_ms", "p50_ms", "p95_ms", "p99_ms", "uses_hnsw_index",
+]
+
+
+def _percentile(sorted_vals: list[float], p: float) -> float:
+    idx = min(int(p / 100 * len(sorted_vals)), len(sorted_vals) - 1)
+    return sorted_vals[idx]
+
+
+def _params(probe: np.ndarray) -> dict:
+    # Default profile, top-1 — what a plain /recognize call sends
+    return {"vec": query_vector(probe), "candidates": settings.RECOGNITION_PROFILES[settings.RECOGNITION_DEFAULT_PROFILE], "k": 1}
+
+
+def _engine(connect_args: dict):
+    engine = create_engine(str(settings.DATABASE_URL), pool_size=1, connect_args=connect_args)
+    event.listen(engine, "connect", lambda dbapi_conn, _: register_vector(dbapi_conn))
+    return engine
+
+
+def measure(dataset_size: int, mode: str) -> dict:
+    rng = np.random.default_rng(RANDOM_SEED + 2)
+    probes = rng.standard_normal((ITERATIONS + 1, EMBEDDING_DIM)).astype(np.float32)
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+
+    engine = _engine(MODES[mode])
+    try:
+        with engine.connect() as conn:
+            plan = "\n".join(
+                row[0] for row in conn.execute(
+                    text("EXPLAIN " + NEAREST_USERS_SQL.text), _params(probes[0])
+                )
+            )
+            # Warmup — the prepared modes pay PREPARE here
+            conn.execute(NEAREST_USERS_SQL, _params(probes[0])).fetchone()
+
+            times = []
+            for probe in probes[1:]:
+                t0 = time.perf_counter()
+                conn.execute(NEAREST_USERS_SQL, _params(probe)).fetchone()
+                times.append((time.perf_counter() - t0) * 1000)
+    finally:
+        engine.dispose()
+
+    times.sort()
+    return {
+        "dataset_size": dataset_size,
+        "mode": mode,
+        "iterations": ITERATIONS,
+        "avg_ms": round(statistics.mean(times), 3),
+        "p50_ms": round(_percentile(times, 50), 3),
+        "p95_ms": round(_percentile(times, 95), 3),
+        "p99_ms": round(_percentile(times, 99), 3),
+        "uses_hnsw_index": "faces_embedding_hnsw_idx" in plan,
+    }
+
+
+def write_result(result: dict) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_header = not os.path.exists(RESULTS_FILE)
+    result.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+    result.setdefault("run_label", os.getenv("BENCHMARK_LABEL", "prepared"))
+    with open(RESULTS_FILE, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerow({k: result.get(k, "") for k in COLUMNS})
+
+
+def main():
+    print("=" * 55)
+    print("  Prepared statement benchmark (nearest-users query)")
+    print(f"  sizes={SIZES}  iterations={ITERATIONS}")
+    print("=" * 55)
+
+    for dataset_size in SIZES:
+        print(f"\n  Dataset size: {dataset_size:,}")
+        seed_embeddings(dataset_size)
+
+        rows = {mode: measure(dataset_size, mode) for mode in MODES}
+        for row in rows.values():
+            write_result(row)
+            print(f"  {row['mode']:<17} avg={row['avg_ms']}ms  p99={row['p99_ms']}ms  "
+                  f"hnsw={row['uses_hnsw_index']}")
+
+        base = rows["unprepared"]["avg_ms"]
+        for mode in ("prepared", "prepared_generic"):
+            print(f"  saving ({mode}): {base - rows[mode]['avg_ms']:.3f} ms/query")
+
+    print(f"\nResults: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
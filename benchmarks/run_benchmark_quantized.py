@@ -0,0 +1,185 @@
+# benchmarks/run_benchmark_quantized.py
+#
+# DB-only benchmark of the three recognition index modes
+# (RECOGNITION_INDEX_MODE: vector, halfvec, bit). No HTTP, no model.
+#
+# What this measures (per dataset size and mode):
+#   index_size_mb  — pg_relation_size of the mode's HNSW index
+#   build_time_s   — DROP + CREATE INDEX on the seeded table
+#   avg/p95/p99_ms — the production nearest-users statement for that mode
+#                    (quantized modes include the exact re-rank)
+#   recall_at_1    — share of probes whose top-1 user equals the exact top-1
+#                    (sequential scan on the full-precision column)
+#
+# Probes are stored gallery embeddings plus Gaussian noise (cosine ≈ 0.7 to
+# the original at the default BENCHMARK_PROBE_NOISE=1.0), i.e. "another photo
+# of a registered person" rather than random vectors with no real neighbour.
+#
+# Requires the alembic head (halfvec / bit expression indexes, pgvector >= 0.7).
+#
+# Usage:
+#   BENCHMARK_QUANTIZED_SIZES=10000,100000 \
+#   BENCHMARK_LABEL=quantized PYTHONPATH=$(pwd) python benchmarks/run_benchmark_quantized.py
+
+import sys
+import os
+import time
+import statistics
+import csv
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from config import RESULTS_DIR, RANDOM_SEED, EMBEDDING_DIM
+from db_seeder import seed_embeddings
+
+from sqlalchemy import create_engine, event, text
+from pgvector.psycopg import register_vector
+from app.core.config import settings
+from app.services.vector_search import NEAREST_USERS_SQL_BY_MODE, query_vector, shortlist_size
+
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results_quantized.csv")
+SIZES = [int(n) for n in os.getenv("BENCHMARK_QUANTIZED_SIZES", "10000,100000").split(",")]
+PROBES = int(os.getenv("BENCHMARK_PROBES", "200"))
+PROBE_NOISE = float(os.getenv("BENCHMARK_PROBE_NOISE", "1.0"))
+EF_SEARCH = settings.RECOGNITION_PROFILES[settings.RECOGNITION_DEFAULT_PROFILE]
+
+# Same definitions as alembic 614f6e9480d9 / 8c41e0d5a7b2
+INDEXES = {
+    "vector": ("faces_embedding_hnsw_idx",
+               "USING hnsw (embedding vector_cosine_ops)"),
+    "halfvec": ("faces_embedding_halfvec_hnsw_idx",
+                "USING hnsw ((embedding::halfvec(512)) halfvec_cosine_ops)"),
+    "bit": ("faces_embedding_bit_hnsw_idx",
+            "USING hnsw ((binary_quantize(embedding)::bit(512)) bit_hamming_ops)"),
+}
+
+EXACT_TOP1_SQL = text("""
+    SELECT f.user_id
+    FROM faces f
+    ORDER BY f.embedding <=> CAST(:vec AS vector)
+    LIMIT 1
+""")
+
+COLUMNS = [
+    "timestamp", "run_label", "dataset_size", "mode", "probes",
+    "index_size_mb", "build_time_s", "avg_ms", "p95_ms", "p99_ms", "recall_at_1",
+]
+
+
+def _percentile(sorted_vals: list[float], p: float) -> float:
+    idx = min(int(p / 100 * len(sorted_vals)), len(sorted_vals) - 1)
+    return sorted_vals[idx]
+
+
+def _engine():
+    engine = create_engine(str(settings.DATABASE_URL), pool_size=1)
+    event.listen(engine, "connect", lambda dbapi_conn, _: register_vector(dbapi_conn))
+    return engine
+
+
+def _probes(conn) -> np.ndarray:
+    conn.execute(text("SELECT setseed(0.42)"))
+    rows = conn.execute(
+        text("SELECT embedding FROM faces ORDER BY random() LIMIT :n"), {"n": PROBES}
+    ).scalars().all()
+    # pgvector's psycopg loader returns Vector (0.5+) or ndarray (older releases)
+    base = np.stack([np.asarray(r.to_numpy() if hasattr(r, "to_numpy") else r, dtype=np.float32) for r in rows])
+    rng = np.random.default_rng(RANDOM_SEED + 3)
+    noisy = base + rng.standard_normal(base.shape).astype(np.float32) * PROBE_NOISE / np.sqrt(EMBEDDING_DIM)
+    return noisy / np.linalg.norm(noisy, axis=1, keepdims=True)
+
+
+def _ground_truth(conn, probes: np.ndarray) -> list:
+    conn.execute(text("SET enable_indexscan = off"))
+    truth = [conn.execute(EXACT_TOP1_SQL, {"vec": query_vector(p)}).scalar() for p in probes]
+    conn.execute(text("RESET enable_indexscan"))
+    return truth
+
+
+def _build_index(conn, mode: str) -> tuple[float, float]:
+    name, definition = INDEXES[mode]
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    t0 = time.perf_counter()
+    conn.execute(text(f"CREATE INDEX {name} ON faces {definition} WITH (m = 16, ef_construction = 64)"))
+    conn.commit()
+    build_time = time.perf_counter() - t0
+    size = conn.execute(text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": name}).scalar()
+    return build_time, size / 1024 ** 2
+
+
+def measure(conn, dataset_size: int, mode: str, probes: np.ndarray, truth: list) -> dict:
+    build_time, size_mb = _build_index(conn, mode)
+
+    candidates = shortlist_size(1, EF_SEARCH, mode)
+    conn.execute(text(f"SET hnsw.ef_search = {candidates}"))
+    statement = NEAREST_USERS_SQL_BY_MODE[mode]
+
+    def run(probe):
+        return conn.execute(statement, {"vec": query_vector(probe), "candidates": candidates, "k": 1}).first()
+
+    run(probes[0])  # warmup
+    times, hits = [], 0
+    for probe, expected in zip(probes, truth):
+        t0 = time.perf_counter()
+        row = run(probe)
+        times.append((time.perf_counter() - t0) * 1000)
+        hits += int(row is not None and row[0] == expected)
+    conn.execute(text("RESET hnsw.ef_search"))
+
+    times.sort()
+    return {
+        "dataset_size": dataset_size,
+        "mode": mode,
+        "probes": len(probes),
+        "index_size_mb": round(size_mb, 2),
+        "build_time_s": round(build_time, 2),
+        "avg_ms": round(statistics.mean(times), 3),
+        "p95_ms": round(_percentile(times, 95), 3),
+        "p99_ms": round(_percentile(times, 99), 3),
+        "recall_at_1": round(hits / len(probes), 4),
+    }
+
+
+def write_result(result: dict) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_header = not os.path.exists(RESULTS_FILE)
+    result.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+    result.setdefault("run_label", os.getenv("BENCHMARK_LABEL", "quantized"))
+    with open(RESULTS_FILE, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerow({k: result.get(k, "") for k in COLUMNS})
+
+
+def main():
+    print("=" * 55)
+    print("  Quantized index benchmark (vector / halfvec / bit)")
+    print(f"  sizes={SIZES}  probes={PROBES}  ef_search={EF_SEARCH}")
+    print("=" * 55)
+
+    engine = _engine()
+    try:
+        for dataset_size in SIZES:
+            print(f"\n  Dataset size: {dataset_size:,}")
+            seed_embeddings(dataset_size)
+
+            with engine.connect() as conn:
+                probes = _probes(conn)
+                truth = _ground_truth(conn, probes)
+                for mode in INDEXES:
+                    row = measure(conn, dataset_size, mode, probes, truth)
+                    write_result(row)
+                    print(f"  {mode:<8} size={row['index_size_mb']}MB  build={row['build_time_s']}s  "
+                          f"avg={row['avg_ms']}ms  p99={row['p99_ms']}ms  recall@1={row['recall_at_1']}")
+    finally:
+        engine.dispose()
+
+    print(f"\nResults: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/run_benchmark_startup.py
+#
+# Worker start-up time with and without the optimised model cache
+# (app/models/model_cache.py, ORT_MODEL_CACHE). Each run is a fresh Python
+# process that builds the embedder the way get_embedder() does, so nothing
+# is shared between runs except what is on disk.
+#
+# Modes (each run BENCHMARK_STARTUP_RUNS times):
+#   no_cache — ORT_MODEL_CACHE=false: every session optimises its graph (before)
+#   cold     — cache enabled, entries for the configured level deleted first:
+#              the first start after a model or onnxruntime change
+#   warm     — cache enabled and populated: every later start (after)
+#
+# What this measures (per run):
+#   model_load_ms — session creation for the pack (embedder_model_load_ms)
+#   embedder_ms   — InsightFaceEmbedder() including prepare()
+#   process_s     — interpreter start to embedder ready, imports included
+#
+# Usage:
+#   BENCHMARK_LABEL=startup PYTHONPATH=$(pwd) python benchmarks/run_benchmark_startup.py
+
+import sys
+import os
+import csv
+import glob
+import json
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from config import RESULTS_DIR
+
+RESULTS_FILE = os.path.join(RESULTS_DIR, "results_startup.csv")
+RUNS = int(os.getenv("BENCHMARK_STARTUP_RUNS", "3"))
+MODEL_DIR = os.path.expanduser(os.getenv("BENCHMARK_STARTUP_MODEL_DIR", "~/.insightface/models/buffalo_l"))
+
+COLUMNS = [
+    "timestamp", "run_label", "mode", "runs", "optimization_level",
+    "model_load_ms", "embedder_ms", "process_s",
+]
+
+
+def _child() -> None:
+    """Runs in the measured process: build the embedder, print timings as JSON."""
+    from app.api.deps import get_embedder
+    from app.models.ort_session import MODEL_LOAD_MS
+
+    t0 = time.perf_counter()
+    get_embedder()
+    embedder_ms = (time.perf_counter() - t0) * 1000
+    print(json.dumps({
+        "model_load_ms": MODEL_LOAD_MS.value,
+        "embedder_ms": round(embedder_ms, 1),
+    }))
+
+
+def _clear_cache(level: str) -> None:
+    for path in glob.glob(os.path.join(MODEL_DIR, "optimized", f"*.{level}.onnx")):
+        os.remove(path)
+
+
+def run_once(cache: bool) -> dict:
+    env = {**os.environ, "ORT_MODEL_CACHE": str(cache).lower()}
+    t0 = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, __file__, "--child"],
+        env=env, cwd=os.path.join(os.path.dirname(__file__), ".."),
+        check=True, capture_output=True, text=True,
+    )
+    process_s = time.perf_counter() - t0
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process_s"] = round(process_s, 2)
+    return result
+
+
+def run_mode(mode: str, level: str) -> dict:
+    runs = []
+    for _ in range(RUNS):
+        if mode == "cold":
+            _clear_cache(level)
+        runs.append(run_once(cache=mode != "no_cache"))
+    return {
+        "mode": mode,
+        "runs": RUNS,
+        "optimization_level": level,
+        **{k: round(statistics.median(r[k] for r in runs), 2) for k in ("model_load_ms", "embedder_ms", "process_s")},
+    }
+
+
+def write_result(result: dict) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_header = not os.path.exists(RESULTS_FILE)
+    result.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+    result.setdefault("run_label", os.getenv("BENCHMARK_LABEL", "startup"))
+    with open(RESULTS_FILE, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerow({k: result.get(k, "") for k in COLUMNS})
+
+
+def main():
+    from app.core.config import settings
+
+    level = settings.ORT_GRAPH_OPTIMIZATION_LEVEL
+    print("=" * 55)
+    print("  Start-up benchmark (optimised model cache)")
+    print(f"  runs={RUNS}  optimization level={level}  models={MODEL_DIR}")
+    print("=" * 55)
+
+    rows = []
+    for mode in ("no_cache", "cold", "warm"):
+        row = run_mode(mode, level)
+        rows.append(row)
+        write_result(row)
+        print(f"  {mode:<9} model_load={row['model_load_ms']:>8.0f}ms  "
+              f"embedder={row['embedder_ms']:>8.0f}ms  process={row['process_s']:>6.2f}s")
+
+    before, after = rows[0], rows[-1]
+    if after["model_load_ms"]:
+        print(f"\n  model load: {before['model_load_ms']:.0f}ms -> {after['model_load_ms']:.0f}ms "
+              f"({before['model_load_ms'] / after['model_load_ms']:.1f}x)")
+    print(f"\nResults: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        _child()
+    else:
+        main()
@@ -159,7 +159,7 @@ def mock_embedder(monkeypatch, mock_face_single):
     
     # Patch the class constructor or the instance
     with monkeypatch.context() as m:
-        m.setattr("app.models.insightface.FaceAnalysis", MagicMock(return_value=mock_app))
+        m.setattr("app.models.insightface.TunedFaceAnalysis", MagicMock(return_value=mock_app))
         embedder = InsightFaceEmbedder(device=Device.CPU)
     
     return embedder
@@ -172,7 +172,7 @@ def mock_embedder_no_face(monkeypatch):
     mock_app.get.return_value = []
     
     with monkeypatch.context() as m:
-        m.setattr("app.models.insightface.FaceAnalysis", MagicMock(return_value=mock_app))
+        m.setattr("app.models.insightface.TunedFaceAnalysis", MagicMock(return_value=mock_app))
         embedder = InsightFaceEmbedder(device=Device.CPU)
     
     return embedder
@@ -193,7 +193,7 @@ def mock_embedder_multi_face(monkeypatch):
     mock_app.get.return_value = [face1, face2]
     
     with monkeypatch.context() as m:
-        m.setattr("app.models.insightface.FaceAnalysis", MagicMock(return_value=mock_app))
+        m.setattr("app.models.insightface.TunedFaceAnalysis", MagicMock(return_value=mock_app))
         embedder = InsightFaceEmbedder(device=Device.CPU)
     
     return embedder
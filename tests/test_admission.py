@@ -0,0 +1,402 @@
+"""
+Unit tests for admission control (app.models.admission) and its use in cached_embed.
+"""
+
+import asyncio
+import uuid
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.models import admission
+from app.models.admission import AdmissionController
+from app.schemas.detection import FaceEmbedding
+from app.services import inference, recognition, registration
+from app.services.inference import cached_embed
+from app.services.recognition import recognize_user
+from app.services.registration import register_user
+from app.utils.exceptions import OverloadedError
+
+
+class Blocking:
+    """Each call blocks until `release` is set; tracks peak concurrency."""
+
+    def __init__(self, result=None):
+        self.release = asyncio.Event()
+        self.result = result
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await self.release.wait()
+            return self.result
+        finally:
+            self.active -= 1
+
+
+def _face():
+    return FaceEmbedding(embedding=np.ones(512, dtype=np.float32) / np.sqrt(512), detection_score=0.9)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+# ============================================================================
+# AdmissionController
+# ============================================================================
+
+class TestAdmissionController:
+
+    def test_runs_at_most_concurrency_at_once(self):
+        async def run():
+            controller = AdmissionController(concurrency=2, max_queue_depth=10)
+            fn = Blocking(result="ok")
+            callers = [asyncio.create_task(controller.run(fn)) for _ in range(6)]
+            await _settle()
+            depth = controller.queue_depth
+            fn.release.set()
+            return fn, depth, await asyncio.gather(*callers)
+
+        fn, depth, results = asyncio.run(run())
+
+        assert fn.peak == 2
+        assert depth == 4
+        assert results == ["ok"] * 6
+
+    def test_queue_full_is_shed(self):
+        async def run():
+            controller = AdmissionController(concurrency=1, max_queue_depth=1)
+            fn = Blocking()
+            running = asyncio.create_task(controller.run(fn))
+            waiting = asyncio.create_task(controller.run(fn))
+            await _settle()
+            shed = admission.SHED_QUEUE_FULL.value
+            with pytest.raises(OverloadedError) as exc:
+                await controller.run(fn)
+            fn.release.set()
+            await asyncio.gather(running, waiting)
+            return fn, exc.value, admission.SHED_QUEUE_FULL.value - shed
+
+        fn, error, shed = asyncio.run(run())
+
+        assert fn.calls == 2  # the shed request never ran
+        assert shed == 1
+        assert error.retry_after_s >= 1
+
+    def test_latency_budget_is_shed_with_retry_after(self):
+        async def run():
+            controller = AdmissionController(concurrency=1, max_queue_depth=10, latency_budget_ms=1500)
+            controller._service_ms.extend([1000.0] * 5)
+            fn = Blocking()
+            running = asyncio.create_task(controller.run(fn))
+            await _settle()
+            # wait (1 ahead / 1 slot * 1000) + service 1000 > 1500
+            assert controller.estimated_wait_ms() == 1000
+            shed = admission.SHED_LATENCY_BUDGET.value
+            with pytest.raises(OverloadedError) as exc:
+                await controller.run(fn)
+            fn.release.set()
+            await running
+            return exc.value, admission.SHED_LATENCY_BUDGET.value - shed
+
+        error, shed = asyncio.run(run())
+
+        assert shed == 1
+        assert error.retry_after_s == 1
+        assert "budget" in str(error)
+
+    def test_free_slot_always_admitted(self):
+        async def run():
+            controller = AdmissionController(concurrency=1, max_queue_depth=0, latency_budget_ms=1)
+            controller._service_ms.extend([5000.0] * 5)
+
+            async def fn():
+                return "ok"
+
+            return await controller.run(fn)
+
+        assert asyncio.run(run()) == "ok"
+
+    def test_no_estimate_without_history(self):
+        async def run():
+            controller = AdmissionController(concurrency=1, max_queue_depth=10, latency_budget_ms=1)
+            fn = Blocking(result="ok")
+            callers = [asyncio.create_task(controller.run(fn)) for _ in range(3)]
+            await _settle()
+            fn.release.set()
+            return await asyncio.gather(*callers)
+
+        assert asyncio.run(run()) == ["ok"] * 3
+
+    def test_service_times_recorded(self):
+        async def run():
+            controller = AdmissionController(concurrency=1, max_queue_depth=10)
+
+            async def fn():
+                await asyncio.sleep(0.01)
+
+            await controller.run(fn)
+            return controller.service_time_ms()
+
+        assert asyncio.run(run()) >= 10
+
+    def test_cancelled_waiter_leaves_the_queue(self):
+        async def run():
+            controller = AdmissionController(concurrency=1, max_queue_depth=10)
+            fn = Blocking(result="ok")
+            running = asyncio.create_task(controller.run(fn))
+            waiting = asyncio.create_task(controller.run(fn))
+            await _settle()
+            waiting.cancel()
+            await _settle()
+            depth = controller.queue_depth
+            fn.release.set()
+            return depth, await running, fn.calls
+
+        depth, result, calls = asyncio.run(run())
+
+        assert depth == 0
+        assert result == "ok" and calls == 1
+
+    def test_usable_from_a_new_event_loop(self):
+        controller = AdmissionController(concurrency=1, max_queue_depth=1)
+
+        async def fn():
+            return "ok"
+
+        assert asyncio.run(controller.run(fn)) == "ok"
+        assert asyncio.run(controller.run(fn)) == "ok"
+
+    def test_invalid_concurrency(self):
+        with pytest.raises(ValueError):
+            AdmissionController(concurrency=0, max_queue_depth=1)
+
+
+# ============================================================================
+# cached_embed
+# ============================================================================
+
+class TestCachedEmbedAdmission:
+
+    @pytest.fixture
+    def controller(self, monkeypatch):
+        controller = AdmissionController(concurrency=1, max_queue_depth=0)
+        monkeypatch.setattr(inference, "_admission", controller)
+        return controller
+
+    def test_shed_request_is_503_with_retry_after(self, controller):
+        async def run():
+            fn = Blocking(result=_face())
+            first = asyncio.create_task(cached_embed(b"frame 1", None, fn, single_flight=False, admission=True))
+            await _settle()
+            with pytest.raises(HTTPException) as exc:
+                await cached_embed(b"frame 2", None, fn, single_flight=False, admission=True)
+            fn.release.set()
+            await first
+            return exc.value
+
+        error = asyncio.run(run())
+
+        assert error.status_code == 503
+        assert int(error.headers["Retry-After"]) >= 1
+
+    def test_single_flight_followers_take_no_slot(self, controller):
+        async def run():
+            fn = Blocking(result=_face())
+            callers = [
+                asyncio.create_task(cached_embed(b"same frame", None, fn, single_flight=True, admission=True))
+                for _ in range(4)
+            ]
+            await _settle()
+            fn.release.set()
+            return await asyncio.gather(*callers), fn.calls
+
+        results, calls = asyncio.run(run())
+
+        assert calls == 1 and len(results) == 4
+
+    def test_disabled(self, controller):
+        async def run():
+            fn = Blocking(result=_face())
+            callers = [
+                asyncio.create_task(cached_embed(b"frame %d" % i, None, fn, single_flight=False, admission=False))
+                for i in range(3)
+            ]
+            await _settle()
+            fn.release.set()
+            await asyncio.gather(*callers)
+            return fn.peak
+
+        assert asyncio.run(run()) == 3
+
+    def test_controller_from_settings(self, monkeypatch):
+        monkeypatch.setattr(inference, "_admission", None)
+        monkeypatch.setattr(inference.settings, "ADMISSION_CONCURRENCY", 0)
+        monkeypatch.setattr(inference.settings, "BATCHING_ENABLED", True)
+        monkeypatch.setattr(inference.settings, "BATCH_MAX_SIZE", 16)
+        monkeypatch.setattr(inference.settings, "ADMISSION_MAX_QUEUE_DEPTH", 7)
+
+        controller = inference.get_admission()
+
+        assert controller.concurrency == 16
+        assert controller.max_queue_depth == 7
+
+
+# ============================================================================
+# recognize_user / register_user under saturation
+# ============================================================================
+
+class Pool:
+    """A connection pool of `size`; checkout waits for a free connection up to a pool timeout."""
+
+    def __init__(self, size: int):
+        self._free = asyncio.Semaphore(size)
+        self.in_use = 0
+
+    async def checkout(self):
+        await asyncio.wait_for(self._free.acquire(), timeout=5)
+        self.in_use += 1
+
+    def checkin(self):
+        self.in_use -= 1
+        self._free.release()
+
+
+class PooledSession:
+    """AsyncSession stand-in: checks a connection out of `pool` on its first statement, like SQLAlchemy."""
+
+    def __init__(self, pool: Pool):
+        self.pool = pool
+        self.checked_out = False
+        self.added = []
+
+    async def _connection(self):
+        if not self.checked_out:
+            await self.pool.checkout()
+            self.checked_out = True
+
+    async def execute(self, *args, **kwargs):
+        await self._connection()
+        return Mock(fetchall=Mock(return_value=[]))
+
+    async def scalar(self, *args, **kwargs):
+        await self._connection()
+        return None
+
+    def add(self, instance):
+        self.added.append(instance)
+
+    async def commit(self):
+        pass
+
+    async def flush(self):
+        await self._connection()
+        for instance in self.added:
+            instance.user_id = instance.user_id or uuid.uuid4()
+
+    def close(self):
+        if self.checked_out:
+            self.pool.checkin()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+class TestRecognizeSaturation:
+
+    POOL_SIZE = 2
+
+    @pytest.fixture
+    def inference_gate(self, monkeypatch):
+        gate = asyncio.Event()
+
+        async def preprocess_upload(image_data):
+            return SimpleNamespace(img_array=np.zeros((4, 4, 3), dtype=np.uint8), timings_ms={})
+
+        async def embed_image(img_array, embedder, batcher):
+            await gate.wait()
+            return _face()
+
+        for service in (recognition, registration):
+            monkeypatch.setattr(service, "preprocess_upload", preprocess_upload)
+            monkeypatch.setattr(service, "embed_image", embed_image)
+        monkeypatch.setattr(inference.settings, "ADMISSION_ENABLED", True)
+        # Admission lets in more requests (2 running + 3 queued) than the DB pool has connections
+        monkeypatch.setattr(inference, "_admission", AdmissionController(concurrency=2, max_queue_depth=3))
+        return gate
+
+    def test_full_queue_is_shed_fast_without_touching_the_pool(self, inference_gate):
+        async def run():
+            pool = Pool(self.POOL_SIZE)
+
+            async def request(i):
+                db = PooledSession(pool)
+                try:
+                    return await recognize_user(
+                        image_data=memoryview(b"frame %d" % i), embedder=Mock(), matcher=Mock(threshold=0.5), db=db,
+                    )
+                finally:
+                    db.close()
+
+            admitted = [asyncio.create_task(request(i)) for i in range(5)]
+            await _settle()
+            # Waiting for (or in) inference holds no connection
+            in_use_while_saturated = pool.in_use
+
+            with pytest.raises(HTTPException) as exc:
+                await asyncio.wait_for(request(5), timeout=1)
+
+            inference_gate.set()
+            return in_use_while_saturated, exc.value, await asyncio.gather(*admitted)
+
+        in_use, error, responses = asyncio.run(run())
+
+        assert in_use == 0
+        assert error.status_code == 503
+        assert "Retry-After" in error.headers
+        assert len(responses) == 5
+
+    def test_register_waits_for_inference_without_a_connection(self, inference_gate, monkeypatch):
+        async def run():
+            pool = Pool(self.POOL_SIZE)
+            # The duplicate pre-check's own short session draws from the same pool
+            monkeypatch.setattr(registration, "AsyncSessionLocal", lambda: PooledSession(pool))
+
+            async def request(i):
+                db = PooledSession(pool)
+                try:
+                    return await register_user(
+                        image_data=memoryview(b"photo %d" % i), name="Ada", surname="Lovelace",
+                        db=db, embedder=Mock(), auth_user_id=uuid.uuid4(),
+                    )
+                finally:
+                    db.close()
+
+            admitted = [asyncio.create_task(request(i)) for i in range(5)]
+            await _settle()
+            in_use_while_saturated = pool.in_use
+
+            with pytest.raises(HTTPException) as exc:
+                await asyncio.wait_for(request(5), timeout=1)
+
+            inference_gate.set()
+            return in_use_while_saturated, exc.value, await asyncio.gather(*admitted)
+
+        in_use, error, responses = asyncio.run(run())
+
+        assert in_use == 0
+        assert error.status_code == 503
+        assert all(response.is_registered for response in responses)
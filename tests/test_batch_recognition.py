@@ -0,0 +1,248 @@
+"""
+Tests for /recognize/batch: the grouped nearest-users statement, the
+streaming service and the NDJSON endpoint. ML and database are mocked.
+"""
+
+import asyncio
+import io
+import json
+import uuid
+from types import SimpleNamespace
+import pytest
+import numpy as np
+from unittest.mock import Mock, AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api import deps
+from app.api.routes import recognize as recognize_route
+from app.core.config import settings
+from app.models.gallery import GalleryIndex
+from app.schemas.recognize_schema import RecognizeBatchItem, RecognizeResponse
+from app.services import recognition
+from app.services.vector_search import BATCH_NEAREST_USERS_SQL_BY_MODE, SET_EF_SEARCH_SQL, nearest_users_batch
+from app.utils.exceptions import NoFaceDetectedError
+
+
+def _unit(rng):
+    v = rng.standard_normal(512).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+# ============================================================================
+# Grouped statement
+# ============================================================================
+
+class TestNearestUsersBatch:
+
+    def test_one_statement_rows_grouped_by_position(self, rng):
+        user_a, user_b = uuid.uuid4(), uuid.uuid4()
+        db = Mock()
+        db.execute = AsyncMock(side_effect=[
+            Mock(),
+            [(0, user_a, 0.9), (0, user_b, 0.5), (2, user_b, 0.8)],
+        ])
+
+        rows = asyncio.run(nearest_users_batch(db, [_unit(rng) for _ in range(3)], k=2, ef_search=40, mode="vector"))
+
+        assert rows == [[(user_a, 0.9), (user_b, 0.5)], [], [(user_b, 0.8)]]
+        set_call, query_call = db.execute.await_args_list
+        assert set_call.args == (SET_EF_SEARCH_SQL, {"ef_search": "40"})
+        statement, params = query_call.args
+        assert statement is BATCH_NEAREST_USERS_SQL_BY_MODE["vector"]
+        assert len(params["vecs"]) == 3
+        assert all(v.dtype == np.float32 for v in params["vecs"])
+
+    def test_empty_batch_skips_database(self):
+        db = Mock()
+        db.execute = AsyncMock()
+
+        assert asyncio.run(nearest_users_batch(db, [])) == []
+        db.execute.assert_not_called()
+
+    @pytest.mark.parametrize("mode,expression", [
+        ("vector", "ORDER BY f.embedding <=> q.vec"),
+        ("halfvec", "ORDER BY f.embedding::halfvec(512) <=>"),
+        ("bit", "ORDER BY binary_quantize(f.embedding)::bit(512) <~>"),
+    ])
+    def test_lateral_scan_orders_by_index_expression(self, mode, expression):
+        sql = BATCH_NEAREST_USERS_SQL_BY_MODE[mode].text
+        assert "unnest(CAST(:vecs AS vector[])) WITH ORDINALITY" in sql
+        assert "CROSS JOIN LATERAL" in sql
+        assert expression in sql
+
+
+# ============================================================================
+# Streaming service
+# ============================================================================
+
+@pytest.fixture
+def pipeline(monkeypatch, rng):
+    """Embeddings per upload payload; b"noface" raises NoFaceDetectedError."""
+    embeddings = {}
+
+    async def embed(data, embedder, batcher, cache=None):
+        await asyncio.sleep(0)
+        if bytes(data) == b"noface":
+            raise NoFaceDetectedError("No face detected in image")
+        return embeddings.setdefault(bytes(data), _unit(rng))
+
+    monkeypatch.setattr(recognition, "_embed_upload", embed)
+
+    db = MagicMock()
+    db.commit = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=db)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    monkeypatch.setattr(recognition, "AsyncSessionLocal", factory)
+
+    nearest = AsyncMock(side_effect=lambda db, embs, **kwargs: [[] for _ in embs])
+    monkeypatch.setattr(recognition, "nearest_users_batch", nearest)
+    return SimpleNamespace(embeddings=embeddings, nearest=nearest, sessions=factory, db=db)
+
+
+def _collect(images, gallery=None, k=1):
+    async def run():
+        return [item async for item in recognition.recognize_batch(
+            images=images, embedder=Mock(), matcher=Mock(threshold=0.7), k=k, gallery=gallery,
+        )]
+    return asyncio.run(run())
+
+
+class TestRecognizeBatch:
+
+    def test_every_image_answered_once(self, pipeline):
+        images = [(f"{i}.jpg", memoryview(f"img{i}".encode())) for i in range(5)]
+
+        items = _collect(images)
+
+        assert sorted(item.index for item in items) == list(range(5))
+        assert all(item.status_code == 200 and item.result.match is False for item in items)
+        assert {item.filename for item in items} == {f"{i}.jpg" for i in range(5)}
+
+    def test_embeddings_finishing_together_share_one_statement(self, pipeline):
+        nearest = pipeline.nearest
+        images = [(None, memoryview(f"img{i}".encode())) for i in range(4)]
+
+        _collect(images, k=3)
+
+        nearest.assert_awaited_once()
+        assert len(nearest.await_args.args[1]) == 4
+        assert nearest.await_args.kwargs["k"] == 3
+
+    def test_failed_image_does_not_fail_the_batch(self, pipeline):
+        images = [("a.jpg", memoryview(b"img")), ("b.jpg", memoryview(b"noface"))]
+
+        items = {item.index: item for item in _collect(images)}
+
+        assert items[0].status_code == 200
+        assert items[1].status_code == 422
+        assert items[1].result is None
+        assert "No face" in items[1].detail
+
+    def test_short_session_per_statement(self, pipeline, monkeypatch):
+        """Each grouped statement gets its own committed session, not one for the whole stream."""
+        monkeypatch.setattr(settings, "RECOGNITION_BATCH_MAX_INFLIGHT", 1)
+        images = [(None, memoryview(f"img{i}".encode())) for i in range(3)]
+
+        _collect(images)
+
+        statements = pipeline.nearest.await_count
+        assert statements > 1  # embeddings finished one after another
+        assert pipeline.sessions.call_count == statements
+        assert pipeline.db.commit.await_count == statements
+
+    def test_inflight_images_capped(self, pipeline, monkeypatch):
+        monkeypatch.setattr(settings, "RECOGNITION_BATCH_MAX_INFLIGHT", 3)
+        active, peak = 0, 0
+
+        async def embed(data, embedder, batcher, cache=None):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.001)
+            active -= 1
+            return _unit(np.random.default_rng(0))
+
+        monkeypatch.setattr(recognition, "_embed_upload", embed)
+
+        items = _collect([(None, memoryview(f"img{i}".encode())) for i in range(10)])
+
+        assert len(items) == 10
+        assert peak == 3
+
+    def test_ready_gallery_skips_database(self, pipeline):
+        embeddings, nearest = pipeline.embeddings, pipeline.nearest
+        user_id = uuid.uuid4()
+        items_in = [("a.jpg", memoryview(b"img"))]
+        # Pre-compute the embedding so the gallery holds an exact match
+        embeddings[b"img"] = _unit(np.random.default_rng(1))
+        gallery = GalleryIndex()
+        gallery.load([(uuid.uuid4(), user_id, embeddings[b"img"])])
+
+        item, = _collect(items_in, gallery=gallery)
+
+        assert item.result.match is True
+        assert item.result.user_id == user_id
+        nearest.assert_not_called()
+
+
+# ============================================================================
+# Endpoint
+# ============================================================================
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[deps.get_current_user_async] = lambda: Mock(is_active=True)
+    app.dependency_overrides[deps.get_embedder] = lambda: Mock()
+    app.dependency_overrides[deps.get_matcher] = lambda: Mock(threshold=0.7)
+    app.dependency_overrides[deps.get_batcher] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+class TestBatchEndpoint:
+
+    def test_streams_one_json_line_per_image(self, client, monkeypatch):
+        user_id = uuid.uuid4()
+
+        async def fake_batch(images, **kwargs):
+            for index in reversed(range(len(images))):
+                yield RecognizeBatchItem(
+                    index=index, filename=images[index][0],
+                    result=RecognizeResponse(match=True, user_id=user_id, similarity=0.9),
+                )
+
+        monkeypatch.setattr(recognize_route, "recognize_batch", fake_batch)
+        files = [("files", (f"{i}.jpg", io.BytesIO(b"\xff\xd8\xff" + bytes([i])), "image/jpeg")) for i in range(3)]
+
+        response = client.post("/recognize/batch", files=files)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["index"] for line in lines] == [2, 1, 0]
+        assert lines[0]["filename"] == "2.jpg"
+        assert lines[0]["result"]["user_id"] == str(user_id)
+
+    def test_too_many_images_rejected(self, client, monkeypatch):
+        monkeypatch.setattr(settings, "RECOGNITION_BATCH_MAX_IMAGES", 2)
+        files = [("files", (f"{i}.jpg", io.BytesIO(b"\xff\xd8\xff"), "image/jpeg")) for i in range(3)]
+
+        response = client.post("/recognize/batch", files=files)
+
+        assert response.status_code == 422
+        assert "Too many images" in response.json()["detail"]
+
+    def test_unknown_profile_rejected_before_streaming(self, client):
+        files = [("files", ("a.jpg", io.BytesIO(b"\xff\xd8\xff"), "image/jpeg"))]
+
+        response = client.post("/recognize/batch?profile=nope", files=files)
+
+        assert response.status_code == 422
+        assert "Unknown recognition profile" in response.json()["detail"]
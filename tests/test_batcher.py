@@ -0,0 +1,144 @@
+"""
+Unit tests for the recognition micro-batcher and the split
+detection / recognition path of InsightFaceEmbedder.
+"""
+
+import asyncio
+import pytest
+import numpy as np
+from unittest.mock import Mock, MagicMock
+
+from app.models.batcher import MicroBatcher, BATCH_SIZE_HISTOGRAM
+from app.models.insightface import InsightFaceEmbedder, Device, NoFaceDetectedError
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+@pytest.fixture
+def crops():
+    """Eight distinguishable 112x112 crops."""
+    return [np.full((112, 112, 3), i, dtype=np.uint8) for i in range(8)]
+
+
+@pytest.fixture
+def batch_embedder():
+    """Embedder double whose embed_aligned encodes each crop's fill value."""
+    embedder = Mock()
+
+    def embed_aligned(batch):
+        out = np.zeros((len(batch), 512), dtype=np.float32)
+        for row, crop in enumerate(batch):
+            out[row, int(crop[0, 0, 0])] = 1.0
+        return out
+
+    embedder.embed_aligned = Mock(side_effect=embed_aligned)
+    return embedder
+
+
+@pytest.fixture
+def mock_split_embedder(monkeypatch):
+    """Real InsightFaceEmbedder over a mocked FaceAnalysis with det/rec models."""
+    mock_app = MagicMock()
+    mock_app.det_model.detect.return_value = (
+        np.array([[100, 100, 300, 300, 0.93]], dtype=np.float32),
+        np.random.rand(1, 5, 2).astype(np.float32) * 200 + 100,
+    )
+    rec_model = MagicMock()
+    rec_model.input_size = (112, 112)
+    rec_model.get_feat.side_effect = lambda imgs: np.random.randn(len(imgs), 512).astype(np.float32)
+    mock_app.models = {"recognition": rec_model}
+
+    with monkeypatch.context() as m:
+        m.setattr("app.models.insightface.TunedFaceAnalysis", MagicMock(return_value=mock_app))
+        embedder = InsightFaceEmbedder(device=Device.CPU)
+    return embedder
+
+
+# ============================================================================
+# MicroBatcher
+# ============================================================================
+
+class TestMicroBatcher:
+
+    def test_concurrent_crops_share_one_run(self, batch_embedder, crops):
+        """Crops submitted together are embedded in a single call, in order."""
+        batcher = MicroBatcher(batch_embedder, max_batch_size=8, max_wait_ms=50)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(c) for c in crops))
+
+        results = asyncio.run(run())
+
+        assert batch_embedder.embed_aligned.call_count == 1
+        for i, embedding in enumerate(results):
+            assert np.argmax(embedding) == i
+
+    def test_batch_size_is_capped(self, batch_embedder, crops):
+        """No batch exceeds max_batch_size."""
+        batcher = MicroBatcher(batch_embedder, max_batch_size=3, max_wait_ms=50)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(c) for c in crops))
+
+        asyncio.run(run())
+
+        sizes = [len(call.args[0]) for call in batch_embedder.embed_aligned.call_args_list]
+        assert max(sizes) <= 3
+        assert sum(sizes) == len(crops)
+
+    def test_errors_reach_every_waiter(self, crops):
+        """A failed recognition run fails every request in the batch."""
+        embedder = Mock()
+        embedder.embed_aligned = Mock(side_effect=RuntimeError("Zero-norm embedding detected"))
+        batcher = MicroBatcher(embedder, max_batch_size=4, max_wait_ms=50)
+
+        async def run():
+            return await asyncio.gather(
+                *(batcher.submit(c) for c in crops[:4]), return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_batch_size_histogram_records_runs(self, batch_embedder, crops):
+        """Every run is observed in the batch-size histogram."""
+        before = BATCH_SIZE_HISTOGRAM.snapshot()["count"]
+        batcher = MicroBatcher(batch_embedder, max_batch_size=8, max_wait_ms=50)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(c) for c in crops[:2]))
+
+        asyncio.run(run())
+        assert BATCH_SIZE_HISTOGRAM.snapshot()["count"] == before + 1
+
+    def test_invalid_batch_size(self, batch_embedder):
+        with pytest.raises(ValueError):
+            MicroBatcher(batch_embedder, max_batch_size=0)
+
+
+# ============================================================================
+# Split detection / recognition path
+# ============================================================================
+
+class TestSplitEmbedding:
+
+    def test_detect_and_align_returns_crop(self, mock_split_embedder, single_face_image):
+        aligned = mock_split_embedder.detect_and_align(single_face_image)
+
+        assert aligned.crop.shape == (112, 112, 3)
+        assert aligned.detection_score == pytest.approx(0.93)
+
+    def test_detect_and_align_no_face(self, mock_split_embedder, no_face_image):
+        mock_split_embedder.app.det_model.detect.return_value = (
+            np.zeros((0, 5), dtype=np.float32), None
+        )
+        with pytest.raises(NoFaceDetectedError):
+            mock_split_embedder.detect_and_align(no_face_image)
+
+    def test_embed_aligned_normalises_rows(self, mock_split_embedder, crops):
+        embeddings = mock_split_embedder.embed_aligned(crops[:3])
+
+        assert embeddings.shape == (3, 512)
+        assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-5)
@@ -0,0 +1,116 @@
+"""
+Unit tests for the async database and authentication dependencies.
+"""
+
+import asyncio
+import uuid
+import pytest
+from unittest.mock import Mock, AsyncMock
+from fastapi import HTTPException
+
+from app.api import deps
+from app.api.deps import get_current_user_async, get_current_person_async
+from app.core.security import create_access_token
+from app.utils.exceptions import CredentialsError
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+class FakeSessionFactory:
+    """Stands in for AsyncSessionLocal; records whether the session is still open."""
+
+    def __init__(self, session):
+        self.session = session
+        self.open = False
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        self.open = True
+        return self.session
+
+    async def __aexit__(self, *exc):
+        self.open = False
+
+
+@pytest.fixture
+def db():
+    session = Mock()
+    session.scalar = AsyncMock(return_value=None)
+    session.commit = AsyncMock()
+    return session
+
+
+@pytest.fixture
+def sessions(db, monkeypatch):
+    factory = FakeSessionFactory(db)
+    monkeypatch.setattr(deps, "AsyncSessionLocal", factory)
+    return factory
+
+
+@pytest.fixture
+def token():
+    return create_access_token({"sub": str(uuid.uuid4())})
+
+
+# ============================================================================
+# get_current_user_async
+# ============================================================================
+
+class TestCurrentUserAsync:
+
+    def test_active_user_returned(self, db, sessions, token):
+        user = Mock(is_active=True)
+        db.scalar.return_value = user
+
+        assert asyncio.run(get_current_user_async(token=token)) is user
+        db.scalar.assert_awaited_once()
+
+    def test_session_closed_before_returning(self, db, sessions, token):
+        """The lookup's connection goes back to the pool before the route runs inference."""
+        db.scalar.return_value = Mock(is_active=True)
+
+        asyncio.run(get_current_user_async(token=token))
+
+        assert not sessions.open
+        # Committed, not rolled back on close: psycopg keeps its prepared statements
+        db.commit.assert_awaited_once()
+
+    def test_unknown_user_unauthorized(self, db, sessions, token):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(get_current_user_async(token=token))
+        assert exc.value.status_code == 401
+
+    def test_inactive_user_forbidden(self, db, sessions, token):
+        db.scalar.return_value = Mock(is_active=False)
+
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(get_current_user_async(token=token))
+        assert exc.value.status_code == 403
+
+    def test_invalid_token_never_hits_db(self, db, sessions):
+        with pytest.raises(CredentialsError):
+            asyncio.run(get_current_user_async(token="not-a-jwt"))
+        db.scalar.assert_not_called()
+
+
+# ============================================================================
+# get_current_person_async
+# ============================================================================
+
+class TestCurrentPersonAsync:
+
+    def test_person_returned(self, db, sessions):
+        person = Mock()
+        db.scalar.return_value = person
+
+        assert asyncio.run(get_current_person_async(current_user=Mock(auth_user_id=uuid.uuid4()))) is person
+        assert not sessions.open
+
+    def test_missing_profile_not_found(self, db, sessions):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(get_current_person_async(current_user=Mock(auth_user_id=uuid.uuid4())))
+        assert exc.value.status_code == 404
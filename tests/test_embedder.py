@@ -9,6 +9,7 @@ Test Categories:
 
 import pytest
 import numpy as np
+from unittest.mock import MagicMock
 from pydantic import ValidationError
 from app.models.insightface import (
     InsightFaceEmbedder,
@@ -122,6 +123,34 @@ class TestEmbedderInitialization:
         assert embedder.device == Device.CPU
 
 
+class TestModuleSelection:
+    """Test which InsightFace modules are loaded (mocked FaceAnalysis)."""
+
+    def test_default_loads_detection_and_recognition_only(self, monkeypatch):
+        face_analysis = MagicMock()
+        monkeypatch.setattr("app.models.insightface.TunedFaceAnalysis", face_analysis)
+
+        InsightFaceEmbedder(device=Device.CPU)
+
+        kwargs = face_analysis.call_args.kwargs
+        assert kwargs["allowed_modules"] == ["detection", "recognition"]
+
+    def test_none_loads_all_modules(self, monkeypatch):
+        face_analysis = MagicMock()
+        monkeypatch.setattr("app.models.insightface.TunedFaceAnalysis", face_analysis)
+
+        embedder = InsightFaceEmbedder(device=Device.CPU, allowed_modules=None)
+
+        assert face_analysis.call_args.kwargs["allowed_modules"] is None
+        assert embedder.allowed_modules is None
+
+    def test_recognition_module_is_required(self, monkeypatch):
+        monkeypatch.setattr("app.models.insightface.TunedFaceAnalysis", MagicMock())
+
+        with pytest.raises(ValueError, match="recognition"):
+            InsightFaceEmbedder(device=Device.CPU, allowed_modules=["detection", "genderage"])
+
+
 # ============================================================================
 # PYDANTIC SCHEMA TESTS
 # ============================================================================
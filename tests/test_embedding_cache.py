@@ -0,0 +1,183 @@
+"""
+Unit tests for the shared embedding cache and the cached_embed() wrapper.
+"""
+
+import asyncio
+import multiprocessing
+import pytest
+import numpy as np
+from unittest.mock import AsyncMock, Mock
+
+from app.models import embedding_cache as cache_module
+from app.models.embedding_cache import EmbeddingCache
+from app.models.insightface import InsightFaceEmbedder
+from app.schemas.detection import FaceEmbedding
+from app.services.inference import cached_embed
+from app.utils.exceptions import NoFaceDetectedError, MultipleFacesDetectedError, ImageProcessingError
+
+
+def _face(seed=0):
+    v = np.random.default_rng(seed).standard_normal(512).astype(np.float32)
+    return FaceEmbedding(embedding=v / np.linalg.norm(v), detection_score=0.9)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = EmbeddingCache(str(tmp_path / "cache"), size_mb=1, ttl_s=60)
+    yield c
+    c.close()
+
+
+@pytest.fixture
+def one_set(tmp_path):
+    """A single set of 2 ways, so every key competes for the same slots."""
+    c = EmbeddingCache(str(tmp_path / "tiny"), size_mb=0.001, ttl_s=60, ways=2)
+    assert c.n_sets == 1
+    yield c
+    c.close()
+
+
+# ============================================================================
+# EmbeddingCache
+# ============================================================================
+
+class TestEmbeddingCache:
+
+    def test_miss_then_hit(self, cache):
+        key = cache.key(b"photo bytes")
+        face = _face()
+
+        assert cache.get(key) is None
+        cache.put(key, face)
+        hit = cache.get(key)
+
+        assert np.array_equal(hit.embedding, face.embedding)
+        assert hit.detection_score == pytest.approx(0.9)
+
+    def test_key_depends_on_content_and_namespace(self, cache, tmp_path):
+        other = EmbeddingCache(str(tmp_path / "other"), size_mb=1, namespace="another-model")
+
+        assert cache.key(b"a") == cache.key(memoryview(b"a"))
+        assert cache.key(b"a") != cache.key(b"b")
+        assert cache.key(b"a") != other.key(b"a")
+        other.close()
+
+    def test_failure_outcomes_cached(self, cache):
+        cache.put(cache.key(b"empty"), NoFaceDetectedError("No face detected in image"))
+        cache.put(cache.key(b"crowd"), MultipleFacesDetectedError(4))
+        cache.put(cache.key(b"broken"), ImageProcessingError("corrupt"))
+
+        assert isinstance(cache.get(cache.key(b"empty")), NoFaceDetectedError)
+        crowd = cache.get(cache.key(b"crowd"))
+        assert isinstance(crowd, MultipleFacesDetectedError) and crowd.num_faces == 4
+        assert cache.get(cache.key(b"broken")) is None
+
+    def test_lru_eviction(self, one_set):
+        a, b, c = (one_set.key(x) for x in (b"a", b"b", b"c"))
+        evictions = cache_module.CACHE_EVICTIONS.value
+
+        one_set.put(a, _face(1))
+        one_set.put(b, _face(2))
+        one_set.get(a)  # b is now least recently used
+        one_set.put(c, _face(3))
+
+        assert one_set.get(b) is None
+        assert one_set.get(a) is not None
+        assert one_set.get(c) is not None
+        assert cache_module.CACHE_EVICTIONS.value == evictions + 1
+
+    def test_ttl_expiry(self, one_set, monkeypatch):
+        key = one_set.key(b"a")
+        one_set.put(key, _face())
+
+        now = cache_module.time.time()
+        monkeypatch.setattr(cache_module.time, "time", lambda: now + 61)
+
+        assert one_set.get(key) is None
+
+    def test_shared_between_processes(self, cache):
+        """A forked worker's entry is visible to this process through the mapped file."""
+        key = cache.key(b"from another worker")
+        face = _face(7)
+
+        proc = multiprocessing.get_context("fork").Process(target=cache.put, args=(key, face))
+        proc.start()
+        proc.join(10)
+
+        assert proc.exitcode == 0
+        assert np.array_equal(cache.get(key).embedding, face.embedding)
+
+    def test_same_path_reuses_entries(self, cache, tmp_path):
+        key = cache.key(b"x")
+        cache.put(key, _face())
+
+        reopened = EmbeddingCache(str(tmp_path / "cache"), size_mb=1, ttl_s=60)
+        assert reopened.get(key) is not None
+        reopened.close()
+
+
+# ============================================================================
+# cached_embed
+# ============================================================================
+
+class TestCachedEmbed:
+
+    def test_second_upload_skips_inference(self, cache):
+        embed = AsyncMock(return_value=_face())
+
+        first = asyncio.run(cached_embed(b"same bytes", cache, embed))
+        second = asyncio.run(cached_embed(memoryview(b"same bytes"), cache, embed))
+
+        embed.assert_awaited_once()
+        assert np.array_equal(first.embedding, second.embedding)
+
+    def test_no_face_outcome_replayed(self, cache):
+        embed = AsyncMock(side_effect=NoFaceDetectedError("No face detected in image"))
+
+        for _ in range(2):
+            with pytest.raises(NoFaceDetectedError):
+                asyncio.run(cached_embed(b"landscape", cache, embed))
+
+        embed.assert_awaited_once()
+
+    def test_no_face_hit_matches_fresh_run(self, cache):
+        embedder = InsightFaceEmbedder.__new__(InsightFaceEmbedder)
+        embedder.model_name = "buffalo_l"
+        embedder.app = Mock(get=Mock(return_value=[]))
+        image = np.zeros((64, 64, 3), dtype=np.uint8)
+
+        async def embed():
+            return embedder.embed(image)
+
+        errors = []
+        for _ in range(2):
+            with pytest.raises(NoFaceDetectedError) as exc:
+                asyncio.run(cached_embed(b"landscape", cache, embed))
+            errors.append(str(exc.value))
+
+        embedder.app.get.assert_called_once()
+        assert errors[1] == errors[0]
+
+    def test_processing_errors_not_cached(self, cache):
+        embed = AsyncMock(side_effect=ImageProcessingError("corrupt"))
+
+        for _ in range(2):
+            with pytest.raises(ImageProcessingError):
+                asyncio.run(cached_embed(b"corrupt", cache, embed))
+
+        assert embed.await_count == 2
+
+    def test_large_upload_hashed_off_loop(self, cache):
+        embed = AsyncMock(return_value=_face())
+        data = bytes(1024 * 1024)
+
+        asyncio.run(cached_embed(data, cache, embed))
+        asyncio.run(cached_embed(data, cache, embed))
+
+        embed.assert_awaited_once()
+
+    def test_without_cache(self):
+        embed = AsyncMock(return_value=_face())
+        asyncio.run(cached_embed(b"x", None, embed))
+        asyncio.run(cached_embed(b"x", None, embed))
+        assert embed.await_count == 2
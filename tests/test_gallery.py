@@ -0,0 +1,220 @@
+"""
+Unit tests for the in-process gallery index, its NOTIFY sync and the
+recognition fallback to pgvector.
+"""
+
+import asyncio
+import json
+import uuid
+import pytest
+import numpy as np
+from unittest.mock import Mock, AsyncMock, MagicMock
+
+from app.models.gallery import GalleryIndex
+from app.services import gallery_sync, recognition
+from app.services.gallery_sync import GallerySync
+from app.services.preprocessing import PreprocessResult
+from app.schemas.detection import FaceEmbedding
+
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def _unit(rng, n=1, dim=512):
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def gallery(rng):
+    """100 users, 3 faces each."""
+    index = GalleryIndex(initial_capacity=8)
+    rows = []
+    for _ in range(100):
+        user_id = uuid.uuid4()
+        for emb in _unit(rng, 3):
+            rows.append((uuid.uuid4(), user_id, emb))
+    index.load(rows)
+    return index, rows
+
+
+# ============================================================================
+# GalleryIndex
+# ============================================================================
+
+class TestGalleryIndex:
+
+    def test_search_matches_brute_force_per_user(self, gallery, rng):
+        index, rows = gallery
+        query = _unit(rng)[0]
+
+        best: dict = {}
+        for _, user_id, emb in rows:
+            best[user_id] = max(best.get(user_id, -2.0), float(emb @ query))
+        expected = sorted(best.items(), key=lambda item: -item[1])[:5]
+
+        results = index.search(query, k=5)
+
+        assert [u for u, _ in results] == [u for u, _ in expected]
+        assert np.allclose([s for _, s in results], [s for _, s in expected], atol=1e-5)
+
+    def test_one_entry_per_user(self, rng):
+        index = GalleryIndex()
+        user_a, user_b = uuid.uuid4(), uuid.uuid4()
+        query = _unit(rng)[0]
+        # user_a owns the 10 closest faces
+        index.load(
+            [(uuid.uuid4(), user_a, query + 0.01 * i) for i in range(10)]
+            + [(uuid.uuid4(), user_b, _unit(rng)[0])]
+        )
+
+        results = index.search(query, k=2)
+
+        assert [u for u, _ in results] == [user_a, user_b]
+
+    def test_exact_match_similarity_is_one(self, gallery):
+        index, rows = gallery
+        face_id, user_id, emb = rows[42]
+
+        (top_user, similarity), = index.search(emb, k=1)
+
+        assert top_user == user_id
+        assert similarity == pytest.approx(1.0, abs=1e-5)
+
+    def test_remove_keeps_other_rows_searchable(self, gallery):
+        index, rows = gallery
+        removed_face, removed_user, removed_emb = rows[0]
+        last_face, last_user, last_emb = rows[-1]
+
+        assert index.remove(removed_face) is True
+        assert index.remove(removed_face) is False
+        assert len(index) == len(rows) - 1
+
+        # The last row was moved into the freed slot and is still found
+        assert index.search(last_emb, k=1)[0][0] == last_user
+        assert index.search(removed_emb, k=1)[0][1] < 0.999
+
+    def test_add_grows_and_upserts(self, rng):
+        index = GalleryIndex(initial_capacity=2)
+        face_id, user_id = uuid.uuid4(), uuid.uuid4()
+        for emb in _unit(rng, 5):
+            index.add(uuid.uuid4(), uuid.uuid4(), emb)
+        index.add(face_id, user_id, _unit(rng)[0])
+        index.add(face_id, user_id, 3.0 * np.ones(512))  # re-added, not normalised
+
+        assert len(index) == 6
+        assert index.search(np.ones(512), k=1) == [(user_id, pytest.approx(1.0, abs=1e-5))]
+
+    def test_empty_and_not_ready(self, rng):
+        index = GalleryIndex()
+        assert index.ready is False
+        assert index.search(_unit(rng)[0], k=3) == []
+
+    def test_wrong_dimension_rejected(self):
+        with pytest.raises(ValueError, match="512"):
+            GalleryIndex().add(uuid.uuid4(), uuid.uuid4(), np.ones(128))
+
+
+# ============================================================================
+# NOTIFY handling
+# ============================================================================
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    """Patch AsyncSessionLocal with a session whose execute() result is configurable."""
+    db = MagicMock()
+    db.execute = AsyncMock()
+    factory = MagicMock()
+    factory.return_value.__aenter__ = AsyncMock(return_value=db)
+    factory.return_value.__aexit__ = AsyncMock(return_value=False)
+    monkeypatch.setattr(gallery_sync, "AsyncSessionLocal", factory)
+    return db
+
+
+class TestGallerySync:
+
+    def test_delete_notification_removes_face(self, gallery, session_factory):
+        index, rows = gallery
+        face_id, user_id, _ = rows[0]
+        payload = json.dumps({"op": "DELETE", "face_id": str(face_id), "user_id": str(user_id)})
+
+        asyncio.run(GallerySync(index).apply(payload))
+
+        assert len(index) == len(rows) - 1
+        session_factory.execute.assert_not_called()
+
+    def test_insert_notification_fetches_row(self, gallery, session_factory, rng):
+        index, rows = gallery
+        face_id, user_id = uuid.uuid4(), uuid.uuid4()
+        emb = _unit(rng)[0]
+        session_factory.execute.return_value = Mock(first=Mock(return_value=(user_id, "[" + ",".join(map(str, emb)) + "]")))
+        payload = json.dumps({"op": "INSERT", "face_id": str(face_id), "user_id": str(user_id)})
+
+        asyncio.run(GallerySync(index).apply(payload))
+
+        assert len(index) == len(rows) + 1
+        assert index.search(emb, k=1)[0][0] == user_id
+
+    def test_stop_clears_index(self, gallery):
+        index, _ = gallery
+        asyncio.run(GallerySync(index).stop())
+        assert index.ready is False
+        assert len(index) == 0
+
+
+# ============================================================================
+# Recognition: gallery first, pgvector fallback
+# ============================================================================
+
+@pytest.fixture
+def pipeline(monkeypatch, rng):
+    emb = _unit(rng)[0]
+    monkeypatch.setattr(recognition, "preprocess_upload", AsyncMock(return_value=PreprocessResult(
+        img_array=np.zeros((480, 640, 3), dtype=np.uint8), timings_ms={}
+    )))
+    monkeypatch.setattr(recognition, "embed_image", AsyncMock(return_value=FaceEmbedding(
+        embedding=emb, detection_score=0.95
+    )))
+    nearest = AsyncMock(return_value=[])
+    monkeypatch.setattr(recognition, "nearest_users", nearest)
+    return emb, nearest
+
+
+def _recognize(gallery, k=1):
+    return asyncio.run(recognition.recognize_user(
+        image_data=memoryview(b"\xff\xd8\xff"),
+        embedder=Mock(),
+        matcher=Mock(threshold=0.7),
+        db=Mock(),
+        k=k,
+        gallery=gallery,
+    ))
+
+
+class TestRecognitionWithGallery:
+
+    def test_ready_gallery_skips_database(self, pipeline):
+        emb, nearest = pipeline
+        index = GalleryIndex()
+        user_id = uuid.uuid4()
+        index.load([(uuid.uuid4(), user_id, emb)])
+
+        response = _recognize(index)
+
+        assert response.match is True
+        assert response.user_id == user_id
+        nearest.assert_not_called()
+
+    def test_unready_gallery_falls_back_to_pgvector(self, pipeline):
+        _, nearest = pipeline
+
+        response = _recognize(GalleryIndex(), k=3)
+
+        assert response.match is False
+        assert nearest.await_args.kwargs["k"] == 3
@@ -0,0 +1,101 @@
+"""
+Import-time budget for the API: `import app.main` must not load the ML stack.
+
+Each check runs in a fresh interpreter, since this one already has
+everything imported. The memory budget can be raised for slow CI machines
+with IMPORT_BUDGET_MB. Wall time depends on machine load (e.g. pytest -n),
+so by default the time budget is a multiple of a bare `import fastapi`
+measured alongside it (IMPORT_BUDGET_RATIO); IMPORT_BUDGET_S replaces it
+with an absolute budget.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+# Imported only when the embedder is built (app.models.insightface)
+HEAVY_MODULES = ("insightface", "onnxruntime", "onnx", "matplotlib", "skimage", "albumentations", "scipy", "sklearn")
+
+# Measured: ~1.4 s / ~110 MB with lazy imports, ~3.4 s / ~210 MB without;
+# `import fastapi` alone takes ~0.5 s, so lazy is ~3x and eager ~7x that
+IMPORT_BUDGET_RATIO = float(os.getenv("IMPORT_BUDGET_RATIO", "5"))
+IMPORT_BUDGET_S = float(os.getenv("IMPORT_BUDGET_S", "0"))
+IMPORT_BUDGET_MB = float(os.getenv("IMPORT_BUDGET_MB", "160"))
+
+# Peak RSS from VmHWM: ru_maxrss can carry over the forking (pytest) process's peak across exec
+PROFILE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+try:
+    with open("/proc/self/status") as f:
+        max_rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+except (OSError, StopIteration):
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_mb": max_rss_kb / 1024,
+    "heavy": sorted(m for m in {heavy!r} if m in sys.modules),
+}}))
+"""
+
+
+def profile_import(module: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROFILE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=os.path.join(os.path.dirname(__file__), ".."),
+        env=os.environ.copy(), check=True, capture_output=True, text=True, timeout=120,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def app_main():
+    # Best of three runs: the budget is about import work, not scheduler noise.
+    # The baseline is interleaved so both see the same machine load
+    runs, baselines = [], []
+    for _ in range(3):
+        runs.append(profile_import("app.main"))
+        baselines.append(profile_import("fastapi")["seconds"])
+    best = min(runs, key=lambda run: run["seconds"])
+    return {**best, "baseline_seconds": min(baselines)}
+
+
+class TestImportBudget:
+
+    def test_app_main_does_not_import_ml_stack(self, app_main):
+        assert app_main["heavy"] == []
+
+    @pytest.mark.parametrize("module", ["app.api.deps", "app.services.recognition", "app.models.batcher"])
+    def test_api_modules_do_not_import_ml_stack(self, module):
+        assert profile_import(module)["heavy"] == []
+
+    def test_app_main_time_budget(self, app_main):
+        budget = IMPORT_BUDGET_S or IMPORT_BUDGET_RATIO * app_main["baseline_seconds"]
+        assert app_main["seconds"] <= budget, (
+            f"import app.main took {app_main['seconds']:.2f}s, budget {budget:.2f}s "
+            f"(import fastapi: {app_main['baseline_seconds']:.2f}s)"
+        )
+
+    def test_app_main_memory_budget(self, app_main):
+        assert app_main["max_rss_mb"] <= IMPORT_BUDGET_MB, f"import app.main peaked at {app_main['max_rss_mb']:.0f} MB"
+
+
+class TestLazyNames:
+
+    def test_resolved_on_first_use(self):
+        from app.models import insightface
+
+        assert insightface.TunedFaceAnalysis.__name__ == "TunedFaceAnalysis"
+        assert insightface.face_align.__name__ == "insightface.utils.face_align"
+
+    def test_unknown_name(self):
+        from app.models import insightface
+
+        with pytest.raises(AttributeError):
+            insightface.not_a_name
@@ -0,0 +1,262 @@
+"""
+Tests for the dedicated inference process: InferenceServer (app.inference_server)
+and its client RemoteEmbedder (app.models.remote_embedder), over a real Unix
+socket and shared-memory buffer, with a fake embedder in place of InsightFace.
+"""
+
+import asyncio
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.api import deps
+from app import inference_server
+from app.inference_server import InferenceServer, bind_unix_socket
+from app.models.remote_embedder import (
+    REQUEST, REPLY, OP_ATTACH, STATUS_ERROR, SHM_PREFIX,
+    RemoteEmbedder, recv_exactly, shm_dir,
+)
+from app.schemas.detection import FaceEmbedding
+from app.utils.exceptions import NoFaceDetectedError, MultipleFacesDetectedError, InferenceServerError
+
+
+class FakeEmbedder:
+    """Outcome picked by the first pixel; the embedding echoes the pixel sum."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, img_array: np.ndarray) -> FaceEmbedding:
+        self.calls += 1
+        marker = int(img_array[0, 0, 0])
+        if marker == 1:
+            raise NoFaceDetectedError()
+        if marker == 2:
+            raise MultipleFacesDetectedError(3)
+        if marker == 3:
+            raise RuntimeError("model exploded")
+        embedding = np.zeros(512, dtype=np.float32)
+        embedding[0] = float(img_array.astype(np.float64).sum())
+        embedding[1] = img_array.shape[0]
+        return FaceEmbedding(embedding=embedding, detection_score=0.75)
+
+
+def _image(height=64, width=48, marker=10) -> np.ndarray:
+    img = np.random.default_rng(height * width).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    img[0, 0, 0] = marker
+    return img
+
+
+@pytest.fixture
+def server(tmp_path):
+    """InferenceServer on its own event loop thread; yields (socket path, fake embedder)."""
+    path = str(tmp_path / "inference.sock")
+    sock = bind_unix_socket(path)
+    embedder = FakeEmbedder()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    future = asyncio.run_coroutine_threadsafe(InferenceServer(embedder).serve(sock), loop)
+
+    yield path, embedder
+
+    async def shutdown():
+        future.cancel()
+        # Connection handlers still waiting for a request
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+    loop.close()
+    sock.close()
+
+
+@pytest.fixture
+def client(server):
+    path, _ = server
+    remote = RemoteEmbedder(path, timeout_s=5)
+    yield remote
+    remote.close()
+
+
+# ============================================================================
+# Round trips
+# ============================================================================
+
+class TestRemoteEmbed:
+
+    def test_embedding_round_trip(self, client):
+        img = _image()
+
+        result = client.embed(img)
+
+        assert isinstance(result, FaceEmbedding)
+        assert result.embedding.shape == (512,)
+        assert result.embedding[0] == pytest.approx(float(img.astype(np.float64).sum()))
+        assert result.detection_score == pytest.approx(0.75)
+
+    def test_no_face(self, client):
+        with pytest.raises(NoFaceDetectedError) as exc_info:
+            client.embed(_image(marker=1))
+        assert str(exc_info.value) == str(NoFaceDetectedError())  # same message as in-process
+
+    def test_multiple_faces_keeps_count(self, client):
+        with pytest.raises(MultipleFacesDetectedError) as exc_info:
+            client.embed(_image(marker=2))
+        assert exc_info.value.num_faces == 3
+
+    def test_server_error_keeps_connection_usable(self, client, server):
+        _, embedder = server
+        with pytest.raises(InferenceServerError, match="model exploded"):
+            client.embed(_image(marker=3))
+
+        assert client.embed(_image()).detection_score == pytest.approx(0.75)
+        assert len(client._idle) == 1
+
+    def test_larger_image_reattaches_buffer(self, client):
+        small = client.embed(_image(32, 32))
+        large_img = _image(1500, 1200)  # > the initial 4 MB buffer
+
+        large = client.embed(large_img)
+
+        assert small.embedding[1] == 32
+        assert large.embedding[1] == 1500
+        assert large.embedding[0] == pytest.approx(float(large_img.astype(np.float64).sum()))
+
+    def test_non_contiguous_image(self, client):
+        img = _image(64, 64)
+        view = img[::2, ::2]
+
+        assert client.embed(view).embedding[0] == pytest.approx(float(view.astype(np.float64).sum()))
+
+    def test_invalid_input_rejected_before_sending(self, client, server):
+        _, embedder = server
+        with pytest.raises(ValueError):
+            client.embed(np.zeros((10, 10), dtype=np.uint8))
+        assert embedder.calls == 0
+
+    def test_concurrent_threads_use_separate_connections(self, client, server):
+        _, embedder = server
+        images = [_image(40 + i, 40) for i in range(16)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(client.embed, images))
+
+        assert [r.embedding[1] for r in results] == [40 + i for i in range(16)]
+        assert embedder.calls == 16
+        assert 1 <= len(client._idle) <= 8
+
+    def test_shared_memory_files_are_unlinked(self, client):
+        client.embed(_image())
+
+        leftovers = [f for f in os.listdir(shm_dir()) if f.startswith(f"{SHM_PREFIX}{os.getpid()}-")]
+        assert leftovers == []
+
+    def test_stats(self, client):
+        client.embed(_image())
+
+        stats = client.stats()
+
+        assert stats["pid"] == os.getpid()
+        assert stats["metrics"]["inference_server_requests"]["value"] >= 1
+
+
+# ============================================================================
+# Failures and setup
+# ============================================================================
+
+class TestServerSetup:
+
+    def test_unreachable_server(self, tmp_path):
+        remote = RemoteEmbedder(str(tmp_path / "missing.sock"), timeout_s=1)
+
+        with pytest.raises(InferenceServerError, match="unavailable"):
+            remote.embed(_image())
+
+    def test_stale_socket_file_is_replaced(self, tmp_path):
+        path = str(tmp_path / "stale.sock")
+        bind_unix_socket(path).close()  # file left behind, nobody listening
+
+        sock = bind_unix_socket(path)
+        sock.close()
+
+    def test_live_socket_is_not_taken_over(self, server):
+        path, _ = server
+        with pytest.raises(RuntimeError, match="already listening"):
+            bind_unix_socket(path)
+
+
+class TestMapBuffer:
+    """The server opens only its own protocol's files in shm_dir(), whatever a client sends."""
+
+    @pytest.fixture
+    def shm(self, tmp_path, monkeypatch):
+        directory = tmp_path / "shm"
+        directory.mkdir()
+        monkeypatch.setattr(inference_server, "shm_dir", lambda: str(directory))
+        return directory
+
+    def test_maps_buffer_by_name(self, shm):
+        (shm / f"{SHM_PREFIX}1-abc").write_bytes(b"\x01" * 16)
+
+        buffer = inference_server._map_buffer(f"{SHM_PREFIX}1-abc")
+
+        assert buffer[:] == b"\x01" * 16
+        buffer.close()
+
+    @pytest.mark.parametrize("name", [
+        "/etc/passwd",
+        f"../{SHM_PREFIX}1-abc",
+        f"sub/{SHM_PREFIX}1-abc",
+        "victim.db",
+        f"{SHM_PREFIX}1\0-abc",
+    ])
+    def test_rejects_paths_and_foreign_names(self, shm, name):
+        with pytest.raises(PermissionError):
+            inference_server._map_buffer(name)
+
+    def test_rejects_symlink_out_of_shm_dir(self, shm, tmp_path):
+        target = tmp_path / "victim.db"
+        target.write_bytes(b"keep")
+        (shm / f"{SHM_PREFIX}1-abc").symlink_to(target)
+
+        with pytest.raises(PermissionError):
+            inference_server._map_buffer(f"{SHM_PREFIX}1-abc")
+
+    def test_absolute_path_gets_error_reply(self, server, tmp_path):
+        path, _ = server
+        target = tmp_path / "victim.db"
+        target.write_bytes(b"keep")
+        encoded = str(target).encode()
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(path)
+            sock.sendall(REQUEST.pack(OP_ATTACH, 0, len(encoded), 0, 0) + encoded)
+            status, length, _ = REPLY.unpack(recv_exactly(sock, REPLY.size))
+            message = recv_exactly(sock, length).decode()
+
+        assert status == STATUS_ERROR
+        assert "Cannot map" in message
+
+
+class TestDeps:
+
+    @pytest.fixture(autouse=True)
+    def reset(self, monkeypatch):
+        monkeypatch.setattr(deps, "_embedder_instance", None)
+        monkeypatch.setattr(deps, "_batcher_instance", None)
+
+    def test_remote_embedder_when_socket_configured(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(deps.settings, "INFERENCE_SERVER_SOCKET", str(tmp_path / "inference.sock"))
+
+        assert isinstance(deps.get_embedder(), RemoteEmbedder)
+        assert deps.get_batcher() is None  # batching happens in the server
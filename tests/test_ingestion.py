@@ -0,0 +1,83 @@
+"""
+Unit tests for upload ingestion: single read, size limit and format sniffing
+on the shared upload buffer.
+"""
+
+import io
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from app.services.ingestion import read_upload
+from app.services.validation import validate_image
+from app.services.preprocessing import decode_image
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+@pytest.fixture
+def jpeg_bytes():
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), (10, 20, 30)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _upload(data: bytes, size: int | None = None) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="face.jpg", size=size)
+
+
+# ============================================================================
+# read_upload
+# ============================================================================
+
+class TestReadUpload:
+
+    def test_returns_memoryview_of_whole_upload(self, jpeg_bytes):
+        buffer = read_upload(_upload(jpeg_bytes, size=len(jpeg_bytes)), max_size=1024 * 1024)
+
+        assert isinstance(buffer, memoryview)
+        assert buffer.tobytes() == jpeg_bytes
+
+    def test_declared_size_over_limit_rejected_without_reading(self, jpeg_bytes):
+        upload = _upload(jpeg_bytes, size=10_000)
+
+        with pytest.raises(HTTPException) as exc_info:
+            read_upload(upload, max_size=1_000)
+
+        assert exc_info.value.status_code == 413
+        assert upload.file.tell() == 0
+
+    def test_actual_size_over_limit_rejected(self):
+        with pytest.raises(HTTPException) as exc_info:
+            read_upload(_upload(b"\xff\xd8\xff" + b"\x00" * 2_000), max_size=1_000)
+
+        assert exc_info.value.status_code == 413
+        assert "too large" in exc_info.value.detail.lower()
+
+    def test_upload_at_limit_accepted(self):
+        data = b"\x00" * 1_000
+        assert len(read_upload(_upload(data), max_size=1_000)) == 1_000
+
+
+# ============================================================================
+# Buffer consumers
+# ============================================================================
+
+class TestBufferPipeline:
+
+    def test_validate_and_decode_share_buffer(self, jpeg_bytes):
+        buffer = read_upload(_upload(jpeg_bytes), max_size=1024 * 1024)
+
+        assert validate_image(buffer) is True
+        img = decode_image(buffer)
+        assert img.size == (64, 48)
+
+    def test_validate_rejects_unknown_magic(self):
+        with pytest.raises(ValueError, match="Unsupported"):
+            validate_image(memoryview(b"not an image at all"))
+
+    def test_validate_rejects_tiny_buffer(self):
+        with pytest.raises(ValueError, match="too small"):
+            validate_image(memoryview(b"\xff\xd8"))
@@ -0,0 +1,185 @@
+"""
+Unit tests for the optimised model cache (app.models.model_cache).
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.models import model_cache
+from app.models.model_cache import cached_optimized_model, MANIFEST
+
+
+onnx = pytest.importorskip("onnx")
+onnxruntime = pytest.importorskip("onnxruntime")
+
+EXTENDED = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+ALL = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+
+def _write_model(path: str, seed: int = 0) -> None:
+    """Tiny Conv + BatchNormalization + Relu model (fusable at every level)."""
+    from onnx import helper, numpy_helper, TensorProto
+
+    rng = np.random.default_rng(seed)
+    weights = {
+        "W": rng.standard_normal((8, 3, 3, 3)).astype(np.float32),
+        "scale": rng.uniform(0.5, 1.5, 8).astype(np.float32),
+        "bias": rng.standard_normal(8).astype(np.float32),
+        "mean": rng.standard_normal(8).astype(np.float32),
+        "var": rng.uniform(0.5, 1.5, 8).astype(np.float32),
+    }
+    graph = helper.make_graph(
+        [
+            helper.make_node("Conv", ["x", "W"], ["c"], pads=[1, 1, 1, 1]),
+            helper.make_node("BatchNormalization", ["c", "scale", "bias", "mean", "var"], ["b"]),
+            helper.make_node("Relu", ["b"], ["y"]),
+        ],
+        "conv_bn_relu",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 3, 16, 16])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1, 8, 16, 16])],
+        [numpy_helper.from_array(v, name=k) for k, v in weights.items()],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+
+
+def _run(model_file: str, level=onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL) -> np.ndarray:
+    so = onnxruntime.SessionOptions()
+    so.graph_optimization_level = level
+    session = onnxruntime.InferenceSession(model_file, so, providers=["CPUExecutionProvider"])
+    x = np.random.default_rng(1).standard_normal((1, 3, 16, 16)).astype(np.float32)
+    return session.run(None, {"x": x})[0]
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    path = str(tmp_path / "det_test.onnx")
+    _write_model(path)
+    return path
+
+
+@pytest.fixture
+def optimizations(monkeypatch):
+    """Records every model the cache optimises."""
+    calls = []
+    optimize = model_cache.optimize_model
+
+    def recording(onnx_file, optimized_file, level):
+        calls.append((onnx_file, level))
+        optimize(onnx_file, optimized_file, level)
+
+    monkeypatch.setattr(model_cache, "optimize_model", recording)
+    return calls
+
+
+def _manifest(model_file: str) -> dict:
+    with open(os.path.join(os.path.dirname(model_file), "optimized", MANIFEST)) as f:
+        return json.load(f)
+
+
+# ============================================================================
+# Building and reusing entries
+# ============================================================================
+
+class TestCachedOptimizedModel:
+
+    def test_first_use_builds_and_records(self, model_file, optimizations):
+        optimized_file = cached_optimized_model(model_file, EXTENDED)
+
+        assert optimized_file.endswith(os.path.join("optimized", "det_test.extended.onnx"))
+        assert os.path.exists(optimized_file)
+        assert len(optimizations) == 1
+        entry = _manifest(model_file)["det_test.extended.onnx"]
+        assert entry["source"] == "det_test.onnx"
+        assert entry["source_sha256"] == model_cache.file_sha256(model_file)
+        assert entry["onnxruntime"] == onnxruntime.__version__
+        assert entry["level"] == "extended" and entry["cpu"] == ""
+
+    def test_second_use_is_a_hit(self, model_file, optimizations):
+        first = cached_optimized_model(model_file, EXTENDED)
+        hits = model_cache.CACHE_HITS.value
+
+        second = cached_optimized_model(model_file, EXTENDED)
+
+        assert second == first
+        assert len(optimizations) == 1
+        assert model_cache.CACHE_HITS.value == hits + 1
+
+    @pytest.mark.parametrize("level", [EXTENDED, ALL])
+    def test_cached_graph_computes_the_same(self, model_file, level):
+        optimized_file = cached_optimized_model(model_file, level)
+
+        np.testing.assert_allclose(_run(optimized_file), _run(model_file, level), rtol=1e-5, atol=1e-5)
+
+    def test_levels_are_cached_separately(self, model_file, optimizations):
+        extended = cached_optimized_model(model_file, EXTENDED)
+        full = cached_optimized_model(model_file, ALL)
+
+        assert extended != full
+        assert len(optimizations) == 2
+        assert _manifest(model_file)["det_test.all.onnx"]["cpu"] == model_cache._cpu_fingerprint()
+
+
+# ============================================================================
+# Invalidation
+# ============================================================================
+
+class TestInvalidation:
+
+    def test_changed_model_is_rebuilt(self, model_file, optimizations):
+        cached_optimized_model(model_file, EXTENDED)
+        _write_model(model_file, seed=1)
+
+        optimized_file = cached_optimized_model(model_file, EXTENDED)
+
+        assert len(optimizations) == 2
+        np.testing.assert_allclose(_run(optimized_file), _run(model_file, EXTENDED), rtol=1e-5, atol=1e-5)
+
+    def test_touched_model_is_rehashed_not_rebuilt(self, model_file, optimizations):
+        cached_optimized_model(model_file, EXTENDED)
+        stat = os.stat(model_file)
+        os.utime(model_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        cached_optimized_model(model_file, EXTENDED)
+
+        assert len(optimizations) == 1
+        assert _manifest(model_file)["det_test.extended.onnx"]["source_mtime_ns"] == stat.st_mtime_ns + 10 ** 9
+
+    def test_other_onnxruntime_version_is_rebuilt(self, model_file, optimizations, monkeypatch):
+        cached_optimized_model(model_file, EXTENDED)
+        monkeypatch.setattr(model_cache.onnxruntime, "__version__", "0.0.0")
+
+        cached_optimized_model(model_file, EXTENDED)
+
+        assert len(optimizations) == 2
+        assert _manifest(model_file)["det_test.extended.onnx"]["onnxruntime"] == "0.0.0"
+
+    def test_other_cpu_invalidates_level_all_only(self, model_file, optimizations, monkeypatch):
+        cached_optimized_model(model_file, EXTENDED)
+        cached_optimized_model(model_file, ALL)
+        monkeypatch.setattr(model_cache, "_cpu_fingerprint", lambda: "other-cpu")
+
+        cached_optimized_model(model_file, EXTENDED)
+        cached_optimized_model(model_file, ALL)
+
+        assert [level for _, level in optimizations] == [EXTENDED, ALL, ALL]
+
+    def test_missing_cached_file_is_rebuilt(self, model_file, optimizations):
+        os.remove(cached_optimized_model(model_file, EXTENDED))
+
+        assert os.path.exists(cached_optimized_model(model_file, EXTENDED))
+        assert len(optimizations) == 2
+
+    def test_corrupt_manifest_is_rebuilt(self, model_file, optimizations):
+        cached_optimized_model(model_file, EXTENDED)
+        with open(os.path.join(os.path.dirname(model_file), "optimized", MANIFEST), "w") as f:
+            f.write("{not json")
+
+        cached_optimized_model(model_file, EXTENDED)
+
+        assert len(optimizations) == 2
+        assert "det_test.extended.onnx" in _manifest(model_file)
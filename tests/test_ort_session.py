@@ -0,0 +1,305 @@
+"""
+Unit tests for ONNX Runtime session configuration (app.models.ort_session)
+and the CPU split between workers (app.utils.cpu).
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import ort_session
+from app.models.ort_session import TunedFaceAnalysis, model_task, session_options
+from app.utils import cpu
+
+
+onnxruntime = pytest.importorskip("onnxruntime")
+onnx = pytest.importorskip("onnx")
+from onnx import TensorProto, helper  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_worker_share(monkeypatch):
+    monkeypatch.setattr(cpu, "_worker_cpus", None)
+
+
+@pytest.fixture
+def no_topology(monkeypatch):
+    """Every CPU is its own physical core."""
+    monkeypatch.setattr(cpu, "_physical_core", lambda c: None)
+
+
+@pytest.fixture
+def hyperthreads(monkeypatch):
+    """CPUs n and n + 4 are siblings of physical core n (8 CPUs, 4 cores)."""
+    monkeypatch.setattr(cpu, "_physical_core", lambda c: (0, c % 4))
+
+
+# ============================================================================
+# CPU split
+# ============================================================================
+
+class TestSplitCpus:
+
+    def test_even_split(self, no_topology):
+        assert cpu.split_cpus(4, list(range(8))) == [[0, 1], [2, 3], [4, 5], [6, 7]]
+
+    def test_remainder_goes_to_first_workers(self, no_topology):
+        assert cpu.split_cpus(4, list(range(6))) == [[0, 1], [2, 3], [4], [5]]
+
+    def test_more_workers_than_cores_share_round_robin(self, no_topology):
+        assert cpu.split_cpus(4, [0, 1]) == [[0], [1], [0], [1]]
+
+    def test_hyperthread_siblings_stay_together(self, hyperthreads):
+        shares = cpu.split_cpus(2, list(range(8)))
+
+        assert shares == [[0, 4, 1, 5], [2, 6, 3, 7]]
+
+    def test_single_worker_gets_everything(self, no_topology):
+        assert cpu.split_cpus(1, [3, 1, 2]) == [[1, 2, 3]]
+
+    def test_invalid_worker_count(self):
+        with pytest.raises(ValueError):
+            cpu.split_cpus(0, [0])
+
+    def test_cpu_list_format(self):
+        assert cpu._cpu_list([0, 1, 2, 3, 8, 10, 11]) == "0-3,8,10-11"
+
+
+class TestWorkerThreads:
+
+    def test_share_of_available_cores(self, monkeypatch, no_topology):
+        monkeypatch.setattr(cpu, "available_cpus", lambda: list(range(8)))
+
+        assert cpu.worker_threads(workers=4) == 2
+        assert cpu.worker_threads(workers=16) == 1
+
+    def test_divides_by_uvicorn_workers_by_default(self, monkeypatch, no_topology):
+        monkeypatch.setattr(cpu, "available_cpus", lambda: list(range(8)))
+        monkeypatch.setattr(cpu.settings, "UVICORN_WORKERS", 2)
+
+        assert cpu.worker_threads() == 4
+
+    def test_configured_worker_uses_its_physical_cores(self, monkeypatch, hyperthreads):
+        monkeypatch.setattr(cpu, "available_cpus", lambda: list(range(8)))
+        pinned = []
+        monkeypatch.setattr(cpu.os, "sched_setaffinity", lambda pid, cpus: pinned.append(cpus), raising=False)
+
+        share = cpu.configure_worker(1, 2, pin=True)
+
+        assert share == [2, 6, 3, 7]
+        assert pinned == [[2, 6, 3, 7]]
+        assert cpu.worker_threads() == 2  # two physical cores, not four hyper-threads
+
+    def test_configure_without_pinning(self, monkeypatch, no_topology):
+        monkeypatch.setattr(cpu, "available_cpus", lambda: list(range(4)))
+        pinned = []
+        monkeypatch.setattr(cpu.os, "sched_setaffinity", lambda pid, cpus: pinned.append(cpus), raising=False)
+
+        cpu.configure_worker(0, 2, pin=False)
+
+        assert pinned == []
+        assert cpu.worker_threads() == 2
+
+
+# ============================================================================
+# Session options
+# ============================================================================
+
+class TestSessionOptions:
+
+    def test_from_settings(self, monkeypatch):
+        monkeypatch.setattr(ort_session.settings, "ORT_INTRA_OP_THREADS", 3)
+        monkeypatch.setattr(ort_session.settings, "ORT_INTER_OP_THREADS", 2)
+        monkeypatch.setattr(ort_session.settings, "ORT_EXECUTION_MODE", "parallel")
+        monkeypatch.setattr(ort_session.settings, "ORT_GRAPH_OPTIMIZATION_LEVEL", "basic")
+
+        so = session_options()
+
+        assert so.intra_op_num_threads == 3
+        assert so.inter_op_num_threads == 2
+        assert so.execution_mode == onnxruntime.ExecutionMode.ORT_PARALLEL
+        assert so.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC
+
+    def test_auto_intra_op_threads(self, monkeypatch):
+        monkeypatch.setattr(ort_session.settings, "ORT_INTRA_OP_THREADS", 0)
+        monkeypatch.setattr(ort_session, "worker_threads", lambda: 5)
+
+        assert session_options().intra_op_num_threads == 5
+
+    def test_level_override(self, monkeypatch):
+        monkeypatch.setattr(ort_session.settings, "ORT_GRAPH_OPTIMIZATION_LEVEL", "all")
+
+        so = session_options(graph_optimization_level=onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED)
+
+        assert so.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+
+    def test_spinning(self, monkeypatch):
+        monkeypatch.setattr(ort_session.settings, "ORT_ALLOW_SPINNING", False)
+        so = session_options()
+        assert so.get_session_config_entry("session.intra_op.allow_spinning") == "0"
+        assert so.get_session_config_entry("session.inter_op.allow_spinning") == "0"
+
+        monkeypatch.setattr(ort_session.settings, "ORT_ALLOW_SPINNING", True)
+        with pytest.raises(Exception):
+            session_options().get_session_config_entry("session.intra_op.allow_spinning")
+
+
+# ============================================================================
+# TunedFaceAnalysis
+# ============================================================================
+
+class TestTunedFaceAnalysis:
+
+    @pytest.fixture
+    def pack(self, tmp_path, monkeypatch):
+        """Model pack directory whose files route to the task named in the file name."""
+        model_dir = tmp_path / "models" / "buffalo_l"
+        model_dir.mkdir(parents=True)
+        for name in ("1k3d68.onnx", "2d106det.onnx", "det_10g.onnx", "genderage.onnx", "w600k_r50.onnx", "zz_det.onnx"):
+            (model_dir / name).write_bytes(b"")
+        tasks = {
+            "1k3d68": "landmark_3d_68", "2d106det": "landmark_2d_106", "det_10g": "detection",
+            "genderage": "genderage", "w600k_r50": "recognition", "zz_det": "detection",
+        }
+
+        sessions = []
+        cached = []
+
+        def fake_cache(onnx_file, level):
+            cached.append(level)
+            return onnx_file.replace(".onnx", ".cached.onnx")
+
+        def fake_session(path, so, providers):
+            sessions.append((path, so, providers))
+            return SimpleNamespace(path=path)
+
+        def fake_task(onnx_file):
+            return tasks[onnx_file.rsplit("/", 1)[-1][:-len(".onnx")]]
+
+        def fake_route(onnx_file, session):
+            assert not onnx_file.endswith(".cached.onnx")  # constants come from the original file
+            return SimpleNamespace(taskname=fake_task(onnx_file), onnx_file=onnx_file)
+
+        monkeypatch.setattr(ort_session.onnxruntime, "InferenceSession", fake_session)
+        monkeypatch.setattr(ort_session, "model_task", fake_task)
+        monkeypatch.setattr(ort_session, "model_for_session", fake_route)
+        monkeypatch.setattr(ort_session, "cached_optimized_model", fake_cache)
+        monkeypatch.setattr(ort_session.settings, "ORT_MODEL_CACHE", True)
+        return str(tmp_path), sessions
+
+    def test_sessions_use_configured_options(self, pack, monkeypatch):
+        root, sessions = pack
+        monkeypatch.setattr(ort_session.settings, "ORT_INTRA_OP_THREADS", 2)
+
+        TunedFaceAnalysis(root=root, allowed_modules=["detection", "recognition"])
+
+        assert sessions
+        assert all(so.intra_op_num_threads == 2 for _, so, _ in sessions)
+        assert all(providers == ["CPUExecutionProvider"] for _, _, providers in sessions)
+
+    def test_allowed_modules_and_first_model_per_task(self, pack):
+        root, _ = pack
+
+        app = TunedFaceAnalysis(root=root, allowed_modules=["detection", "recognition"])
+
+        assert set(app.models) == {"detection", "recognition"}
+        assert app.det_model.onnx_file.endswith("det_10g.onnx")
+
+    def test_skipped_models_get_no_session(self, pack, monkeypatch):
+        root, sessions = pack
+        cached = []
+        monkeypatch.setattr(ort_session, "cached_optimized_model", lambda f, level: cached.append(f) or f)
+
+        TunedFaceAnalysis(root=root, allowed_modules=["detection", "recognition"])
+
+        built = sorted(path.rsplit("/", 1)[-1] for path, _, _ in sessions)
+        assert built == ["det_10g.onnx", "w600k_r50.onnx"]
+        assert sorted(f.rsplit("/", 1)[-1] for f in cached) == built
+
+    def test_all_modules(self, pack):
+        root, _ = pack
+
+        app = TunedFaceAnalysis(root=root, allowed_modules=None)
+
+        assert set(app.models) == {"landmark_3d_68", "landmark_2d_106", "detection", "genderage", "recognition"}
+
+    def test_sessions_built_from_cached_graphs(self, pack, monkeypatch):
+        root, sessions = pack
+        monkeypatch.setattr(ort_session.settings, "ORT_GRAPH_OPTIMIZATION_LEVEL", "extended")
+
+        TunedFaceAnalysis(root=root, allowed_modules=["detection", "recognition"])
+
+        assert all(path.endswith(".cached.onnx") for path, _, _ in sessions)
+        assert all(
+            so.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+            for _, so, _ in sessions
+        )
+
+    def test_cache_disabled(self, pack, monkeypatch):
+        root, sessions = pack
+        monkeypatch.setattr(ort_session.settings, "ORT_MODEL_CACHE", False)
+        monkeypatch.setattr(ort_session.settings, "ORT_GRAPH_OPTIMIZATION_LEVEL", "all")
+
+        TunedFaceAnalysis(root=root, allowed_modules=["detection", "recognition"])
+
+        assert not any(path.endswith(".cached.onnx") for path, _, _ in sessions)
+        assert all(
+            so.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            for _, so, _ in sessions
+        )
+
+    def test_no_cache_for_gpu_providers(self, pack):
+        root, sessions = pack
+
+        TunedFaceAnalysis(root=root, providers=["CUDAExecutionProvider", "CPUExecutionProvider"])
+
+        assert not any(path.endswith(".cached.onnx") for path, _, _ in sessions)
+
+    def test_unwritable_cache_falls_back_to_original_models(self, pack, monkeypatch):
+        root, sessions = pack
+
+        def unwritable(onnx_file, level):
+            raise PermissionError("read-only file system")
+
+        monkeypatch.setattr(ort_session, "cached_optimized_model", unwritable)
+
+        app = TunedFaceAnalysis(root=root, allowed_modules=["detection", "recognition"])
+
+        assert set(app.models) == {"detection", "recognition"}
+        assert not any(path.endswith(".cached.onnx") for path, _, _ in sessions)
+
+
+# ============================================================================
+# model_task
+# ============================================================================
+
+def _graph_file(tmp_path, input_shape, output_shapes, initializers=()):
+    # Initializers first, as old opsets list them
+    inputs = [helper.make_tensor_value_info(name, TensorProto.FLOAT, [1]) for name in initializers]
+    inputs.append(helper.make_tensor_value_info("input", TensorProto.FLOAT, input_shape))
+    outputs = [helper.make_tensor_value_info(f"out{i}", TensorProto.FLOAT, shape) for i, shape in enumerate(output_shapes)]
+    nodes = [helper.make_node("Identity", ["input"], [out.name]) for out in outputs]
+    inits = [helper.make_tensor(name, TensorProto.FLOAT, [1], [0.0]) for name in initializers]
+    path = tmp_path / "model.onnx"
+    onnx.save(helper.make_model(helper.make_graph(nodes, "g", inputs, outputs, inits)), str(path))
+    return str(path)
+
+
+class TestModelTask:
+
+    @pytest.mark.parametrize("input_shape, output_shapes, task", [
+        ([1, 3, "?", "?"], [[None, 1]] * 9, "detection"),
+        ([None, 3, 192, 192], [[None, 3309]], "landmark_3d_68"),
+        ([None, 3, 192, 192], [[None, 212]], "landmark_2d_106"),
+        ([None, 3, 96, 96], [[None, 3]], "genderage"),
+        ([None, 3, 96, 96], [[None, 7]], "attribute_7"),
+        ([None, 3, 112, 112], [[1, 512]], "recognition"),
+        ([None, 3, 100, 100], [[1, 512]], None),
+    ])
+    def test_routes_like_model_zoo(self, tmp_path, input_shape, output_shapes, task):
+        assert model_task(_graph_file(tmp_path, input_shape, output_shapes)) == task
+
+    def test_initializer_inputs_ignored(self, tmp_path):
+        path = _graph_file(tmp_path, [1, 3, 112, 112], [[1, 512]], initializers=["weight"])
+
+        assert model_task(path) == "recognition"
@@ -0,0 +1,213 @@
+"""
+Unit tests for model preloading (app.models.preload), the embedder's use of
+it, and per-process memory accounting (app.utils.memory).
+"""
+
+import dataclasses
+import os
+import sys
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+from app.models import preload
+from app.models.insightface import InsightFaceEmbedder, Device
+from app.models.model_cache import optimize_model
+from app.models.preload import PreloadedModel, load_initializers, _shared_weights_options
+from app.utils.memory import process_memory_mb
+
+
+onnx = pytest.importorskip("onnx")
+onnxruntime = pytest.importorskip("onnxruntime")
+
+
+@pytest.fixture
+def conv_bn_onnx(tmp_path):
+    """Tiny Conv + BatchNormalization model (the fusion the offline optimisation applies)."""
+    from onnx import helper, numpy_helper, TensorProto
+
+    rng = np.random.default_rng(0)
+    weights = {
+        "W": rng.standard_normal((8, 3, 3, 3)).astype(np.float32),
+        "scale": rng.uniform(0.5, 1.5, 8).astype(np.float32),
+        "bias": rng.standard_normal(8).astype(np.float32),
+        "mean": rng.standard_normal(8).astype(np.float32),
+        "var": rng.uniform(0.5, 1.5, 8).astype(np.float32),
+    }
+    graph = helper.make_graph(
+        [
+            helper.make_node("Conv", ["x", "W"], ["c"], pads=[1, 1, 1, 1]),
+            helper.make_node("BatchNormalization", ["c", "scale", "bias", "mean", "var"], ["y"]),
+        ],
+        "conv_bn",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 3, 16, 16])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1, 8, 16, 16])],
+        [numpy_helper.from_array(v, name=k) for k, v in weights.items()],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    path = tmp_path / "conv_bn.onnx"
+    onnx.save(model, str(path))
+    return str(path)
+
+
+@pytest.fixture
+def optimized(conv_bn_onnx, tmp_path):
+    optimized_file = str(tmp_path / "optimized.onnx")
+    optimize_model(conv_bn_onnx, optimized_file)
+    return PreloadedModel(
+        taskname="test",
+        onnx_file=conv_bn_onnx,
+        optimized_file=optimized_file,
+        initializers=load_initializers(optimized_file),
+    )
+
+
+def _run(model_file, so=None):
+    session = onnxruntime.InferenceSession(model_file, so, providers=["CPUExecutionProvider"])
+    x = np.linspace(-1, 1, 3 * 16 * 16, dtype=np.float32).reshape(1, 3, 16, 16)
+    return session, session.run(None, {"x": x})[0]
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(preload, "_preloaded", {})
+    return preload._preloaded
+
+
+# ============================================================================
+# ORT conversion and shared-weights sessions
+# ============================================================================
+
+class TestSharedWeights:
+
+    def test_optimize_model_writes_equivalent_model(self, conv_bn_onnx, optimized, tmp_path):
+        _, expected = _run(conv_bn_onnx)
+        _, actual = _run(optimized.optimized_file)
+
+        np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-5)
+        assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
+
+    def test_batchnorm_folded_offline(self, optimized):
+        # No fusion left for the workers to do, so no private weight copies
+        assert "mean" not in optimized.initializers
+        assert all(a.flags["C_CONTIGUOUS"] for a in optimized.initializers.values())
+
+    def test_session_computes_from_preloaded_arrays(self, conv_bn_onnx, optimized, monkeypatch):
+        monkeypatch.setattr(preload.settings, "PRELOAD_DISABLE_PREPACKING", True)
+        _, expected = _run(conv_bn_onnx)
+
+        # Writable copies (the loaded arrays are read-only) so the test can zero them below
+        optimized = dataclasses.replace(optimized, initializers={k: v.copy() for k, v in optimized.initializers.items()})
+        so, values = _shared_weights_options(optimized)
+        session, actual = _run(optimized.optimized_file, so)
+        np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-5)
+
+        # Zeroing the arrays changes the output: ORT holds no copy of them
+        for array in optimized.initializers.values():
+            array[...] = 0
+        x = np.ones((1, 3, 16, 16), dtype=np.float32)
+        assert np.allclose(session.run(None, {"x": x})[0], 0)
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="fork() only")
+    def test_session_created_after_fork(self, conv_bn_onnx, optimized):
+        """The launcher pattern: arrays loaded in the parent, session built in the child."""
+        _, expected = _run(conv_bn_onnx)  # the parent has used (and dropped) sessions
+
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                so, values = _shared_weights_options(optimized)
+                _, actual = _run(optimized.optimized_file, so)
+                code = 0 if np.allclose(actual, expected, rtol=1e-4, atol=1e-5) else 2
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+    def test_prepacking_setting(self, optimized, monkeypatch):
+        monkeypatch.setattr(preload.settings, "PRELOAD_DISABLE_PREPACKING", True)
+        so, _ = _shared_weights_options(optimized)
+        assert so.get_session_config_entry("session.disable_prepacking") == "1"
+
+        monkeypatch.setattr(preload.settings, "PRELOAD_DISABLE_PREPACKING", False)
+        so, _ = _shared_weights_options(optimized)
+        with pytest.raises(Exception):
+            so.get_session_config_entry("session.disable_prepacking")
+
+
+# ============================================================================
+# InsightFaceEmbedder with a preloaded pack
+# ============================================================================
+
+class TestEmbedderPreloaded:
+
+    def _models(self, *tasks):
+        return [
+            PreloadedModel(taskname=t, onnx_file=f"/models/{t}.onnx", optimized_file=f"/models/optimized/{t}.onnx",
+                           initializers={})
+            for t in tasks
+        ]
+
+    def test_uses_preloaded_models_when_available(self, monkeypatch, registry):
+        registry["buffalo_l"] = self._models("detection", "recognition", "genderage")
+        preloaded_app = MagicMock()
+        face_analysis = MagicMock()
+        monkeypatch.setattr("app.models.insightface.PreloadedFaceAnalysis", preloaded_app)
+        monkeypatch.setattr("app.models.insightface.TunedFaceAnalysis", face_analysis)
+
+        InsightFaceEmbedder(device=Device.CPU)
+
+        face_analysis.assert_not_called()
+        models = preloaded_app.call_args.args[0]
+        assert [m.taskname for m in models] == ["detection", "recognition"]
+
+    def test_falls_back_without_preload(self, monkeypatch, registry):
+        preloaded_app = MagicMock()
+        face_analysis = MagicMock()
+        monkeypatch.setattr("app.models.insightface.PreloadedFaceAnalysis", preloaded_app)
+        monkeypatch.setattr("app.models.insightface.TunedFaceAnalysis", face_analysis)
+
+        InsightFaceEmbedder(device=Device.CPU)
+
+        preloaded_app.assert_not_called()
+        face_analysis.assert_called_once()
+
+    def test_falls_back_when_module_not_preloaded(self, monkeypatch, registry):
+        registry["buffalo_l"] = self._models("detection", "recognition")
+        preloaded_app = MagicMock()
+        face_analysis = MagicMock()
+        monkeypatch.setattr("app.models.insightface.PreloadedFaceAnalysis", preloaded_app)
+        monkeypatch.setattr("app.models.insightface.TunedFaceAnalysis", face_analysis)
+
+        InsightFaceEmbedder(device=Device.CPU, allowed_modules=["detection", "recognition", "landmark_3d_68"])
+
+        preloaded_app.assert_not_called()
+        face_analysis.assert_called_once()
+
+
+# ============================================================================
+# Memory accounting
+# ============================================================================
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="/proc only")
+class TestProcessMemory:
+
+    def test_reports_current_process(self):
+        memory = process_memory_mb()
+
+        assert memory["rss_mb"] > 0
+        if memory["pss_mb"] is not None:
+            assert 0 < memory["pss_mb"] <= memory["rss_mb"] + 1
+            assert memory["uss_mb"] <= memory["pss_mb"] + 1
+
+    def test_by_pid(self):
+        assert process_memory_mb(os.getpid())["rss_mb"] > 0
+
+    def test_missing_process(self):
+        with pytest.raises(FileNotFoundError):
+            process_memory_mb(2 ** 22 + 12345)
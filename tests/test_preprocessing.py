@@ -0,0 +1,134 @@
+"""
+Unit tests for image decoding and preprocessing.
+"""
+
+import io
+import pytest
+import numpy as np
+from PIL import Image
+
+import asyncio
+import threading
+
+from app.services.preprocessing import (
+    decode_image,
+    load_image,
+    resize_if_needed,
+    preprocess_image,
+    preprocess_upload,
+)
+from app.utils.exceptions import ImageProcessingError
+
+
+# ============================================================================
+# Helpers
+# ============================================================================
+
+def _encode(size: tuple[int, int], fmt: str = "JPEG", orientation: int | None = None) -> memoryview:
+    img = Image.new("RGB", size, (200, 150, 100))
+    buf = io.BytesIO()
+    kwargs = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        kwargs["exif"] = exif
+    img.save(buf, format=fmt, **kwargs)
+    return memoryview(buf.getvalue())
+
+
+# ============================================================================
+# Decode-time downscaling
+# ============================================================================
+
+class TestDecodeDownscaling:
+
+    @pytest.mark.parametrize("size", [(1280, 960), (2560, 1920), (4096, 4096), (4000, 700)])
+    def test_large_jpeg_decoded_at_reduced_scale(self, size):
+        """JPEGs are decoded at a DCT scale that keeps the longest side >= 640."""
+        img = decode_image(_encode(size), target_max_dim=640)
+
+        assert 640 <= max(img.size) <= max(size)
+        assert max(img.size) < 2 * 640 or max(size) < 2 * 640
+
+    def test_small_jpeg_untouched(self):
+        img = decode_image(_encode((500, 400)), target_max_dim=640)
+        assert img.size == (500, 400)
+
+    def test_png_decoded_at_full_size(self):
+        img = decode_image(_encode((2000, 1000), fmt="PNG"), target_max_dim=640)
+        assert img.size == (2000, 1000)
+
+    def test_zero_target_disables_downscaling(self):
+        img = decode_image(_encode((2560, 1920)), target_max_dim=0)
+        assert img.size == (2560, 1920)
+
+    def test_exif_orientation_still_applied(self):
+        """Orientation 6 (rotate 90°) swaps the axes of the reduced image."""
+        img = decode_image(_encode((2560, 1280), orientation=6), target_max_dim=640)
+
+        assert img.height > img.width
+        assert max(img.size) >= 640
+
+    def test_dimension_limit_checked_before_decoding(self):
+        with pytest.raises(ImageProcessingError, match="exceed"):
+            decode_image(_encode((1000, 800)), max_dimensions=(900, 900), target_max_dim=640)
+
+    def test_dimension_limit_uses_oriented_size(self):
+        """A 1000x400 image rotated by EXIF is 400x1000 and must fit (500, 1000)."""
+        img = decode_image(_encode((1000, 400), orientation=6), max_dimensions=(500, 1000), target_max_dim=0)
+        assert img.size == (400, 1000)
+
+    def test_pipeline_output_matches_target(self):
+        """decode -> load -> resize ends at exactly the inference size."""
+        img = decode_image(_encode((3000, 2000)), target_max_dim=640)
+        array = resize_if_needed(load_image(img), max_dim=640)
+
+        assert array.shape[1] == 640
+        assert array.dtype == np.uint8
+
+
+# ============================================================================
+# Off-loop preprocessing chain
+# ============================================================================
+
+class TestPreprocessUpload:
+
+    def test_chain_reports_every_stage(self):
+        result = preprocess_image(_encode((1280, 960)))
+
+        assert set(result.timings_ms) == {"validate", "decode", "load", "resize"}
+        assert all(ms >= 0 for ms in result.timings_ms.values())
+        assert max(result.img_array.shape[:2]) == 640
+
+    def test_unsupported_format_is_image_processing_error(self):
+        with pytest.raises(ImageProcessingError, match="Unsupported"):
+            preprocess_image(memoryview(b"definitely not an image"))
+
+    def test_runs_in_preprocess_pool(self, monkeypatch):
+        seen = {}
+        real = preprocess_image
+
+        def spy(data):
+            seen["thread"] = threading.current_thread().name
+            return real(data)
+
+        monkeypatch.setattr("app.services.preprocessing.preprocess_image", spy)
+        result = asyncio.run(preprocess_upload(_encode((800, 600))))
+
+        assert seen["thread"].startswith("preprocess")
+        assert "queue_wait" in result.timings_ms
+
+    def test_event_loop_stays_responsive(self):
+        """The loop keeps ticking while a large PNG is being decoded."""
+        data = _encode((4096, 3072), fmt="PNG")
+
+        async def run():
+            task = asyncio.ensure_future(preprocess_upload(data))
+            ticks = 0
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0.001)
+            await task
+            return ticks
+
+        assert asyncio.run(run()) > 1
@@ -0,0 +1,149 @@
+"""
+Tests for /recognize/embedding: payload decoding/validation, the
+inference-free service path and the endpoint. Database is mocked.
+"""
+
+import asyncio
+import base64
+import uuid
+import pytest
+import numpy as np
+from unittest.mock import Mock, AsyncMock
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api import deps
+from app.api.routes import recognize as recognize_route
+from app.schemas.recognize_schema import RecognizeResponse
+from app.services import recognition
+from app.services.validation import decode_embedding
+
+
+def _unit(dtype=np.float32, seed=0):
+    v = np.random.default_rng(seed).standard_normal(512)
+    return (v / np.linalg.norm(v)).astype(dtype)
+
+
+def _encode(array) -> str:
+    return base64.b64encode(np.asarray(array).astype(array.dtype.newbyteorder("<")).tobytes()).decode()
+
+
+# ============================================================================
+# decode_embedding
+# ============================================================================
+
+class TestDecodeEmbedding:
+
+    @pytest.mark.parametrize("dtype,wire", [("float32", np.float32), ("float16", np.float16)])
+    def test_round_trip(self, dtype, wire):
+        emb = _unit(wire)
+
+        decoded = decode_embedding(_encode(emb), dtype)
+
+        assert decoded.dtype == np.float32
+        assert decoded.shape == (512,)
+        assert np.allclose(decoded, emb.astype(np.float32))
+
+    def test_wrong_dimension(self):
+        emb = _unit()[:128]
+        with pytest.raises(ValueError, match="512 float32 values"):
+            decode_embedding(_encode(emb), "float32")
+
+    def test_float16_payload_declared_as_float32(self):
+        with pytest.raises(ValueError, match="2048 bytes"):
+            decode_embedding(_encode(_unit(np.float16)), "float32")
+
+    def test_not_normalised(self):
+        with pytest.raises(ValueError, match="L2-normalised"):
+            decode_embedding(_encode(_unit() * 2), "float32")
+
+    def test_nan_rejected(self):
+        emb = _unit()
+        emb[3] = np.nan
+        with pytest.raises(ValueError, match="NaN"):
+            decode_embedding(_encode(emb), "float32")
+
+    def test_invalid_base64(self):
+        with pytest.raises(ValueError, match="base64"):
+            decode_embedding("not base64!", "float32")
+
+
+# ============================================================================
+# Service
+# ============================================================================
+
+class TestRecognizeEmbedding:
+
+    def test_goes_straight_to_vector_search(self, monkeypatch):
+        user_id = uuid.uuid4()
+        nearest = AsyncMock(return_value=[(user_id, 0.91)])
+        monkeypatch.setattr(recognition, "nearest_users", nearest)
+        embed = AsyncMock()
+        monkeypatch.setattr(recognition, "embed_image", embed)
+        emb = _unit()
+
+        response = asyncio.run(recognition.recognize_embedding(
+            encoded=_encode(emb), dtype="float32", matcher=Mock(threshold=0.7), db=Mock(), k=2,
+        ))
+
+        assert response.match is True
+        assert response.user_id == user_id
+        embed.assert_not_called()
+        assert np.array_equal(nearest.await_args.args[1], emb)
+        assert nearest.await_args.kwargs["k"] == 2
+
+    def test_same_threshold_as_image_path(self, monkeypatch):
+        monkeypatch.setattr(recognition, "nearest_users", AsyncMock(return_value=[(uuid.uuid4(), 0.69)]))
+
+        response = asyncio.run(recognition.recognize_embedding(
+            encoded=_encode(_unit()), dtype="float32", matcher=Mock(threshold=0.7), db=Mock(),
+        ))
+
+        assert response.match is False
+        assert response.similarity == pytest.approx(0.69)
+
+    def test_invalid_embedding_is_422(self, monkeypatch):
+        nearest = AsyncMock()
+        monkeypatch.setattr(recognition, "nearest_users", nearest)
+
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(recognition.recognize_embedding(
+                encoded=_encode(_unit() * 3), dtype="float32", matcher=Mock(threshold=0.7), db=Mock(),
+            ))
+
+        assert exc.value.status_code == 422
+        nearest.assert_not_called()
+
+
+# ============================================================================
+# Endpoint
+# ============================================================================
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[deps.get_current_user_async] = lambda: Mock(is_active=True)
+    app.dependency_overrides[deps.get_async_db] = lambda: Mock()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+class TestEmbeddingEndpoint:
+
+    def test_json_body(self, client, monkeypatch):
+        user_id = uuid.uuid4()
+        service = AsyncMock(return_value=RecognizeResponse(match=True, user_id=user_id, similarity=0.9))
+        monkeypatch.setattr(recognize_route, "recognize_embedding", service)
+        encoded = _encode(_unit(np.float16))
+
+        response = client.post("/recognize/embedding?k=3", json={"embedding": encoded, "dtype": "float16"})
+
+        assert response.status_code == 200
+        assert response.json()["user_id"] == str(user_id)
+        assert service.await_args.kwargs["encoded"] == encoded
+        assert service.await_args.kwargs["dtype"] == "float16"
+        assert service.await_args.kwargs["k"] == 3
+
+    def test_unknown_dtype_rejected(self, client):
+        response = client.post("/recognize/embedding", json={"embedding": _encode(_unit()), "dtype": "float64"})
+        assert response.status_code == 422
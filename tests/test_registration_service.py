@@ -0,0 +1,154 @@
+"""
+Unit tests for the async registration service.
+"""
+
+import asyncio
+import uuid
+import pytest
+import numpy as np
+from unittest.mock import Mock, AsyncMock
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+from app.services import registration
+from app.services.preprocessing import PreprocessResult
+from app.schemas.detection import FaceEmbedding
+from app.utils.exceptions import NoFaceDetectedError
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+class FakeSessionFactory:
+    """Stands in for AsyncSessionLocal; records whether the session is still open."""
+
+    def __init__(self, session):
+        self.session = session
+        self.open = False
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        self.open = True
+        return self.session
+
+    async def __aexit__(self, *exc):
+        self.open = False
+
+
+@pytest.fixture
+def lookup(monkeypatch):
+    """The short session of the duplicate pre-check."""
+    session = Mock()
+    session.scalar = AsyncMock(return_value=None)
+    session.commit = AsyncMock()
+    factory = FakeSessionFactory(session)
+    monkeypatch.setattr(registration, "AsyncSessionLocal", factory)
+    return factory
+
+
+@pytest.fixture
+def db(lookup):
+    session = Mock()
+    session.scalar = AsyncMock(return_value=None)
+    session.rollback = AsyncMock()
+
+    # flush() assigns primary keys like the real session would
+    session.add.side_effect = lambda user: setattr(session, "added", user)
+    session.flush = AsyncMock(side_effect=lambda: setattr(session.added, "user_id", uuid.uuid4()))
+    return session
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Patch the offloaded preprocessing and inference steps."""
+    preprocess = AsyncMock(return_value=PreprocessResult(
+        img_array=np.zeros((480, 640, 3), dtype=np.uint8), timings_ms={}
+    ))
+    embedding = np.random.randn(512).astype(np.float32)
+    embed = AsyncMock(return_value=FaceEmbedding(
+        embedding=embedding / np.linalg.norm(embedding), detection_score=0.95
+    ))
+    monkeypatch.setattr(registration, "preprocess_upload", preprocess)
+    monkeypatch.setattr(registration, "embed_image", embed)
+    return preprocess, embed
+
+
+def _register(db, embedder=None, batcher=None):
+    return asyncio.run(registration.register_user(
+        image_data=memoryview(b"\xff\xd8\xff"),
+        name="Ada",
+        surname="Lovelace",
+        db=db,
+        embedder=embedder or Mock(),
+        auth_user_id=uuid.uuid4(),
+        batcher=batcher,
+    ))
+
+
+# ============================================================================
+# register_user
+# ============================================================================
+
+class TestRegisterUser:
+
+    def test_existing_profile_rejected_before_inference(self, db, lookup, pipeline):
+        preprocess, embed = pipeline
+        lookup.session.scalar.return_value = uuid.uuid4()
+
+        with pytest.raises(HTTPException) as exc:
+            _register(db)
+
+        assert exc.value.status_code == 409
+        preprocess.assert_not_called()
+        embed.assert_not_called()
+
+    def test_request_session_untouched_until_insert(self, db, lookup, pipeline):
+        """The pre-check's connection is back in the pool before inference starts."""
+        _, embed = pipeline
+        seen = []
+
+        async def embed_image(*args):
+            seen.append((lookup.open, list(db.method_calls)))
+            return embed.return_value
+
+        embed.side_effect = embed_image
+
+        _register(db)
+
+        assert seen == [(False, [])]  # pre-check closed, request session not used yet
+        lookup.session.scalar.assert_awaited_once()
+        lookup.session.commit.assert_awaited_once()
+
+    def test_uses_offloaded_pipeline_and_batcher(self, db, pipeline):
+        preprocess, embed = pipeline
+        batcher = Mock()
+
+        response = _register(db, batcher=batcher)
+
+        assert response.is_registered is True
+        preprocess.assert_awaited_once()
+        assert embed.await_args.args[2] is batcher
+        db.add.assert_called_once()
+        db.flush.assert_awaited_once()
+
+    def test_concurrent_duplicate_is_conflict(self, db, pipeline):
+        db.flush.side_effect = IntegrityError("INSERT", {}, Exception("duplicate key"))
+
+        with pytest.raises(HTTPException) as exc:
+            _register(db)
+
+        assert exc.value.status_code == 409
+        db.rollback.assert_awaited_once()
+
+    def test_no_face_is_unprocessable(self, db, pipeline):
+        _, embed = pipeline
+        embed.side_effect = NoFaceDetectedError("No face detected")
+
+        with pytest.raises(HTTPException) as exc:
+            _register(db)
+
+        assert exc.value.status_code == 422
+        db.add.assert_not_called()
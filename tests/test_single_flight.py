@@ -0,0 +1,137 @@
+"""
+Unit tests for single-flight coalescing of identical in-flight inference.
+"""
+
+import asyncio
+import numpy as np
+
+from app.models.single_flight import SingleFlight
+from app.schemas.detection import FaceEmbedding
+from app.services.inference import cached_embed
+from app.utils.exceptions import NoFaceDetectedError
+
+
+class SlowEmbed:
+    """Counts calls; each call blocks until `release` is set."""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _face():
+    return FaceEmbedding(embedding=np.ones(512, dtype=np.float32) / np.sqrt(512), detection_score=0.9)
+
+
+# ============================================================================
+# SingleFlight
+# ============================================================================
+
+class TestSingleFlight:
+
+    def test_concurrent_duplicates_share_one_run(self):
+        async def run():
+            flights = SingleFlight()
+            fn = SlowEmbed(result="embedding")
+            callers = [asyncio.create_task(flights.do(b"key", fn)) for _ in range(10)]
+            await asyncio.sleep(0)
+            fn.release.set()
+            return fn, await asyncio.gather(*callers), flights
+
+        fn, results, flights = asyncio.run(run())
+
+        assert fn.calls == 1
+        assert results == ["embedding"] * 10
+        assert len(flights) == 0  # forgotten once finished
+
+    def test_different_keys_not_coalesced(self):
+        async def run():
+            flights = SingleFlight()
+            fn = SlowEmbed(result=1)
+            fn.release.set()
+            await asyncio.gather(flights.do(b"a", fn), flights.do(b"b", fn))
+            return fn
+
+        assert asyncio.run(run()).calls == 2
+
+    def test_sequential_calls_run_again(self):
+        async def run():
+            flights = SingleFlight()
+            fn = SlowEmbed(result=1)
+            fn.release.set()
+            await flights.do(b"a", fn)
+            await flights.do(b"a", fn)
+            return fn
+
+        assert asyncio.run(run()).calls == 2
+
+    def test_exception_delivered_to_every_caller(self):
+        async def run():
+            flights = SingleFlight()
+            fn = SlowEmbed(error=NoFaceDetectedError("No face detected in image"))
+            callers = [asyncio.create_task(flights.do(b"key", fn)) for _ in range(3)]
+            await asyncio.sleep(0)
+            fn.release.set()
+            return fn, await asyncio.gather(*callers, return_exceptions=True)
+
+        fn, results = asyncio.run(run())
+
+        assert fn.calls == 1
+        assert all(isinstance(r, NoFaceDetectedError) for r in results)
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        async def run():
+            flights = SingleFlight()
+            fn = SlowEmbed(result="embedding")
+            leader = asyncio.create_task(flights.do(b"key", fn))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(flights.do(b"key", fn))
+            await asyncio.sleep(0)
+            leader.cancel()
+            fn.release.set()
+            return fn, await follower, leader
+
+        fn, result, leader = asyncio.run(run())
+
+        assert leader.cancelled()
+        assert result == "embedding"
+        assert fn.calls == 1
+
+
+# ============================================================================
+# cached_embed with single-flight
+# ============================================================================
+
+class TestCachedEmbedSingleFlight:
+
+    def _concurrent(self, single_flight, payloads):
+        async def run():
+            fn = SlowEmbed(result=_face())
+            callers = [
+                asyncio.create_task(cached_embed(data, None, fn, single_flight=single_flight))
+                for data in payloads
+            ]
+            await asyncio.sleep(0.01)
+            fn.release.set()
+            await asyncio.gather(*callers)
+            return fn.calls
+
+        return asyncio.run(run())
+
+    def test_identical_uploads_embedded_once(self):
+        assert self._concurrent(True, [b"same frame"] * 8) == 1
+
+    def test_distinct_uploads_each_embedded(self):
+        assert self._concurrent(True, [b"frame %d" % i for i in range(4)]) == 4
+
+    def test_disabled(self):
+        assert self._concurrent(False, [b"same frame"] * 3) == 3
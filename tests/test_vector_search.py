@@ -0,0 +1,396 @@
+"""
+Tests for the pgvector nearest-face query.
+
+The plan check needs a migrated PostgreSQL + pgvector database at
+DATABASE_URL and is skipped when none is reachable.
+"""
+
+import asyncio
+import uuid
+import pytest
+import numpy as np
+from unittest.mock import Mock, AsyncMock
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from psycopg.pq import TransactionStatus
+
+from app.services.vector_search import (
+    BATCH_NEAREST_USERS_SQL_BY_MODE,
+    MAX_EF_SEARCH,
+    NEAREST_USERS_SQL,
+    NEAREST_USERS_SQL_BY_MODE,
+    SET_EF_SEARCH_SQL,
+    nearest_users,
+    query_vector,
+    resolve_ef_search,
+)
+from app.core.config import settings
+from app.db import session as db_session
+
+
+# ============================================================================
+# Parameter binding
+# ============================================================================
+
+class TestQueryVector:
+
+    def test_float32_contiguous(self):
+        emb = np.random.randn(512).astype(np.float64)[::-1]
+        vec = query_vector(emb)
+
+        assert vec.dtype == np.float32
+        assert vec.flags["C_CONTIGUOUS"]
+        assert vec.shape == (512,)
+
+    def test_float32_input_not_copied(self):
+        emb = np.random.randn(512).astype(np.float32)
+        assert np.shares_memory(query_vector(emb), emb)
+
+    def test_embedding_bound_as_array_not_text(self):
+        db = Mock()
+        db.execute = AsyncMock(return_value=Mock(fetchall=Mock(return_value=[])))
+        emb = np.random.randn(512).astype(np.float32)
+
+        assert asyncio.run(nearest_users(db, emb)) == []
+
+        statement, params = db.execute.await_args.args
+        assert statement is NEAREST_USERS_SQL
+        assert isinstance(params["vec"], np.ndarray)
+
+
+# ============================================================================
+# Top-k and ef_search
+# ============================================================================
+
+class TestTopK:
+
+    def _run(self, k, ef_search, mode="vector"):
+        db = Mock()
+        db.execute = AsyncMock(return_value=Mock(fetchall=Mock(return_value=[])))
+        asyncio.run(nearest_users(db, np.random.randn(512), k=k, ef_search=ef_search, mode=mode))
+        return db.execute.await_args_list
+
+    def test_ef_search_set_for_the_transaction_first(self):
+        set_call, query_call = self._run(k=3, ef_search=100)
+
+        assert set_call.args == (SET_EF_SEARCH_SQL, {"ef_search": "100"})
+        assert "true)" in SET_EF_SEARCH_SQL.text  # is_local: SET LOCAL semantics
+        assert query_call.args[1]["k"] == 3
+        assert query_call.args[1]["candidates"] == 100
+
+    def test_ef_search_raised_to_k(self, monkeypatch):
+        """The HNSW scan cannot return more than ef_search faces."""
+        monkeypatch.setattr(settings, "RECOGNITION_FACES_PER_USER", 1)
+        set_call, query_call = self._run(k=10, ef_search=4)
+
+        assert set_call.args[1] == {"ef_search": "10"}
+        assert query_call.args[1]["candidates"] == 10
+
+    def test_shortlist_capped_at_pgvector_limit(self, monkeypatch):
+        """hnsw.ef_search only accepts 1..1000; the largest allowed k x faces-per-user is 10000."""
+        monkeypatch.setattr(settings, "RECOGNITION_FACES_PER_USER", 100)
+        set_call, query_call = self._run(k=100, ef_search=40)
+
+        assert set_call.args[1] == {"ef_search": str(MAX_EF_SEARCH)}
+        assert query_call.args[1]["candidates"] == MAX_EF_SEARCH
+
+    def test_shortlist_at_the_cap_unchanged(self, monkeypatch):
+        monkeypatch.setattr(settings, "RECOGNITION_FACES_PER_USER", 10)
+        _, query_call = self._run(k=100, ef_search=40)
+
+        assert query_call.args[1]["candidates"] == 1000
+
+    def test_shortlist_covers_k_users_with_several_faces(self, monkeypatch):
+        """The LIMIT applies before GROUP BY user_id, so k users need k x faces-per-user faces."""
+        monkeypatch.setattr(settings, "RECOGNITION_FACES_PER_USER", 4)
+        set_call, query_call = self._run(k=5, ef_search=16)
+
+        assert set_call.args[1] == {"ef_search": "20"}
+        assert query_call.args[1]["candidates"] == 20
+
+    @pytest.mark.parametrize("mode", ["halfvec", "bit"])
+    def test_quantized_mode_reranks_a_wider_shortlist(self, mode, monkeypatch):
+        monkeypatch.setattr(settings, "RECOGNITION_RERANK_CANDIDATES", 150)
+        set_call, query_call = self._run(k=3, ef_search=40, mode=mode)
+
+        assert query_call.args[0] is NEAREST_USERS_SQL_BY_MODE[mode]
+        assert query_call.args[1]["candidates"] == 150
+        assert set_call.args[1] == {"ef_search": "150"}
+        # Final similarity comes from the full-precision column
+        assert "s.embedding <=> CAST(:vec AS vector)" in query_call.args[0].text
+
+    def test_mode_defaults_to_config(self, monkeypatch):
+        monkeypatch.setattr(settings, "RECOGNITION_INDEX_MODE", "bit")
+        db = Mock()
+        db.execute = AsyncMock(return_value=Mock(fetchall=Mock(return_value=[])))
+
+        asyncio.run(nearest_users(db, np.random.randn(512)))
+
+        assert db.execute.await_args.args[0] is NEAREST_USERS_SQL_BY_MODE["bit"]
+
+    def test_results_deduplicated_per_user(self):
+        sql = NEAREST_USERS_SQL.text
+        assert "GROUP BY n.user_id" in sql
+        assert "MIN(n.distance)" in sql
+
+    def test_default_profile(self, monkeypatch):
+        monkeypatch.setattr(settings, "RECOGNITION_PROFILES", {"fast": 10, "exact": 500})
+        monkeypatch.setattr(settings, "RECOGNITION_DEFAULT_PROFILE", "exact")
+
+        assert resolve_ef_search(None) == 500
+        assert resolve_ef_search("fast") == 10
+
+    def test_unknown_profile(self):
+        with pytest.raises(ValueError, match="Unknown recognition profile"):
+            resolve_ef_search("warp-speed")
+
+
+# ============================================================================
+# Prepared statement accounting
+# ============================================================================
+
+class TestPreparedStatementCounters:
+
+    STATEMENT = "SELECT nearest"
+
+    @pytest.fixture
+    def conn(self):
+        return Mock(info={})
+
+    def _execute(self, conn, statement=STATEMENT, track=True):
+        context = Mock(execution_options={"track_prepared": True} if track else {})
+        db_session._count_prepared(conn, None, statement, {}, context, False)
+
+    def _counts(self):
+        return db_session.PREPARED_STATEMENTS.value, db_session.PREPARED_STATEMENT_HITS.value
+
+    def _rollback(self, conn, status):
+        conn.connection.driver_connection.info.transaction_status = status
+        db_session._prepared_dropped_on_rollback(conn)
+
+    def test_prepare_once_then_hits(self, conn, monkeypatch):
+        monkeypatch.setattr(settings, "DB_PREPARE_THRESHOLD", 0)
+        before = self._counts()
+
+        for _ in range(4):
+            self._execute(conn)
+
+        assert self._counts() == (before[0] + 1, before[1] + 3)
+
+    def test_threshold_and_new_connection(self, monkeypatch):
+        monkeypatch.setattr(settings, "DB_PREPARE_THRESHOLD", 2)
+        prepared = db_session.PREPARED_STATEMENTS.value
+
+        for conn in (Mock(info={}), Mock(info={})):
+            for _ in range(3):
+                self._execute(conn)
+
+        # Third execution prepares, once per connection
+        assert db_session.PREPARED_STATEMENTS.value - prepared == 2
+
+    def test_rollback_deallocates(self, conn, monkeypatch):
+        """psycopg drops a connection's prepared statements when a transaction rolls back."""
+        monkeypatch.setattr(settings, "DB_PREPARE_THRESHOLD", 0)
+        self._execute(conn)
+        before = self._counts()
+
+        self._rollback(conn, TransactionStatus.INTRANS)
+        self._execute(conn)
+
+        assert self._counts() == (before[0] + 1, before[1])
+
+    def test_rollback_when_idle_keeps_statements(self, conn, monkeypatch):
+        monkeypatch.setattr(settings, "DB_PREPARE_THRESHOLD", 0)
+        self._execute(conn)
+        before = self._counts()
+
+        self._rollback(conn, TransactionStatus.IDLE)  # e.g. pool reset after a commit
+        self._execute(conn)
+
+        assert self._counts() == (before[0], before[1] + 1)
+
+    def test_pool_reset_deallocates(self, monkeypatch):
+        record = Mock(info={"statement_executions": {self.STATEMENT: 3}})
+        dbapi_connection = Mock()
+        dbapi_connection.driver_connection.info.transaction_status = TransactionStatus.INTRANS
+
+        db_session._prepared_dropped_on_reset(dbapi_connection, record, None)
+
+        assert record.info == {}
+
+    def test_untracked_statements_ignored(self, conn):
+        before = self._counts()
+
+        self._execute(conn, "SELECT 1", track=False)
+
+        assert self._counts() == before
+        assert conn.info == {}
+
+    def test_nearest_users_statements_tracked(self):
+        for statement in NEAREST_USERS_SQL_BY_MODE.values():
+            assert statement.get_execution_options()["track_prepared"] is True
+
+    def test_disabled(self, monkeypatch, conn):
+        monkeypatch.setattr(settings, "DB_PREPARED_STATEMENTS", False)
+        self._execute(conn)
+        assert conn.info == {}
+
+
+# ============================================================================
+# Query plan (live database)
+# ============================================================================
+
+def _explain(run) -> str:
+    """Run a coroutine in a rolled-back session on the app's async engine, skipping without a DB."""
+    from app.db.session import AsyncSessionLocal, async_engine
+
+    async def explain() -> str:
+        try:
+            async with AsyncSessionLocal() as db:
+                # Plan shape must not depend on how many rows the test database
+                # holds: if the index cannot serve this query, the plan falls
+                # back to a Seq Scan even with seq scans disabled.
+                await db.execute(text("SET LOCAL enable_seqscan = off"))
+                return await run(db)
+        finally:
+            await async_engine.dispose()
+
+    try:
+        return asyncio.run(explain())
+    except (OperationalError, ProgrammingError) as e:
+        pytest.skip(f"No migrated pgvector database available: {e.__class__.__name__}")
+
+
+async def _require_index(db, index: str) -> None:
+    """Quantized indexes exist only for the mode the database was migrated with."""
+    if await db.scalar(text("SELECT to_regclass(:name)"), {"name": index}) is None:
+        pytest.skip(f"{index} not built (RECOGNITION_INDEX_MODE at migration time)")
+
+
+@pytest.mark.integration
+class TestNearestFacePlan:
+
+    @pytest.mark.parametrize("mode, index", [
+        ("vector", "faces_embedding_hnsw_idx"),
+        ("halfvec", "faces_embedding_halfvec_hnsw_idx"),
+        ("bit", "faces_embedding_bit_hnsw_idx"),
+    ])
+    def test_hnsw_index_used_with_binary_parameter(self, mode, index):
+        """EXPLAIN each production statement with a binary-bound vector."""
+        async def run(db):
+            await _require_index(db, index)
+            rows = await db.execute(
+                text("EXPLAIN " + NEAREST_USERS_SQL_BY_MODE[mode].text),
+                {"vec": query_vector(np.random.randn(512)), "candidates": 100, "k": 5},
+            )
+            return "\n".join(row[0] for row in rows)
+
+        assert index in _explain(run)
+
+    @pytest.mark.parametrize("mode, index", [
+        ("vector", "faces_embedding_hnsw_idx"),
+        ("halfvec", "faces_embedding_halfvec_hnsw_idx"),
+        ("bit", "faces_embedding_bit_hnsw_idx"),
+    ])
+    def test_batch_statement_uses_hnsw_index_per_probe(self, mode, index):
+        """The LATERAL subquery runs one index scan per element of the vector[] parameter."""
+        async def run(db):
+            await _require_index(db, index)
+            rows = await db.execute(
+                text("EXPLAIN " + BATCH_NEAREST_USERS_SQL_BY_MODE[mode].text),
+                {"vecs": [query_vector(np.random.randn(512)) for _ in range(4)], "candidates": 100, "k": 5},
+            )
+            return "\n".join(row[0] for row in rows)
+
+        plan = _explain(run)
+        assert index in plan
+        assert "Nested Loop" in plan
+
+    def test_generic_plan_keeps_hnsw_index(self):
+        """
+        A prepared statement may switch to a generic plan (no parameter value
+        known); that plan must still walk the HNSW index. Needs PostgreSQL 16+.
+        """
+        import psycopg
+
+        generic_sql = "EXPLAIN (GENERIC_PLAN) " + (
+            NEAREST_USERS_SQL.text
+            .replace(":vec", "$1")
+            .replace(":candidates", "$2")
+            .replace(":k", "$3")
+        )
+
+        async def run(db):
+            raw = await (await db.connection()).get_raw_connection()
+            async with raw.driver_connection.cursor() as cur:
+                try:
+                    # No parameters and no prepare: sent with the simple protocol
+                    await cur.execute(generic_sql, prepare=False)
+                except psycopg.errors.SyntaxError:
+                    pytest.skip("EXPLAIN (GENERIC_PLAN) requires PostgreSQL 16+")
+                return "\n".join(row[0] for row in await cur.fetchall())
+
+        assert "faces_embedding_hnsw_idx" in _explain(run)
+
+
+@pytest.mark.integration
+class TestNearestUsersDeduplication:
+
+    def test_k_distinct_users_when_users_have_several_faces(self, monkeypatch):
+        """Two users with six close faces each must not crowd out the third user."""
+        monkeypatch.setattr(settings, "RECOGNITION_FACES_PER_USER", 6)
+        rng = np.random.default_rng(0)
+        query = rng.standard_normal(512).astype(np.float32)
+
+        def near(scale):
+            v = query + scale * rng.standard_normal(512).astype(np.float32)
+            return query_vector(v / np.linalg.norm(v))
+
+        async def run(db):
+            # Rolled back with the session: nothing stays in the database
+            expected = []
+            for rank, n_faces in enumerate([6, 6, 1, 1]):
+                auth_user_id, user_id = uuid.uuid4(), uuid.uuid4()
+                await db.execute(
+                    text("INSERT INTO auth_users (auth_user_id, username, password_hash, is_active, is_admin) "
+                         "VALUES (:id, :username, 'x', true, false)"),
+                    {"id": auth_user_id, "username": f"dedup-{auth_user_id}"},
+                )
+                await db.execute(
+                    text("INSERT INTO users (user_id, name, surname, auth_user_id) VALUES (:id, 'n', 's', :auth)"),
+                    {"id": user_id, "auth": auth_user_id},
+                )
+                for _ in range(n_faces):
+                    await db.execute(
+                        text("INSERT INTO faces (face_id, user_id, embedding) VALUES (:id, :user_id, :vec)"),
+                        {"id": uuid.uuid4(), "user_id": user_id, "vec": near(0.01 * (rank + 1))},
+                    )
+                expected.append(user_id)
+            rows = await nearest_users(db, query, k=3, ef_search=4, mode="vector")
+            return [row[0] for row in rows], expected[:3]
+
+        found, expected = _explain(run)
+
+        assert found == expected
+
+
+@pytest.mark.integration
+class TestPreparedStatementsOnServer:
+
+    def test_counters_match_pg_prepared_statements(self, monkeypatch):
+        """The counters follow what the server actually holds for the psycopg in requirements.txt."""
+        monkeypatch.setattr(settings, "DB_PREPARE_THRESHOLD", 0)
+        before = (db_session.PREPARED_STATEMENTS.value, db_session.PREPARED_STATEMENT_HITS.value)
+
+        async def run(db):
+            for _ in range(3):
+                await nearest_users(db, np.random.randn(512), k=1, ef_search=40, mode="vector")
+            return await db.scalar(text(
+                "SELECT count(*) FROM pg_prepared_statements WHERE statement LIKE '%WITH nearest AS%'"
+            ))
+
+        on_server = _explain(run)
+
+        assert on_server == 1
+        assert db_session.PREPARED_STATEMENTS.value - before[0] == 1
+        assert db_session.PREPARED_STATEMENT_HITS.value - before[1] == 2
@@ -0,0 +1,124 @@
+"""
+Unit tests for 1:1 verification (/verify).
+Preprocessing, inference and the database are mocked.
+"""
+
+import asyncio
+import uuid
+import pytest
+import numpy as np
+from unittest.mock import Mock, AsyncMock
+from fastapi import HTTPException
+
+from app.services import verification
+from app.services.preprocessing import PreprocessResult
+from app.schemas.detection import FaceEmbedding
+from app.utils.exceptions import NoFaceDetectedError
+
+
+def _unit(rng, n=1):
+    v = rng.standard_normal((n, 512)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def probe(monkeypatch, rng):
+    emb = _unit(rng)[0]
+    monkeypatch.setattr(verification, "preprocess_upload", AsyncMock(return_value=PreprocessResult(
+        img_array=np.zeros((480, 640, 3), dtype=np.uint8), timings_ms={}
+    )))
+    embed = AsyncMock(return_value=FaceEmbedding(embedding=emb, detection_score=0.95))
+    monkeypatch.setattr(verification, "embed_image", embed)
+    return emb, embed
+
+
+def _db(embeddings):
+    """Async session whose faces query returns the given embeddings."""
+    db = Mock()
+    db.execute = AsyncMock(return_value=Mock(scalars=Mock(return_value=list(embeddings))))
+    db.commit = AsyncMock()
+    return db
+
+
+def _verify(db, threshold=0.7):
+    person = Mock(user_id=uuid.uuid4())
+    return person, asyncio.run(verification.verify_user(
+        image_data=memoryview(b"\xff\xd8\xff"),
+        person=person,
+        embedder=Mock(),
+        matcher=Mock(threshold=threshold),
+        db=db,
+    ))
+
+
+# ============================================================================
+# verify_user
+# ============================================================================
+
+class TestVerifyUser:
+
+    def test_best_of_own_faces(self, probe, rng):
+        emb, _ = probe
+        own_faces = [_unit(rng)[0], emb, _unit(rng)[0]]
+
+        person, response = _verify(_db(own_faces))
+
+        assert response.verified is True
+        assert response.user_id == person.user_id
+        assert response.similarity == pytest.approx(1.0, abs=1e-5)
+        assert response.faces_compared == 3
+
+    def test_below_threshold_not_verified(self, probe, rng):
+        _, response = _verify(_db(_unit(rng, 2)))
+
+        assert response.verified is False
+        assert response.similarity < 0.7
+
+    def test_text_embeddings_accepted(self, probe):
+        """Without pgvector's loader the column comes back as '[...]' text."""
+        emb, _ = probe
+        _, response = _verify(_db(["[" + ",".join(map(str, emb)) + "]"]))
+
+        assert response.verified is True
+
+    def test_only_own_faces_queried(self, probe):
+        db = _db([probe[0]])
+        person, _ = _verify(db)
+
+        statement = db.execute.await_args.args[0]
+        assert "faces.user_id" in str(statement)
+        assert statement.compile().params["user_id_1"] == person.user_id
+
+    def test_no_registered_faces_is_404_without_inference(self, probe):
+        _, embed = probe
+
+        with pytest.raises(HTTPException) as exc:
+            _verify(_db([]))
+
+        assert exc.value.status_code == 404
+        embed.assert_not_called()
+        verification.preprocess_upload.assert_not_called()
+
+    def test_faces_committed_before_inference(self, probe):
+        """The read is committed, so the connection is back in the pool while the probe is embedded."""
+        _, embed = probe
+        db = _db([probe[0]])
+        embed.side_effect = lambda *args: db.commit.assert_awaited_once() or embed.return_value
+
+        _, response = _verify(db)
+
+        assert response.verified is True
+
+    def test_no_face_in_probe_is_422(self, probe):
+        _, embed = probe
+        embed.side_effect = NoFaceDetectedError("No face detected in image")
+
+        with pytest.raises(HTTPException) as exc:
+            _verify(_db([probe[0]]))
+
+        assert exc.value.status_code == 422
@@ -0,0 +1,223 @@
+"""
+Tests for start-up warm-up (app.services.warmup) and /health/ready.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import app
+from app.api import deps
+from app.api.deps import get_embedder
+from app.services import warmup
+from app.services.warmup import Readiness, run_warmup, warm_up
+from app.utils.exceptions import NoFaceDetectedError, InferenceServerError
+
+
+class FakeEmbedder:
+    """Records warm-up calls; embed() finds no face, like the detector on noise."""
+
+    def __init__(self, error: Exception | None = None):
+        self.embed_shapes = []
+        self.batch_sizes = []
+        self.error = error
+        self.app = SimpleNamespace(models={"recognition": SimpleNamespace(input_size=(112, 112))})
+
+    def embed(self, img_array: np.ndarray):
+        self.embed_shapes.append(img_array.shape)
+        if self.error is not None:
+            raise self.error
+        raise NoFaceDetectedError("No face detected in image")
+
+    def embed_aligned(self, crops):
+        assert all(crop.shape == (112, 112, 3) for crop in crops)
+        self.batch_sizes.append(len(crops))
+        return np.ones((len(crops), 512), dtype=np.float32)
+
+
+class FakeRemoteEmbedder:
+    """No local recognition model (like RemoteEmbedder)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, img_array):
+        self.calls += 1
+        raise NoFaceDetectedError("No face detected in image")
+
+
+@pytest.fixture
+def state(monkeypatch):
+    """Fresh module-level readiness (shared by the lifespan and the health route)."""
+    fresh = Readiness()
+    for field in ("ready", "error", "warmup_ms"):
+        monkeypatch.setattr(warmup.readiness, field, getattr(fresh, field))
+    return warmup.readiness
+
+
+# ============================================================================
+# warm_up
+# ============================================================================
+
+class TestWarmUp:
+
+    def test_runs_detector_and_every_batch_size(self, monkeypatch):
+        monkeypatch.setattr(warmup.settings, "BATCHING_ENABLED", True)
+        monkeypatch.setattr(warmup.settings, "BATCH_MAX_SIZE", 8)
+        embedder = FakeEmbedder()
+
+        elapsed = warm_up(embedder, iterations=3)
+
+        assert embedder.embed_shapes == [(640, 640, 3)] * 3
+        assert embedder.batch_sizes == [1, 8]
+        assert elapsed >= 0
+
+    def test_single_batch_size_without_batching(self, monkeypatch):
+        monkeypatch.setattr(warmup.settings, "BATCHING_ENABLED", False)
+        embedder = FakeEmbedder()
+
+        warm_up(embedder, iterations=1)
+
+        assert embedder.batch_sizes == [1]
+
+    def test_zero_iterations_runs_nothing(self):
+        embedder = FakeEmbedder()
+
+        warm_up(embedder, iterations=0)
+
+        assert embedder.embed_shapes == [] and embedder.batch_sizes == []
+
+    def test_remote_embedder_only_embeds(self):
+        embedder = FakeRemoteEmbedder()
+
+        warm_up(embedder, iterations=2)
+
+        assert embedder.calls == 2
+
+    def test_other_errors_propagate(self):
+        with pytest.raises(RuntimeError):
+            warm_up(FakeEmbedder(error=RuntimeError("broken model")), iterations=1)
+
+
+# ============================================================================
+# run_warmup
+# ============================================================================
+
+class TestRunWarmup:
+
+    def test_marks_ready(self):
+        state = Readiness()
+
+        asyncio.run(run_warmup(FakeEmbedder, state))
+
+        assert state.ready and state.error is None
+        assert state.warmup_ms is not None
+
+    def test_failure_is_reported(self):
+        state = Readiness()
+
+        asyncio.run(run_warmup(lambda: FakeEmbedder(error=RuntimeError("broken model")), state))
+
+        assert not state.ready
+        assert "broken model" in state.error
+
+    def test_unreachable_inference_server_is_retried(self):
+        state = Readiness()
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise InferenceServerError("Inference server unavailable")
+            return FakeRemoteEmbedder()
+
+        asyncio.run(run_warmup(factory, state, retry_s=0))
+
+        assert len(attempts) == 3
+        assert state.ready and state.error is None
+
+
+# ============================================================================
+# /health/ready
+# ============================================================================
+
+class TestReadinessEndpoint:
+
+    def test_warming_up(self, state):
+        response = TestClient(app).get("/health/ready")
+
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming_up"
+
+    def test_ready(self, state):
+        state.ready, state.warmup_ms = True, 1234.5
+
+        response = TestClient(app).get("/health/ready")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready", "warmup_ms": 1234.5}
+
+    def test_failed(self, state):
+        state.error = "RuntimeError: broken model"
+
+        response = TestClient(app).get("/health/ready")
+
+        assert response.status_code == 503
+        assert response.json()["detail"] == "RuntimeError: broken model"
+
+    def test_liveness_unaffected(self, state):
+        assert TestClient(app).get("/health").status_code == 200
+
+    def test_lifespan_warms_up_then_ready(self, state, monkeypatch):
+        monkeypatch.setattr(warmup.settings, "WARMUP_ENABLED", True)
+        embedder = FakeEmbedder()
+        monkeypatch.setattr(main, "get_embedder", lambda: embedder)
+
+        with TestClient(app) as client:
+            deadline = time.monotonic() + 5
+            while client.get("/health/ready").status_code != 200 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert client.get("/health/ready").status_code == 200
+
+        assert embedder.embed_shapes  # the patched embedder was the one warmed up
+
+
+# ============================================================================
+# get_embedder
+# ============================================================================
+
+class TestGetEmbedder:
+
+    @pytest.fixture(autouse=True)
+    def reset(self, monkeypatch):
+        monkeypatch.setattr(deps, "_embedder_instance", None)
+        monkeypatch.setattr(deps.settings, "INFERENCE_SERVER_SOCKET", "")
+
+    def test_concurrent_callers_build_one_embedder(self, monkeypatch):
+        # Warm-up and the first requests race for the singleton
+        started = threading.Barrier(8)
+        built = []
+
+        def slow_embedder(**kwargs):
+            built.append(kwargs)
+            time.sleep(0.05)
+            return FakeEmbedder()
+
+        monkeypatch.setattr(deps, "InsightFaceEmbedder", slow_embedder)
+
+        def call():
+            started.wait()
+            return get_embedder()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            embedders = list(pool.map(lambda _: call(), range(8)))
+
+        assert len(built) == 1
+        assert all(embedder is embedders[0] for embedder in embedders)